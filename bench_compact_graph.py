@@ -0,0 +1,110 @@
+"""JSON とバイナリ形式（blade_compact_graph）の読み込み時間・メモリ使用量の比較
+
+合成した依存関係グラフを両形式で保存し、それぞれ別プロセスで
+「読み込んで全エッジを1回走査する」までの時間と最大RSSの増分を測る
+
+使用方法: python bench_compact_graph.py [ノード数] [1ノードあたりの依存数]
+"""
+import os
+import sys
+import json
+import random
+import tempfile
+import argparse
+import subprocess
+import importlib.util
+
+from blade_compact_graph import save_compact_graph
+
+# 子プロセスで実行する計測コード（{loader} を差し替える）
+# ru_maxrss は exec をまたいで親プロセスの値を引き継ぐため、Linux では /proc の VmHWM を使う
+CHILD_TEMPLATE = """
+import sys, time, json, resource
+sys.path.insert(0, {root!r})
+from blade_compact_graph import load_compact_graph
+def peak_rss_kb():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+base = peak_rss_kb()
+start = time.perf_counter()
+{loader}
+elapsed = time.perf_counter() - start
+peak = peak_rss_kb()
+print(json.dumps({{'seconds': elapsed, 'rss_kb': peak - base, 'edges': count}}))
+"""
+
+JSON_LOADER = """
+with open({dependencies!r}, 'r', encoding='utf-8') as f:
+    dependencies = json.load(f)
+with open({files!r}, 'r', encoding='utf-8') as f:
+    file_map = json.load(f)
+count = sum(1 for deps in dependencies.values() for dep in deps if dep['num'] in file_map)
+"""
+
+COMPACT_LOADER = """
+graph = load_compact_graph({compact!r}, use_numpy={use_numpy})
+count = sum(1 for _ in graph.iter_edges())
+"""
+
+
+def build_synthetic_graph(node_count, degree, seed=0):
+    """ランダムな依存関係を持つ blade_files / blade_dependencies 相当の辞書を作る"""
+    rng = random.Random(seed)
+    file_map = {str(i): f"app/section{i % 97}/view{i}.blade.php" for i in range(1, node_count + 1)}
+    dependencies = {}
+    for i in range(1, node_count + 1):
+        deps = []
+        for _ in range(rng.randint(0, degree * 2)):
+            deps.append({'num': str(rng.randint(1, node_count)), 'type': rng.choice(('include', 'extends'))})
+        dependencies[str(i)] = deps
+    return dependencies, file_map
+
+
+def run_child(code):
+    output = subprocess.run([sys.executable, '-c', code], check=True, capture_output=True, text=True).stdout
+    return json.loads(output)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='JSON と圧縮バイナリ形式で、依存グラフの読み込み時間とメモリ使用量を比べる')
+    parser.add_argument('nodes', nargs='?', type=int, default=50000, help='ノード数（デフォルト: %(default)s）')
+    parser.add_argument('degree', nargs='?', type=int, default=3, help='1ノードあたりの依存数（デフォルト: %(default)s）')
+    args = parser.parse_args()
+    node_count, degree = args.nodes, args.degree
+    root = os.path.dirname(os.path.abspath(__file__))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        dependencies, file_map = build_synthetic_graph(node_count, degree)
+        paths = {
+            'dependencies': os.path.join(tmp, 'blade_dependencies.json'),
+            'files': os.path.join(tmp, 'blade_files.json'),
+            'compact': os.path.join(tmp, 'blade_dependencies.bin'),
+        }
+        with open(paths['dependencies'], 'w', encoding='utf-8') as f:
+            json.dump(dependencies, f, ensure_ascii=False, indent=2)
+        with open(paths['files'], 'w', encoding='utf-8') as f:
+            json.dump(file_map, f, ensure_ascii=False, indent=2)
+        save_compact_graph(dependencies, file_map, paths['compact'])
+        del dependencies, file_map
+
+        json_size = os.path.getsize(paths['dependencies']) + os.path.getsize(paths['files'])
+        print(f"ノード {node_count} 件 / JSON {json_size / 1024:.0f} KB / "
+              f"バイナリ {os.path.getsize(paths['compact']) / 1024:.0f} KB")
+        loaders = [('json', JSON_LOADER.format(**paths)),
+                   ('compact (memoryview)', COMPACT_LOADER.format(use_numpy=False, **paths))]
+        if importlib.util.find_spec('numpy') is not None:
+            loaders.append(('compact (numpy)', COMPACT_LOADER.format(use_numpy=True, **paths)))
+        for name, loader in loaders:
+            result = run_child(CHILD_TEMPLATE.format(root=root, loader=loader))
+            print(f"{name:22s} {result['seconds'] * 1000:9.1f} ms  RSS +{result['rss_kb'] / 1024:7.1f} MB"
+                  f"  ({result['edges']} エッジ)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""ディレクティブ抽出のマイクロベンチマーク
+
+従来のディレクティブごとの re.finditer ループと、一括走査の scan_directives を
+同じ合成テンプレートに対して実行し、テンプレート 1MB あたりの処理時間を比較する
+
+使用方法: python bench_directive_scanner.py [サイズMB] [繰り返し回数]
+"""
+import re
+import sys
+import time
+import random
+
+from blade_directive_scanner import DIRECTIVES, scan_directives
+
+# 旧実装（step2 の find_dependencies）と同じパターン
+LEGACY_PATTERNS = {
+    'include': r"@include\('([^']+)'\)",
+    'extends': r"@extends\('([^']+)'\)"
+}
+
+# 合成テンプレートの通常行
+MARKUP_LINES = [
+    "<div class=\"row\">{{ $item->name }}</div>",
+    "<p>{{ __('messages.welcome') }}</p>",
+    "<a href=\"{{ route('user.show', $user) }}\" class=\"btn btn-primary\">@lang('edit')</a>",
+    "@if($user->isAdmin())",
+    "@endif",
+    "@foreach($items as $item)",
+    "@endforeach",
+]
+
+# 合成テンプレートに混ぜる依存関係の行
+DIRECTIVE_LINES = [
+    "@include('app.elements.header')",
+    "@include(\"app.elements.footer\", ['title' => $title])",
+    "@includeIf('app.partials.sidebar')",
+    "@includeWhen($show, 'app.partials.banner', ['a' => 1])",
+    "@includeFirst(['custom.admin', 'admin'])",
+    "@each('app.items.row', $rows, 'row', 'app.items.empty')",
+    "@component('app.components.card')",
+    "<x-alert.error type=\"danger\" :message=\"$message\" />",
+    "@livewire('counter')",
+]
+
+
+def build_content(size_mb, directive_ratio=0.1, seed=0):
+    """指定サイズ程度の合成テンプレート文字列を作る（directive_ratio は依存関係の行の割合）"""
+    rng = random.Random(seed)
+    target = int(size_mb * 1024 * 1024)
+    lines = []
+    total = 0
+    while total < target:
+        line = rng.choice(DIRECTIVE_LINES if rng.random() < directive_ratio else MARKUP_LINES)
+        lines.append(line)
+        total += len(line) + 1
+    lines.insert(0, "@extends('app.layouts.base')")
+    return '\n'.join(lines)
+
+
+def legacy_scan(content):
+    """従来のパターンごとの走査"""
+    dependencies = []
+    for dep_type, pattern in LEGACY_PATTERNS.items():
+        for match in re.finditer(pattern, content):
+            dependencies.append((dep_type, match.group(1)))
+    return dependencies
+
+
+def legacy_scan_all(content):
+    """従来方式のままディレクティブを増やした場合（ディレクティブごとに1パス）"""
+    dependencies = []
+    for directive in DIRECTIVES:
+        for match in re.finditer(r"@" + directive + r"\s*\(\s*['\"]([^'\"]+)['\"]", content):
+            dependencies.append((directive, match.group(1)))
+    return dependencies
+
+
+def measure(func, content, repeat):
+    """最良値（秒）と抽出件数を返す"""
+    best = float('inf')
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(content)
+        best = min(best, time.perf_counter() - start)
+    return best, len(result)
+
+
+def main():
+    size_mb = float(sys.argv[1]) if len(sys.argv) > 1 else 4.0
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    content = build_content(size_mb)
+    mb = len(content.encode('utf-8')) / (1024 * 1024)
+
+    candidates = (
+        ('legacy (include/extends のみ)', legacy_scan),
+        (f'legacy ({len(DIRECTIVES)} パス)', legacy_scan_all),
+        ('scan_directives (1 パス)', scan_directives),
+    )
+    for name, func in candidates:
+        seconds, found = measure(func, content, repeat)
+        print(f"{name:32s} {seconds / mb * 1000:8.2f} ms/MB  ({found} 件, {mb:.2f} MB)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,251 @@
+"""列挙・依存関係の解析・DOT生成・グラフ読み込みの各段階のベンチマーク
+
+合成した Laravel のビューツリー（テンプレート数・ディレクトリの深さ・1ファイルあたりの依存数・
+ディレクティブの種類の比率を指定できる）に対して、各段階を別プロセスで実行し、
+経過時間・最大RSS・1秒あたりのファイル数を測って JSON に保存する。
+Qt やディスプレイは使わない
+
+使用方法: python bench_pipeline.py [--sizes 1000,10000,100000] [--output bench_results.json] [--compare 前回.json]
+"""
+import os
+import sys
+import json
+import random
+import argparse
+import platform
+import tempfile
+import subprocess
+
+DEFAULT_SIZES = (1000, 10000)
+DEFAULT_OUTPUT = 'bench_results.json'
+# ディレクティブの種類ごとの出現比率
+DEFAULT_MIX = {'include': 6, 'includeIf': 1, 'includeWhen': 1, 'each': 1, 'component': 2, 'livewire': 1}
+# テンプレート全体に占めるレイアウト・コンポーネント・Livewire の割合（残りは通常のビューと部品）
+LAYOUT_RATIO = 0.01
+COMPONENT_RATIO = 0.1
+LIVEWIRE_RATIO = 0.03
+# 1ファイルの本文に入れる通常の行
+MARKUP_LINES = [
+    "<div class=\"row\">{{ $item->name }}</div>",
+    "<p>{{ __('messages.welcome') }}</p>",
+    "<a href=\"{{ route('user.show', $user) }}\" class=\"btn btn-primary\">@lang('edit')</a>",
+    "@if($user->isAdmin())",
+    "@endif",
+    "@foreach($items as $item)",
+    "@endforeach",
+]
+
+# 子プロセスで実行する計測コード（{setup} と {stage} を差し替える）
+# import は計測の前に済ませ、段階の処理だけを測る
+CHILD_TEMPLATE = """
+import os, sys, time, json, resource
+sys.path.insert(0, {root!r})
+os.chdir({workdir!r})
+def peak_rss_kb():
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+{setup}
+start = time.perf_counter()
+{stage}
+elapsed = time.perf_counter() - start
+print(json.dumps({{'seconds': elapsed, 'peak_rss_kb': peak_rss_kb()}}))
+"""
+
+# 各段階の (計測前に実行する import, 計測するコード)（作業ディレクトリに前の段階の出力がある前提）
+STAGES = {
+    'enumerate': (
+        "from step1_blade_enumerator import BladeEnumerator",
+        """
+BladeEnumerator({views!r}).enumerate_blade_files()
+"""),
+    'analyze': (
+        "from step2_blade_dependency_analyzer import BladeDependencyAnalyzer",
+        """
+analyzer = BladeDependencyAnalyzer('blade_files.json', {project!r})
+analyzer.load_blade_files()
+analyzer.analyze_dependencies()
+analyzer.save_dependencies()
+"""),
+    'dot': (
+        "from step3_generate_graph import load_json, dependency_graph_elements, write_dependency_graph",
+        """
+dependencies = load_json('blade_dependencies.json')
+file_map = load_json('blade_files.json')
+write_dependency_graph(*dependency_graph_elements(dependencies, file_map), 'dependency_graph.dot')
+"""),
+    'load': (
+        "from blade_query import DependencyIndex",
+        """
+index = DependencyIndex.from_json('blade_dependencies.json', 'blade_files.json')
+"""),
+    'pipeline': (
+        "from blade_pipeline import BladePipeline, DotWriter",
+        """
+BladePipeline({views!r}, DotWriter('pipeline_graph.dot')).run()
+"""),
+    'sqlite': (
+        "from blade_pipeline import BladePipeline, SqliteWriter",
+        """
+BladePipeline({views!r}, SqliteWriter('pipeline_graph.sqlite')).run()
+"""),
+}
+
+
+def parse_mix(value):
+    """'include=6,component=2' 形式の比率指定を辞書にする"""
+    mix = {}
+    for item in value.split(','):
+        name, _, weight = item.partition('=')
+        mix[name.strip()] = float(weight or 1)
+    return mix
+
+
+def generate_view_tree(views_directory, count, depth=3, fanout=4, mix=None, lines=30, seed=0):
+    """合成したビューツリーを views_directory 以下に書き出し、作成したファイル数を返す
+
+    count: テンプレート数
+    depth: ビューを置くディレクトリの深さ
+    fanout: 1ファイルあたりの依存関係（ディレクティブ）の平均数
+    mix: ディレクティブの種類ごとの比率（DEFAULT_MIX と同じ形式）
+    lines: 1ファイルあたりの通常の行数
+    """
+    rng = random.Random(seed)
+    mix = mix or DEFAULT_MIX
+    kinds = list(mix)
+    weights = [mix[kind] for kind in kinds]
+
+    layout_count = max(1, int(count * LAYOUT_RATIO))
+    component_count = max(1, int(count * COMPONENT_RATIO))
+    livewire_count = max(1, int(count * LIVEWIRE_RATIO))
+    view_count = max(1, count - layout_count - component_count - livewire_count)
+    layouts = [f"layouts.layout{i}" for i in range(layout_count)]
+    components = [f"section{i % 20}.component{i}" for i in range(component_count)]
+    livewires = [f"section{i % 20}.widget{i}" for i in range(livewire_count)]
+    views = []
+    for i in range(view_count):
+        folders = [f"d{rng.randrange(max(2, int(view_count ** (1 / max(depth, 1)) / 2)))}" for _ in range(depth)]
+        views.append('.'.join(folders + [f"view{i}"]))
+
+    def directive(kind, index):
+        # 自分より後ろのビューだけを参照して、循環しにくくする
+        if kind == 'component':
+            return f"<x-{rng.choice(components)} :item=\"$item\" />"
+        if kind == 'livewire':
+            return f"@livewire('{rng.choice(livewires)}')"
+        if index + 1 < len(views):
+            target = views[rng.randrange(index + 1, len(views))]
+        else:
+            target = 'components.' + rng.choice(components)
+        if kind == 'includeWhen':
+            return f"@includeWhen($show, '{target}', ['item' => $item])"
+        if kind == 'each':
+            return f"@each('{target}', $items, 'item')"
+        return f"@{kind}('{target}')"
+
+    def write(name, body):
+        path = os.path.join(views_directory, name.replace('.', os.sep) + '.blade.php')
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(body)
+
+    def markup():
+        return [rng.choice(MARKUP_LINES) for _ in range(lines)]
+
+    for name in layouts:
+        write(name, '\n'.join(['<html>', "@yield('content')"] + markup() + ['</html>']))
+    for name in components:
+        write('components.' + name, '\n'.join(['<div>'] + markup() + ['</div>']))
+    for name in livewires:
+        write('livewire.' + name, '\n'.join(['<div>'] + markup() + ['</div>']))
+    for index, name in enumerate(views):
+        body = markup()
+        for _ in range(rng.randint(0, fanout * 2)):
+            body.insert(rng.randrange(len(body) + 1), directive(rng.choices(kinds, weights)[0], index))
+        if rng.random() < 0.5:
+            body = [f"@extends('{rng.choice(layouts)}')", "@section('content')"] + body + ['@endsection']
+        write(name, '\n'.join(body))
+    return layout_count + component_count + livewire_count + view_count
+
+
+def run_stage(root, workdir, stage, **paths):
+    setup, body = STAGES[stage]
+    code = CHILD_TEMPLATE.format(root=root, workdir=workdir, setup=setup, stage=body.format(**paths))
+    output = subprocess.run([sys.executable, '-c', code], check=True, capture_output=True, text=True).stdout
+    # 段階のコードが出力したメッセージ（キャッシュの件数など）は読み飛ばす
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def git_revision(root):
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=root, check=True,
+                              capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, previous_path):
+    """前回の結果と段階ごとの経過時間を比べて表示する"""
+    with open(previous_path, 'r', encoding='utf-8') as f:
+        previous = {(r['templates'], r['stage']): r for r in json.load(f)['results']}
+    print(f"\n{previous_path} との比較（経過時間の比, 1 未満なら速くなった）")
+    for result in results:
+        before = previous.get((result['templates'], result['stage']))
+        if before and before['seconds'] > 0:
+            print(f"{result['templates']:>8} {result['stage']:10s} {result['seconds'] / before['seconds']:6.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='合成したビューツリーで各段階の処理時間とメモリ使用量を測る')
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help='テンプレート数（カンマ区切り, デフォルト: %(default)s）')
+    parser.add_argument('--depth', type=int, default=3, help='ディレクトリの深さ（デフォルト: %(default)s）')
+    parser.add_argument('--fanout', type=int, default=4, help='1ファイルあたりの平均依存数（デフォルト: %(default)s）')
+    parser.add_argument('--mix', type=parse_mix, default=DEFAULT_MIX,
+                        help='ディレクティブの比率 例: include=6,component=2,livewire=1')
+    parser.add_argument('--lines', type=int, default=30, help='1ファイルあたりの通常の行数（デフォルト: %(default)s）')
+    parser.add_argument('--stages', default=','.join(STAGES), help='計測する段階（デフォルト: %(default)s）')
+    parser.add_argument('--output', '-o', default=DEFAULT_OUTPUT, help='結果のJSON（デフォルト: %(default)s）')
+    parser.add_argument('--compare', metavar='JSON', help='前回の結果と比較する')
+    parser.add_argument('--keep', metavar='DIR', help='合成したビューツリーを消さずにこのディレクトリに残す')
+    args = parser.parse_args()
+
+    root = os.path.dirname(os.path.abspath(__file__))
+    stages = [stage for stage in args.stages.split(',') if stage]
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in map(int, args.sizes.split(',')):
+            project = os.path.join(args.keep or tmp, f"project_{size}")
+            views = os.path.join(project, 'resources', 'views')
+            workdir = os.path.join(tmp, f"work_{size}")
+            os.makedirs(workdir)
+            count = generate_view_tree(views, size, args.depth, args.fanout, args.mix, args.lines)
+            print(f"テンプレート {count} 件")
+            for stage in stages:
+                result = run_stage(root, workdir, stage, project=project, views=views)
+                result.update(templates=count, stage=stage,
+                              files_per_sec=count / result['seconds'] if result['seconds'] else None)
+                results.append(result)
+                print(f"{count:>8} {stage:10s} {result['seconds'] * 1000:9.1f} ms  "
+                      f"RSS {result['peak_rss_kb'] / 1024:7.1f} MB  {result['files_per_sec']:10.0f} files/s")
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump({
+            'revision': git_revision(root),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'config': {'depth': args.depth, 'fanout': args.fanout, 'mix': args.mix, 'lines': args.lines},
+            'results': results,
+        }, f, ensure_ascii=False, indent=2)
+    print(f"{args.output} に保存しました")
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""ビューアのシーン構築時間と描画時間のベンチマーク
+
+合成した 5k ノードのレイアウト済みグラフで、GraphVisualizer のシーン構築時間と
+縮小表示・等倍表示それぞれの1フレームの描画時間、ノードをクリックしたときの強調表示の時間を測る。
+--legacy を付けると、従来の QPushButton + QGraphicsProxyWidget 方式とも比較する
+
+使用方法: QT_QPA_PLATFORM=offscreen python bench_viewer_scene.py [ノード数] [--legacy]
+"""
+import os
+import sys
+import time
+import argparse
+import random
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PyQt5.QtWidgets import QApplication, QGraphicsView, QGraphicsScene, QPushButton  # noqa: E402
+from PyQt5.QtCore import QLineF  # noqa: E402
+from PyQt5.QtGui import QImage, QPainter, QPen, QColor  # noqa: E402
+
+from step4_blade_graph_viewer import GraphVisualizer  # noqa: E402
+
+FRAMES = 20
+VIEW_SIZE = (1600, 1000)
+
+
+def build_synthetic_layout(node_count, seed=0):
+    """dot のレイアウト結果に近い、層状に並んだノードとエッジを作る
+
+    dot は依存元と依存先を隣り合う層に置くので、エッジの大半は1つ前の層から張る
+    """
+    rng = random.Random(seed)
+    per_layer = max(1, int(node_count ** 0.5))
+    nodes = {}
+    for i in range(node_count):
+        layer, column = divmod(i, per_layer)
+        nodes[str(i)] = (f"app/section{i % 37}/view_{i}.blade.php", layer * 260.0, column * 40.0)
+    edges = []
+    for i in range(per_layer, node_count):
+        layer_start = i - i % per_layer
+        for _ in range(rng.randint(1, 2)):
+            if rng.random() < 0.9:
+                source = rng.randrange(layer_start - per_layer, layer_start)
+            else:
+                source = rng.randrange(0, layer_start)
+            edges.append((str(source), str(i), 'include'))
+    return nodes, edges
+
+
+def legacy_populate(scene, nodes, edges):
+    """従来の方式（ノードごとに QPushButton とプロキシ、エッジごとに線と矢じり）"""
+    for node, (label, x, y) in nodes.items():
+        button = QPushButton(label)
+        button.setStyleSheet("background-color: lightblue; color: black; border: 1px solid black;")
+        proxy = scene.addWidget(button)
+        proxy.setPos(x - button.width() / 2, y - button.height() / 2)
+    for start, end, _ in edges:
+        _, x1, y1 = nodes[start]
+        _, x2, y2 = nodes[end]
+        scene.addLine(QLineF(x1, y1, x2, y2), QPen(QColor('black'), 2)).setZValue(-10)
+
+
+def frame_time(view, scale, centers):
+    """指定の倍率で、中心を移動しながら描画した1フレームの平均時間（秒）"""
+    view.resetTransform()
+    view.scale(scale, scale)
+    image = QImage(view.viewport().size(), QImage.Format_ARGB32_Premultiplied)
+    start = time.perf_counter()
+    for center in centers:
+        view.centerOn(*center)
+        painter = QPainter(image)
+        view.render(painter)
+        painter.end()
+    return (time.perf_counter() - start) / len(centers)
+
+
+def measure(name, build):
+    start = time.perf_counter()
+    view = build()
+    build_time = time.perf_counter() - start
+    view.resize(*VIEW_SIZE)
+    rect = view.sceneRect()
+    rng = random.Random(1)
+    centers = [(rng.uniform(rect.left(), rect.right()), rng.uniform(rect.top(), rect.bottom()))
+               for _ in range(FRAMES)]
+    zoomed_out = frame_time(view, min(VIEW_SIZE[0] / rect.width(), VIEW_SIZE[1] / rect.height()), centers)
+    actual = frame_time(view, 1.0, centers)
+    print(f"{name:16s} シーン構築 {build_time * 1000:8.1f} ms  "
+          f"全体表示 {zoomed_out * 1000:7.1f} ms/frame  等倍 {actual * 1000:7.1f} ms/frame")
+    return view
+
+
+def click_time(view, nodes, transitive=False):
+    """highlight_connected の1クリックあたりの平均時間（秒）"""
+    start = time.perf_counter()
+    for node in nodes:
+        view.highlight_connected(node, transitive)
+    return (time.perf_counter() - start) / len(nodes)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='合成したレイアウト済みグラフでビューアのシーン構築と描画の時間を測る')
+    parser.add_argument('nodes', nargs='?', type=int, default=5000, help='ノード数（デフォルト: %(default)s）')
+    parser.add_argument('--legacy', action='store_true',
+                        help='従来の QPushButton + QGraphicsProxyWidget 方式とも比較する')
+    args = parser.parse_args()
+
+    app = QApplication(sys.argv[:1])
+    nodes, edges = build_synthetic_layout(args.nodes)
+    # 描画時間はプラットフォーム（offscreen / xcb など）で変わるので一緒に表示する
+    print(f"ノード {len(nodes)} 件, エッジ {len(edges)} 件 ({app.platformName()})")
+
+    view = measure('GraphVisualizer', lambda: GraphVisualizer(nodes, edges))
+    targets = random.Random(2).sample(list(nodes), min(200, len(nodes)))
+    print(f"{'':16s} クリック {click_time(view, targets) * 1000:8.3f} ms  "
+          f"推移的 {click_time(view, targets[:20], True) * 1000:8.1f} ms")
+    if args.legacy:
+        def build_legacy():
+            view = QGraphicsView()
+            scene = QGraphicsScene(view)
+            view.setScene(scene)
+            view.setRenderHint(QPainter.Antialiasing)
+            legacy_populate(scene, nodes, edges)
+            return view
+        measure('legacy', build_legacy)
+
+
+if __name__ == "__main__":
+    main()
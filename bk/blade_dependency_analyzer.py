@@ -1,9 +1,16 @@
 # step2_blade_dependency_analyzer.py
 import os
+import sys
 import glob
 import re
 from typing import Dict, List
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from blade_directive_scanner import scan_directives  # noqa: E402  ディレクティブの一括走査
+
+# @yield はビュー名ではなくセクション名を取るため、一括走査とは別に拾う
+YIELD_PATTERN = re.compile(r'@yield\s*\(\s*[\'"]([^\'"]+)[\'"]')
+
 
 class BladeDependencyAnalyzer:
     def __init__(self, directory: str):
@@ -20,9 +27,9 @@ class BladeDependencyAnalyzer:
         directives = {'extends': [], 'include': [], 'includewhen': [], 'yield': []}
         with open(file_path, 'r', encoding='utf-8') as file:
             content = file.read()
-            for directive in directives:
-                pattern = r'@' + directive + r'\s*\(\s*[\'"]([^\'"]+)[\'"]\s*\)'
-                directives[directive].extend(re.findall(pattern, content))
+            for edge in scan_directives(content):
+                directives.setdefault(edge.type.lower(), []).append(edge.name)
+            directives['yield'].extend(YIELD_PATTERN.findall(content))
         relative_path = os.path.relpath(file_path, self.directory)
         self.dependencies[relative_path] = directives
 
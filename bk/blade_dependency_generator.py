@@ -1,49 +1,96 @@
 import os
-import re
+import sys
 import subprocess
+from collections import deque
 from datetime import datetime
 from tqdm import tqdm  # 進捗表示用ライブラリ
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from blade_directive_scanner import scan_directives  # noqa: E402  ディレクティブの一括走査
+
+
+# 進捗を送る間隔（ファイル数）
+PROGRESS_INTERVAL = 50
+
+
+# Bladeファイルを列挙する関数（相対パス, 実ファイルのパス, mtime, サイズ）
+def list_blade_files(root_dir, check_cancelled=None):
+    found = []
+    for root, dirs, files in os.walk(root_dir):
+        if check_cancelled:
+            check_cancelled()
+        for file in files:
+            if file.endswith('.blade.php'):
+                full_path = os.path.join(root, file)
+                st = os.stat(full_path)
+                found.append((os.path.relpath(full_path, root_dir), full_path, st.st_mtime_ns, st.st_size))
+    return found
+
 
 # Bladeファイルの依存関係を解析する関数
-def find_blade_dependencies(root_dir):
+# report(stage, done, total) を渡すと進捗を送り、check_cancelled() でキャンセルを確認する
+# parse_cache（実ファイルのパス -> (mtime, サイズ, 依存先)）を渡すと、変更のないファイルは再解析しない
+def find_blade_dependencies(root_dir, report=None, check_cancelled=None, parse_cache=None):
     dependencies = {}
     reverse_dependencies = {}
 
-    for root, dirs, files in tqdm(os.walk(root_dir), desc="Scanning Blade files"):
-        for file in tqdm(files, desc="Processing files", leave=False):
-            if file.endswith('.blade.php'):
-                filepath = os.path.relpath(os.path.join(root, file), root_dir)
-                with open(os.path.join(root, file), 'r', encoding='utf-8') as f:
-                    content = f.read()
-                    patterns = ['@include\\([\'"]([^\'"]+)[\'"]\\)', '@extends\\([\'"]([^\'"]+)[\'"]\\)',
-                                '@component\\([\'"]([^\'"]+)[\'"]\\)']
-                    for pattern in patterns:
-                        matches = re.findall(pattern, content)  # パターンマッチング
-                        if matches:
-                            # 依存関係のリストに追加
-                            for match in matches:
-                                target_path = match.replace('.', '/') + '.blade.php'  # ファイルパスに変換
-                                dependencies.setdefault(filepath, set()).add(target_path)
-                                reverse_dependencies.setdefault(target_path, set()).add(filepath)
+    if report:
+        report('scan')
+    files = list_blade_files(root_dir, check_cancelled)
+    total = len(files)
+    if report:
+        report('parse', 0, total)
+    else:
+        files = tqdm(files, desc="Processing files")
+
+    for done, (filepath, full_path, mtime, size) in enumerate(files, 1):
+        cached = parse_cache.get(full_path) if parse_cache is not None else None
+        if cached and cached[0] == mtime and cached[1] == size:
+            targets = cached[2]
+        else:
+            with open(full_path, 'r', encoding='utf-8') as f:
+                content = f.read()
+            # 全ディレクティブを1回の走査で抽出し、依存先のパスに変換
+            targets = [edge.name.replace('.', '/') + '.blade.php' for edge in scan_directives(content)]
+            if parse_cache is not None:
+                parse_cache[full_path] = (mtime, size, targets)
+        for target_path in targets:
+            dependencies.setdefault(filepath, set()).add(target_path)
+            reverse_dependencies.setdefault(target_path, set()).add(filepath)
+        if report and (done % PROGRESS_INTERVAL == 0 or done == total):
+            report('parse', done, total)
+            if check_cancelled:
+                check_cancelled()
     return dependencies, reverse_dependencies
 
 
+# ディレクトリの状態（ファイルの一覧と mtime・サイズ）を表す値。同じなら前回の結果を再利用できる
+def directory_signature(root_dir):
+    return hash(tuple(sorted((path, mtime, size) for path, _, mtime, size in list_blade_files(root_dir))))
+
+
 # DOTファイルを生成する関数
-def generate_dot(dependencies, output_file, start_file=None):
+def generate_dot(dependencies, output_file, start_file=None, max_depth=None):
     with open(output_file, 'w') as f:
         f.write('digraph G { rankdir=LR; node [shape=box, style=filled, color=lightblue]; \n')
 
+        written = set()  # 同じエッジを二重に書かない
         if start_file:
-            visited = set()
-            stack = [start_file]
-            while stack:
-                current = stack.pop()
-                if current in dependencies:
-                    for target in dependencies[current]:
+            # 幅優先でたどり、max_depth 段先までに制限する
+            visited = {start_file}
+            queue = deque([(start_file, 0)])
+            while queue:
+                current, depth = queue.popleft()
+                if current not in dependencies or (max_depth is not None and depth >= max_depth):
+                    continue
+                for target in dependencies[current]:
+                    if (current, target) not in written:
+                        written.add((current, target))
                         # 引用符の不一致や特殊文字を避ける
                         f.write(f' "{current}" -> "{target}";\n')
-                        stack.append(target)
+                    if target not in visited:  # 循環参照で無限ループしないように
+                        visited.add(target)
+                        queue.append((target, depth + 1))
 
         else:
             for source, targets in dependencies.items():
@@ -53,14 +100,33 @@ def generate_dot(dependencies, output_file, start_file=None):
         f.write('}\n')
 
 
-# 画像ファイルを生成する関数
-def generate_image_from_dot(dot_file, image_file):
-    subprocess.run(['dot', '-Tpng', dot_file, '-o', image_file], check=True)
+# 画像ファイルを生成する関数（check_cancelled を渡すと、キャンセルされたら dot を止める）
+def generate_image_from_dot(dot_file, image_file, check_cancelled=None):
+    if check_cancelled is None:
+        subprocess.run(['dot', '-Tpng', dot_file, '-o', image_file], check=True)
+        return
+    process = subprocess.Popen(['dot', '-Tpng', dot_file, '-o', image_file])
+    while True:
+        try:
+            returncode = process.wait(timeout=0.1)
+            break
+        except subprocess.TimeoutExpired:
+            try:
+                check_cancelled()
+            except Exception:
+                process.kill()
+                process.wait()
+                raise
+    if returncode != 0:
+        raise subprocess.CalledProcessError(returncode, process.args)
 
 
 # 関係図を生成する関数
-def generate_graphs(blade_directory, output_base_dir, start_file=None):
-    dependencies, reverse_dependencies = find_blade_dependencies(blade_directory)
+# report / check_cancelled / parse_cache は find_blade_dependencies と同じ（レイアウトの開始・終了も report する）
+def generate_graphs(blade_directory, output_base_dir, start_file=None, report=None, check_cancelled=None,
+                    parse_cache=None):
+    dependencies, reverse_dependencies = find_blade_dependencies(blade_directory, report, check_cancelled,
+                                                                 parse_cache)
 
     dot_dir = os.path.join(output_base_dir, 'dot')
     png_dir = os.path.join(output_base_dir, 'png')
@@ -73,7 +139,11 @@ def generate_graphs(blade_directory, output_base_dir, start_file=None):
     png_output = os.path.join(png_dir, f'dependency_graph_{timestamp}.png')
 
     generate_dot(dependencies, dot_output, start_file)
-    generate_image_from_dot(dot_output, png_output)
+    if report:
+        report('layout')
+    generate_image_from_dot(dot_output, png_output, check_cancelled)
+    if report:
+        report('layout_done')
 
     return png_output
 
@@ -1,14 +1,24 @@
 import tkinter as tk
 from tkinter import filedialog, messagebox
 from tkinter.ttk import Progressbar
-from PIL import Image, ImageTk
 import os
-import threading
-from blade_dependency_generator import generate_graphs  # Blade依存関係生成スクリプトをインポート
+from blade_dependency_generator import generate_graphs, directory_signature  # Blade依存関係生成スクリプトをインポート
+from task_runner import TaskRunner
+from tiled_image import TiledImageView, build_pyramid, bind_view_controls
 
 # デフォルトディレクトリを変数で設定
 default_dir = os.path.expanduser('~/Sites/event-form.jp/program/laravel/resources/views')  # デフォルトディレクトリ
 
+# 進捗の段階ごとの表示
+STAGE_LABELS = {
+    'scan': "Scanning Blade files...",
+    'parse': "Parsing {done}/{total} files",
+    'layout': "Laying out graph (dot)...",
+    'layout_done': "Layout done",
+    'tiles': "Cutting tiles {done}/{total}",
+    'reused': "No changes since the last run",
+}
+
 
 # GUIアプリケーションクラス
 class BladeDependencyApp(tk.Tk):
@@ -34,23 +44,37 @@ class BladeDependencyApp(tk.Tk):
         self.scroll_y.pack(side=tk.RIGHT, fill=tk.Y)
         self.canvas.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
 
-        # 進捗バー
-        self.progress_bar = Progressbar(self, mode='indeterminate')
+        # 進捗バーと進捗の表示
+        self.progress_bar = Progressbar(self, mode='determinate')
         self.progress_bar.pack(pady=10)
+        self.status_label = tk.Label(self, text="")
+        self.status_label.pack()
 
-        # ディレクトリ選択ボタン
+        # ディレクトリ選択ボタンとキャンセルボタン
         self.select_dir_button = tk.Button(self, text="Select Blade Directory", command=self.select_directory)
         self.select_dir_button.pack(pady=10)
+        self.cancel_button = tk.Button(self, text="Cancel", command=self.cancel_processing, state=tk.DISABLED)
+        self.cancel_button.pack()
 
         self.blade_directory = None
         self.selected_item = None  # 選択されたアイテム
 
+        # 生成処理はワーカースレッドで実行し、進捗は after() でメインスレッドに届ける
+        self.runner = TaskRunner(self)
+        # ディレクトリごとの前回の結果（ディレクトリの状態, 画像のパス, タイルのディレクトリ）と解析結果のキャッシュ
+        self.results = {}
+        self.parse_caches = {}
+
         # マウススクロールのイベントを設定
         self.bind_mouse_scroll()  # マウスホイールイベントをバインド
 
         # キャンバス上でクリックしたときのイベントを設定
         self.canvas.bind("<Button-1>", self.on_canvas_click)  # 左クリックイベントをバインド
 
+        # 表示中のグラフ（タイル表示）の拡大・縮小とドラッグでの移動
+        self.graph_view = None
+        bind_view_controls(self.canvas, lambda: self.graph_view)
+
     def bind_mouse_scroll(self):
         # 縦スクロール
         self.canvas.bind_all("<MouseWheel>", self.on_mouse_wheel)  # WindowsとMac用
@@ -81,16 +105,61 @@ class BladeDependencyApp(tk.Tk):
             self.process_directory()  # ディレクトリ選択後の処理
 
     def process_directory(self):
-        self.progress_bar.start()  # 進捗バーを開始
-
-        def process():
+        directory = self.blade_directory
+        previous = self.results.get(directory)
+        parse_cache = self.parse_caches.setdefault(directory, {})
+
+        def process(report, check_cancelled):
+            # ワーカースレッドで実行する（ウィジェットには触らない）
+            signature = directory_signature(directory)
+            if previous and previous[0] == signature and os.path.exists(previous[1]):
+                # 前回から変更がなければ、前回の画像をそのまま使う
+                report('reused')
+                return signature, previous[1], build_pyramid(previous[1], report=report, check_cancelled=check_cancelled)
             # 関係図を生成
-            png_file = generate_graphs(self.blade_directory, "../graph_output")
-            self.show_graph(png_file)  # 生成された画像を表示
-
-            self.progress_bar.stop()  # 進捗バーを停止
-
-        threading.Thread(target=process).start()  # スレッドで処理
+            png_file = generate_graphs(directory, "../graph_output", report=report,
+                                       check_cancelled=check_cancelled, parse_cache=parse_cache)
+            # 画像をタイルに切り分けておく（表示では見えている部分のタイルだけを読み込む）
+            pyramid = build_pyramid(png_file, report=report, check_cancelled=check_cancelled)
+            return signature, png_file, pyramid
+
+        def done(result):
+            self.results[directory] = result
+            self.finish_processing("Done")
+            self.show_graph(result[2])  # 生成された画像をタイルで表示
+
+        def failed(error):
+            self.finish_processing("Failed")
+            messagebox.showerror("Error", str(error))
+
+        if self.runner.submit(process, on_progress=self.show_progress, on_done=done, on_error=failed,
+                              on_cancelled=lambda: self.finish_processing("Cancelled")):
+            self.select_dir_button.config(state=tk.DISABLED)
+            self.cancel_button.config(state=tk.NORMAL)
+            self.progress_bar.config(mode='determinate', value=0)
+
+    def show_progress(self, stage, done=None, total=None):
+        # 件数が分かる段階は確定的な進捗、分からない段階は不確定な進捗で表示する
+        if total:
+            if str(self.progress_bar['mode']) != 'determinate':
+                self.progress_bar.stop()
+                self.progress_bar.config(mode='determinate')
+            self.progress_bar.config(maximum=total, value=done)
+        elif stage in ('scan', 'layout'):
+            self.progress_bar.config(mode='indeterminate')
+            self.progress_bar.start()
+        self.status_label.config(text=STAGE_LABELS.get(stage, stage).format(done=done, total=total))
+
+    def cancel_processing(self):
+        self.runner.cancel()
+        self.status_label.config(text="Cancelling...")
+
+    def finish_processing(self, message):
+        self.progress_bar.stop()
+        self.progress_bar.config(mode='determinate', value=0)
+        self.status_label.config(text=message)
+        self.select_dir_button.config(state=tk.NORMAL)
+        self.cancel_button.config(state=tk.DISABLED)
 
     def on_canvas_click(self, event):
         # キャンバス上でクリックしたときの処理
@@ -109,13 +178,13 @@ class BladeDependencyApp(tk.Tk):
                 if item_text in self.canvas.itemcget(arrow, "text"):
                     self.canvas.itemconfig(arrow, fill='blue')  # 矢印の色を青に変更
 
-    def show_graph(self, png_file):
+    def show_graph(self, pyramid_directory):
         if self.blade_directory:
-            # 画像を読み込み、キャンバスに表示
-            image = Image.open(png_file)
-            self.canvas.config(scrollregion=(0, 0, image.width, image.height))  # スクロール領域を設定
-            self.tk_image = ImageTk.PhotoImage(image)
-            self.canvas.create_image(0, 0, image=self.tk_image, anchor=tk.NW)  # 左上基点で表示
+            # 画像全体は読み込まず、見えている範囲のタイルだけをキャンバスに表示
+            if self.graph_view is not None:
+                self.graph_view.close()
+            self.graph_view = TiledImageView(self.canvas, pyramid_directory,
+                                             xscroll=self.scroll_x.set, yscroll=self.scroll_y.set)
 
         else:
             messagebox.showwarning("Error", "Please select a Blade directory first.")
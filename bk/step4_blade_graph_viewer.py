@@ -1,6 +1,7 @@
 import tkinter as tk
-from tkinter import Canvas, Scrollbar, PhotoImage
+from tkinter import Canvas, Scrollbar
 from graphviz import render
+from tiled_image import TiledImageView, build_pyramid, bind_view_controls
 
 
 class BladeGraphApp(tk.Tk):
@@ -26,6 +27,10 @@ class BladeGraphApp(tk.Tk):
             self.canvas.bind_all("<Button-4>", self.on_vertical_scroll)  # Macでのマウスホイールアップ
             self.canvas.bind_all("<Button-5>", self.on_vertical_scroll)  # Macでのマウスホイールダウン
 
+        # Ctrl+マウスホイール・+/- キーで拡大・縮小、ドラッグで移動
+        self.graph_view = None
+        bind_view_controls(self.canvas, lambda: self.graph_view)
+
         # Dotファイルから画像を生成
         self.graph_image_path = self.generate_graph_image('../dependency_graph.dot', 'png')
 
@@ -39,11 +44,11 @@ class BladeGraphApp(tk.Tk):
         return output_path
 
     def display_graph(self):
-        """生成したグラフ画像を表示する"""
-        img = PhotoImage(file=self.graph_image_path)
-        self.canvas.create_image(0, 0, anchor="nw", image=img)
-        self.canvas.image = img  # 画像の参照を保持しておく
-        self.canvas.config(scrollregion=self.canvas.bbox("all"))
+        """生成したグラフ画像をタイルに切り分け、見えている範囲のタイルだけを表示する"""
+        pyramid = build_pyramid(self.graph_image_path)
+        if self.graph_view is not None:
+            self.graph_view.close()
+        self.graph_view = TiledImageView(self.canvas, pyramid, xscroll=self.hsb.set, yscroll=self.vsb.set)
 
     def on_vertical_scroll(self, event):
         """垂直スクロールを処理する"""
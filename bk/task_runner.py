@@ -0,0 +1,99 @@
+import queue
+import threading
+
+
+class TaskCancelled(Exception):
+    """タスクがキャンセルされたときにワーカー側で送出する"""
+
+
+class TaskRunner:
+    """重い処理をワーカースレッドで1つずつ実行し、進捗と結果を Tk のメインスレッドに届ける
+
+    ワーカーはウィジェットに直接触らず、イベントをキューに積むだけにする。
+    メインスレッドは widget.after() で定期的にキューを取り出し、コールバックを呼ぶ
+
+    タスクは task(report, check_cancelled) という関数で、
+    report(stage, done, total) で進捗を送り、適宜 check_cancelled() を呼ぶ（キャンセルされていれば TaskCancelled）
+    """
+
+    def __init__(self, widget, poll_interval=50):
+        self.widget = widget
+        self.poll_interval = poll_interval
+        self.events = queue.Queue()
+        self.cancel_event = threading.Event()
+        self.thread = None
+        self.callbacks = None
+
+    @property
+    def running(self):
+        return self.thread is not None
+
+    def submit(self, task, on_progress=None, on_done=None, on_error=None, on_cancelled=None):
+        """タスクを開始する（実行中なら False を返して何もしない）"""
+        if self.running:
+            return False
+        self.cancel_event.clear()
+        self.callbacks = {
+            'progress': on_progress,
+            'done': on_done,
+            'error': on_error,
+            'cancelled': on_cancelled,
+        }
+        self.thread = threading.Thread(target=self.work, args=(task,), daemon=True)
+        self.thread.start()
+        self.widget.after(self.poll_interval, self.poll)
+        return True
+
+    def cancel(self):
+        """実行中のタスクにキャンセルを伝える（タスクが次に check_cancelled() を呼んだ時点で止まる）"""
+        self.cancel_event.set()
+
+    def work(self, task):
+        """ワーカースレッド: タスクを実行し、結果をキューに積む"""
+        def report(stage, done=None, total=None):
+            self.events.put(('progress', (stage, done, total)))
+
+        def check_cancelled():
+            if self.cancel_event.is_set():
+                raise TaskCancelled()
+
+        try:
+            result = task(report, check_cancelled)
+        except TaskCancelled:
+            self.events.put(('cancelled', ()))
+        except Exception as e:  # ワーカーの例外はメインスレッドで表示する
+            self.events.put(('error', (e,)))
+        else:
+            self.events.put(('done', (result,)))
+
+    def poll(self):
+        """メインスレッド: 溜まったイベントを処理し、タスクが終わるまで after() で繰り返す"""
+        latest_progress = None
+        while True:
+            try:
+                kind, args = self.events.get_nowait()
+            except queue.Empty:
+                break
+            if kind == 'progress':
+                # 同じ段階の進捗は最後のものだけ反映すれば十分
+                if latest_progress is not None and latest_progress[0] != args[0]:
+                    self.dispatch('progress', latest_progress)
+                latest_progress = args
+                continue
+            if latest_progress is not None:
+                self.dispatch('progress', latest_progress)
+                latest_progress = None
+            # 終了したので、コールバックから次のタスクを submit できるようにしてから呼ぶ
+            callback = self.callbacks[kind]
+            self.thread = None
+            if callback:
+                callback(*args)
+            return
+        if latest_progress is not None:
+            self.dispatch('progress', latest_progress)
+        self.widget.after(self.poll_interval, self.poll)
+
+    def dispatch(self, kind, args):
+        callback = self.callbacks[kind]
+        if callback:
+            callback(*args)
@@ -0,0 +1,298 @@
+import os
+import json
+import math
+import shutil
+import hashlib
+from collections import OrderedDict
+
+# タイル1枚の大きさ（ピクセル）
+TILE_SIZE = 256
+# タイルのピラミッドを置くディレクトリ（bk から実行する前提で、graph_output と同じくリポジトリ直下）
+TILE_CACHE_DIR = '../.blade_tiles'
+# メモリに残しておくタイル画像の最大数（表示中のタイルは数えない）
+MAX_CACHED_TILES = 256
+# ディスクに残しておくピラミッドの最大数（古いものから消す）
+MAX_PYRAMIDS = 8
+# 拡大表示するときの最大倍率（元の画像の1ピクセルを何ピクセルで描くか）
+MAX_MAGNIFY = 4
+
+
+def pyramid_key(image_path):
+    """画像のパス・mtime・サイズから、ピラミッドのディレクトリ名を作る（画像が変われば別のディレクトリ）"""
+    st = os.stat(image_path)
+    source = f"{os.path.abspath(image_path)}:{st.st_mtime_ns}:{st.st_size}"
+    return hashlib.sha1(source.encode('utf-8')).hexdigest()[:16]
+
+
+def build_pyramid(image_path, cache_dir=TILE_CACHE_DIR, tile_size=TILE_SIZE, report=None, check_cancelled=None):
+    """画像をタイルに切り分け、1/2 ずつ縮小した段ごとに <段>/<列>_<行>.png として保存する
+
+    作成済みならそのまま再利用する。戻り値はピラミッドのディレクトリ
+    （元の画像を読み込むのはこのときだけで、表示では見えているタイルしか読み込まない）
+    作り直した画像の古いピラミッドは消し、全体でも MAX_PYRAMIDS 個までしか残さない
+    """
+    from PIL import Image
+
+    directory = os.path.join(cache_dir, pyramid_key(image_path))
+    meta_path = os.path.join(directory, 'meta.json')
+    if os.path.exists(meta_path):
+        # 最近使ったピラミッドとして残るように、meta.json の mtime を更新しておく
+        os.utime(meta_path)
+        return directory
+
+    # 大きなグラフの画像は Pillow の既定の上限を超えるので上限を外す
+    Image.MAX_IMAGE_PIXELS = None
+    tmp_directory = directory + '.tmp'
+    shutil.rmtree(tmp_directory, ignore_errors=True)
+    with Image.open(image_path) as source:
+        current = source.convert('RGBA') if source.mode not in ('RGB', 'RGBA') else source.copy()
+    width, height = current.size
+    levels = max(1, math.ceil(math.log2(max(width, height) / tile_size)) + 1)
+    total = sum(math.ceil(math.ceil(width / 2 ** level) / tile_size) * math.ceil(math.ceil(height / 2 ** level) / tile_size)
+                for level in range(levels))
+    done = 0
+    for level in range(levels):
+        level_directory = os.path.join(tmp_directory, str(level))
+        os.makedirs(level_directory)
+        columns = math.ceil(current.width / tile_size)
+        rows = math.ceil(current.height / tile_size)
+        for row in range(rows):
+            if check_cancelled:
+                check_cancelled()
+            for column in range(columns):
+                box = (column * tile_size, row * tile_size,
+                       min(current.width, (column + 1) * tile_size), min(current.height, (row + 1) * tile_size))
+                current.crop(box).save(os.path.join(level_directory, f"{column}_{row}.png"))
+                done += 1
+            if report:
+                report('tiles', done, total)
+        if level + 1 < levels:
+            current = current.resize((max(1, math.ceil(current.width / 2)), max(1, math.ceil(current.height / 2))),
+                                     Image.LANCZOS)
+    with open(os.path.join(tmp_directory, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump({'width': width, 'height': height, 'tile_size': tile_size, 'levels': levels,
+                   'source': os.path.abspath(image_path)}, f)
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(tmp_directory, directory)
+    prune_pyramids(cache_dir, directory)
+    return directory
+
+
+def prune_pyramids(cache_dir, current, max_pyramids=MAX_PYRAMIDS):
+    """current と同じ画像から作った古いピラミッドを消し、残りも新しい順に max_pyramids 個までにする
+
+    作成途中（.tmp）のディレクトリと current 自身は消さない
+    """
+    with open(os.path.join(current, 'meta.json'), encoding='utf-8') as f:
+        source = json.load(f).get('source')
+    pyramids = []
+    for name in os.listdir(cache_dir):
+        directory = os.path.join(cache_dir, name)
+        meta_path = os.path.join(directory, 'meta.json')
+        if name.endswith('.tmp') or os.path.samefile(directory, current) or not os.path.exists(meta_path):
+            continue
+        try:
+            with open(meta_path, encoding='utf-8') as f:
+                replaced = json.load(f).get('source') == source
+            mtime = os.stat(meta_path).st_mtime_ns
+        except (OSError, ValueError):
+            continue
+        if replaced:
+            shutil.rmtree(directory, ignore_errors=True)
+        else:
+            pyramids.append((mtime, directory))
+    pyramids.sort(reverse=True)
+    for _, directory in pyramids[max(0, max_pyramids - 1):]:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+class TiledImageView:
+    """タイルのピラミッドを Canvas に表示する（見えている範囲のタイルだけを読み込む）
+
+    縮小は 1/2 ずつ段を切り替え、等倍より大きくするときは段0のタイルを整数倍に拡大する
+    xscroll / yscroll にはスクロールバーの set を渡す（表示範囲が変わるたびにタイルを読み直す）
+    """
+
+    def __init__(self, canvas, pyramid_directory, xscroll=None, yscroll=None, max_cached=MAX_CACHED_TILES):
+        import tkinter as tk
+        self.tk = tk
+        self.canvas = canvas
+        self.directory = pyramid_directory
+        with open(os.path.join(pyramid_directory, 'meta.json'), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        self.width = meta['width']
+        self.height = meta['height']
+        self.tile_size = meta['tile_size']
+        self.levels = meta['levels']
+        self.max_cached = max_cached
+        self.xscroll = xscroll
+        self.yscroll = yscroll
+        self.items = {}
+        self.photos = OrderedDict()
+        self.refresh_pending = False
+        self.closed = False
+        # 倍率は 2 の累乗（負なら縮小の段、正なら拡大）。最初は画面の幅に収まる段にする
+        # まだ表示されていない Canvas は幅が 1 なので、画面の幅で代用する
+        canvas_width = canvas.winfo_width() if canvas.winfo_width() > 1 else canvas.winfo_screenwidth()
+        self.zoom_level = -min(self.levels - 1, max(0, math.ceil(math.log2(max(1, self.width / canvas_width)))))
+        canvas.delete('all')
+        canvas.configure(xscrollcommand=self.on_xscroll, yscrollcommand=self.on_yscroll)
+        self.update_scrollregion()
+        self.refresh()
+
+    @property
+    def level(self):
+        return max(0, -self.zoom_level)
+
+    @property
+    def magnify(self):
+        return 2 ** max(0, self.zoom_level)
+
+    def level_size(self):
+        """表示中の段の画像の大きさ（拡大分を含む）"""
+        scale = 2 ** self.level
+        return (math.ceil(self.width / scale) * self.magnify, math.ceil(self.height / scale) * self.magnify)
+
+    def update_scrollregion(self):
+        width, height = self.level_size()
+        self.canvas.configure(scrollregion=(0, 0, width, height))
+
+    def on_xscroll(self, *args):
+        if self.xscroll:
+            self.xscroll(*args)
+        self.schedule_refresh()
+
+    def on_yscroll(self, *args):
+        if self.yscroll:
+            self.yscroll(*args)
+        self.schedule_refresh()
+
+    def schedule_refresh(self):
+        # スクロール中に何度も呼ばれるので、アイドル時に1回だけ読み直す
+        if not self.refresh_pending:
+            self.refresh_pending = True
+            self.canvas.after_idle(self.refresh)
+
+    def visible_tiles(self):
+        """表示範囲に入っているタイルの (段, 列, 行) の集合"""
+        level = self.level
+        displayed = self.tile_size * self.magnify
+        width, height = self.level_size()
+        left = max(0, self.canvas.canvasx(0))
+        top = max(0, self.canvas.canvasy(0))
+        right = min(width, left + self.canvas.winfo_width())
+        bottom = min(height, top + self.canvas.winfo_height())
+        columns = range(int(left // displayed), int(math.ceil(right / displayed)))
+        rows = range(int(top // displayed), int(math.ceil(bottom / displayed)))
+        return {(level, column, row) for column in columns for row in rows}
+
+    def photo(self, key):
+        """タイル画像を読み込む（最近使ったものはメモリに残しておく）"""
+        photo = self.photos.get(key)
+        if photo is not None:
+            self.photos.move_to_end(key)
+            return photo
+        level, column, row = key
+        try:
+            photo = self.tk.PhotoImage(file=os.path.join(self.directory, str(level), f"{column}_{row}.png"))
+        except self.tk.TclError:
+            # 差し替え前のビューのピラミッドは、新しいピラミッドを作ったときに消えていることがある
+            return None
+        if self.magnify > 1:
+            photo = photo.zoom(self.magnify)
+        self.photos[key] = photo
+        return photo
+
+    def refresh(self):
+        """表示範囲のタイルを配置し、範囲外になったタイルを外す"""
+        self.refresh_pending = False
+        if self.closed:
+            # 別のグラフに差し替えたあとに、予約済みの読み直しが走っても何もしない
+            return
+        visible = self.visible_tiles()
+        displayed = self.tile_size * self.magnify
+        for key in list(self.items):
+            if key not in visible:
+                self.canvas.delete(self.items.pop(key))
+        for key in sorted(visible - self.items.keys()):
+            _, column, row = key
+            photo = self.photo(key)
+            if photo is None:
+                continue
+            self.items[key] = self.canvas.create_image(column * displayed, row * displayed, anchor='nw',
+                                                       image=photo)
+        # 表示していないタイルから古い順にメモリを解放する
+        for key in list(self.photos):
+            if len(self.photos) <= self.max_cached + len(self.items):
+                break
+            if key not in self.items:
+                del self.photos[key]
+
+    def close(self):
+        """別のグラフに差し替える前に呼ぶ（タイルを外し、読み込み済みの画像を捨てる）"""
+        self.closed = True
+        for item in self.items.values():
+            self.canvas.delete(item)
+        self.items.clear()
+        self.photos.clear()
+
+    def zoom(self, steps, x=None, y=None):
+        """steps 段だけ拡大（負なら縮小）する。x, y（Canvas 上の位置）の下にある点を動かさない"""
+        zoom_level = max(-(self.levels - 1), min(int(math.log2(MAX_MAGNIFY)), self.zoom_level + steps))
+        if zoom_level == self.zoom_level:
+            return
+        if x is None:
+            x = self.canvas.winfo_width() / 2
+            y = self.canvas.winfo_height() / 2
+        old_width, old_height = self.level_size()
+        fraction_x = min(1.0, self.canvas.canvasx(x) / old_width)
+        fraction_y = min(1.0, self.canvas.canvasy(y) / old_height)
+
+        self.zoom_level = zoom_level
+        for item in self.items.values():
+            self.canvas.delete(item)
+        self.items.clear()
+        # 倍率が変わるとタイル画像も変わるので、読み込み済みのものは捨てる
+        self.photos.clear()
+        self.update_scrollregion()
+        width, height = self.level_size()
+        self.canvas.xview_moveto(max(0.0, (fraction_x * width - x) / width))
+        self.canvas.yview_moveto(max(0.0, (fraction_y * height - y) / height))
+        self.schedule_refresh()
+
+
+def bind_view_controls(canvas, view_getter):
+    """Ctrl+マウスホイールと +/- キーで拡大・縮小、ドラッグで移動できるようにする（Canvas ごとに1回だけ呼ぶ）
+
+    view_getter: 表示中の TiledImageView を返す関数（まだなければ None）
+    """
+    def on_wheel(event):
+        view = view_getter()
+        if view is None:
+            return
+        steps = 1 if event.num == 4 or getattr(event, 'delta', 0) > 0 else -1
+        # bind_all なので、マウスの位置は Canvas を基準に測り直す
+        view.zoom(steps, event.x_root - canvas.winfo_rootx(), event.y_root - canvas.winfo_rooty())
+        return 'break'
+
+    def on_key(steps):
+        view = view_getter()
+        if view is not None:
+            view.zoom(steps)
+
+    canvas.bind_all('<Control-MouseWheel>', on_wheel)
+    canvas.bind_all('<Control-Button-4>', on_wheel)
+    canvas.bind_all('<Control-Button-5>', on_wheel)
+    canvas.bind_all('<plus>', lambda event: on_key(1))
+    canvas.bind_all('<minus>', lambda event: on_key(-1))
+
+    def on_configure(event):
+        # ウィンドウの大きさが変わったら、表示中のビューだけがタイルを読み直す
+        view = view_getter()
+        if view is not None:
+            view.schedule_refresh()
+
+    canvas.bind('<Configure>', on_configure, add='+')
+    # スクロールすると xscrollcommand 経由でタイルが読み直される
+    canvas.bind('<ButtonPress-1>', lambda event: canvas.scan_mark(event.x, event.y), add='+')
+    canvas.bind('<B1-Motion>', lambda event: canvas.scan_dragto(event.x, event.y, gain=1), add='+')
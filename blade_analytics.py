@@ -0,0 +1,200 @@
+"""依存関係グラフの健全性を調べる（循環・どこからも使われていないファイル・依存の深さ・被依存数）
+
+- 循環: Tarjan の強連結成分分解（2ファイル以上の成分と自己参照）。描画時に無限に include される
+- 孤立: どこからも include / extends などされていないファイル（ページとして描画されるものは --entry で除く）
+- 深さ: 強連結成分を縮約したグラフ上の最長の依存の連鎖（--type extends なら extends の段数）
+- 被依存数: 直接 include / extends などしているファイルの数の上位
+
+どれもノード数 + エッジ数に比例する時間で求める。結果はJSONで出力し、
+循環があれば終了コード 1 を返すのでデプロイ前のチェックに使える
+
+使用方法: python blade_analytics.py [--type extends] [--entry 'pages/*'] [--output analytics.json]
+"""
+import sys
+import json
+import argparse
+from fnmatch import fnmatch
+
+from blade_query import TYPE_CHOICES, DependencyIndex
+from blade_view_resolver import MISSING_PREFIX, is_unresolved
+
+# 被依存数の上位として出力する件数
+DEFAULT_TOP = 20
+
+
+def strongly_connected_components(nodes, adjacency):
+    """Tarjan のアルゴリズムで強連結成分を求める（再帰を使わない版）
+
+    成分は逆トポロジカル順（依存先の成分が先）に返る
+    """
+    index_of = {}
+    lowlink = {}
+    on_stack = set()
+    stack = []
+    components = []
+    counter = 0
+    for root in nodes:
+        if root in index_of:
+            continue
+        index_of[root] = lowlink[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(adjacency.get(root, ())))]
+        while work:
+            node, neighbors = work[-1]
+            for neighbor in neighbors:
+                if neighbor not in index_of:
+                    index_of[neighbor] = lowlink[neighbor] = counter
+                    counter += 1
+                    stack.append(neighbor)
+                    on_stack.add(neighbor)
+                    work.append((neighbor, iter(adjacency.get(neighbor, ()))))
+                    break
+                if neighbor in on_stack and index_of[neighbor] < lowlink[node]:
+                    lowlink[node] = index_of[neighbor]
+            else:
+                work.pop()
+                if work:
+                    parent = work[-1][0]
+                    if lowlink[node] < lowlink[parent]:
+                        lowlink[parent] = lowlink[node]
+                if lowlink[node] == index_of[node]:
+                    component = []
+                    while True:
+                        member = stack.pop()
+                        on_stack.discard(member)
+                        component.append(member)
+                        if member == node:
+                            break
+                    components.append(component)
+    return components
+
+
+class GraphAnalytics:
+    """DependencyIndex の上で循環・孤立・深さ・被依存数を求める"""
+
+    def __init__(self, index, entries=()):
+        self.index = index
+        self.entries = list(entries)
+        self.nodes = list(dict.fromkeys(list(index.forward) + list(index.reverse)))
+        self.components = strongly_connected_components(self.nodes, index.forward)
+
+    def label(self, num):
+        return self.index.label(num)
+
+    def cycles(self):
+        """循環している依存関係（成分ごとのファイルのリスト）"""
+        forward = self.index.forward
+        cycles = []
+        for component in self.components:
+            if len(component) > 1 or component[0] in forward.get(component[0], ()):
+                cycles.append(sorted(self.label(num) for num in component))
+        return sorted(cycles)
+
+    def is_entry(self, num):
+        path = self.index.file_map.get(num)
+        return path is not None and any(fnmatch(path, pattern) for pattern in self.entries)
+
+    def orphans(self):
+        """どこからも依存されていないファイル（--entry に一致するものは除く）"""
+        reverse = self.index.reverse
+        return sorted(path for num, path in self.index.file_map.items()
+                      if not reverse.get(num) and not self.is_entry(num))
+
+    def isolated(self):
+        """orphans のうち、自身も何にも依存していないファイル"""
+        reverse = self.index.reverse
+        forward = self.index.forward
+        return sorted(path for num, path in self.index.file_map.items()
+                      if not reverse.get(num) and not forward.get(num) and not self.is_entry(num))
+
+    def depth(self):
+        """最長の依存の連鎖の段数とその経路
+
+        Tarjan の成分は依存先が先に出てくるので、その順に1回たどるだけで各成分の深さが決まる
+        （循環の中は1段として数える）
+        """
+        component_of = {}
+        for number, component in enumerate(self.components):
+            for num in component:
+                component_of[num] = number
+        forward = self.index.forward
+        depths = [0] * len(self.components)
+        following = [None] * len(self.components)
+        for number, component in enumerate(self.components):
+            for num in component:
+                for dep_num in forward.get(num, ()):
+                    dep_component = component_of[dep_num]
+                    if dep_component != number and depths[dep_component] + 1 > depths[number]:
+                        depths[number] = depths[dep_component] + 1
+                        following[number] = (num, dep_num)
+        if not depths:
+            return 0, []
+        deepest = max(range(len(depths)), key=depths.__getitem__)
+        chain = []
+        step = following[deepest]
+        while step is not None:
+            num, dep_num = step
+            if not chain:
+                chain.append(num)
+            elif chain[-1] != num:
+                # 循環の中を通る部分は、入ったノードと出るノードを並べる
+                chain.append(num)
+            chain.append(dep_num)
+            step = following[component_of[dep_num]]
+        if not chain:
+            chain = [self.components[deepest][0]]
+        return depths[deepest], [self.label(num) for num in chain]
+
+    def fan_in(self, top=DEFAULT_TOP):
+        """直接依存されている数の多いノードの上位 [(表示名, 数)]"""
+        counts = [(len(sources), num) for num, sources in self.index.reverse.items() if sources]
+        counts.sort(key=lambda item: (-item[0], self.label(item[1])))
+        return [{'file': self.label(num), 'fan_in': count} for count, num in counts[:top]]
+
+    def report(self, top=DEFAULT_TOP):
+        """すべての結果を1つの辞書にまとめる"""
+        max_depth, chain = self.depth()
+        cycles = self.cycles()
+        return {
+            'files': len(self.index.file_map),
+            'edges': len(self.index.edge_types),
+            'cycles': cycles,
+            'orphans': self.orphans(),
+            'isolated': self.isolated(),
+            'missing': sorted(num[len(MISSING_PREFIX):] for num in self.nodes if num.startswith(MISSING_PREFIX)),
+            'unresolved': sum(1 for num in self.nodes if is_unresolved(num)),
+            'max_depth': max_depth,
+            'deepest_chain': chain,
+            'fan_in': self.fan_in(top),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='依存関係の循環・孤立ファイル・深さ・被依存数を調べる')
+    parser.add_argument('--dependencies', default='blade_dependencies.json', help='依存関係JSONのパス')
+    parser.add_argument('--files', default='blade_files.json', help='ファイル番号JSONのパス')
+    parser.add_argument('--type', action='append', dest='types', metavar='TYPE', choices=TYPE_CHOICES,
+                        help='対象にする依存関係の種類（include, extends など。include は includeIf なども含む。複数指定可）')
+    parser.add_argument('--entry', action='append', default=[], metavar='GLOB',
+                        help="ページとして描画されるファイルのパターン（孤立として扱わない。例: 'pages/*'）")
+    parser.add_argument('--top', type=int, default=DEFAULT_TOP, help='被依存数の上位として出力する件数')
+    parser.add_argument('--output', '-o', metavar='PATH', help='結果のJSONをこのファイルに書き出す（デフォルト: 標準出力）')
+    args = parser.parse_args()
+
+    index = DependencyIndex.from_json(args.dependencies, args.files, args.types)
+    result = GraphAnalytics(index, args.entry).report(args.top)
+    text = json.dumps(result, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(text + '\n')
+    else:
+        print(text)
+    if result['cycles']:
+        print(f"循環している依存関係が {len(result['cycles'])} 件あります", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+"""複数の Laravel プロジェクトをまとめて解析する（夜間バッチ用）
+
+マニフェスト（JSON）に並べたプロジェクトごとに step1・step2・step3（DOTなどの書き出しまで）と
+blade_analytics に相当する処理を行い、結果をプロジェクトごとのディレクトリに書き出す。
+ファイルの読み込みと抽出は全プロジェクト分を1つのプロセスプールに投入するので、
+プールの起動は1回で済み、小さいプロジェクトが終わるのを待たずにワーカーが次のファイルを処理できる
+
+マニフェストの例（root・views_config はマニフェストのあるディレクトリからの相対パスでもよい）:
+    {"projects": [
+        {"name": "event-form", "root": "~/Sites/event-form.jp/program/laravel", "php": true, "entry": ["pages/*"]},
+        {"root": "~/Sites/shop/laravel", "exclude": ["vendor"], "expand_dynamic": true}
+    ]}
+
+出力:
+    <output>/<name>/ に blade_files.json, blade_dependencies.json, analytics.json, dependency_graph.<形式>
+    （番号インデックスと差分解析用キャッシュもここに置くので、次回は変更のあったファイルだけを読む）
+    <output>/summary.json にプロジェクトごとの件数・循環・処理時間
+
+失敗したプロジェクトは summary.json に理由を載せて他のプロジェクトの処理を続け、終了コード 1 を返す
+
+使用方法: python blade_batch.py projects.json [--output batch_output] [-j 8] [--format sqlite]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from blade_pipeline import DEFAULT_EXCLUDES, DEFAULT_INDEX_PATH, WRITERS
+from blade_analytics import DEFAULT_TOP, GraphAnalytics
+from blade_query import DependencyIndex
+from blade_profiler import profiler, add_profile_arguments, profile_run
+from blade_php_scanner import extract_php_references
+from step1_blade_enumerator import BladeEnumerator
+from step2_blade_dependency_analyzer import (DEFAULT_CACHE_PATH, BladeDependencyAnalyzer, extract_directives,
+                                             scan_chunk, split_chunks)
+from step3_generate_graph import create_dependency_graph
+
+DEFAULT_OUTPUT_DIRECTORY = 'batch_output'
+SUMMARY_FILE = 'summary.json'
+# 抽出の種類ごとの関数（ワーカープロセスに渡すのでモジュールの関数にする）
+EXTRACTORS = {
+    'blade': extract_directives,
+    'php': extract_php_references,
+}
+
+
+def load_manifest(path):
+    """マニフェストを読み込み、プロジェクトの設定のリストを返す
+
+    "projects" の代わりにリストだけ、設定の代わりに root のパスだけを書いてもよい。
+    name を省略するとルートのディレクトリ名になり、重なる場合は _2 などを付ける
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        manifest = json.load(f)
+    entries = manifest.get('projects', []) if isinstance(manifest, dict) else manifest
+    base = os.path.dirname(os.path.abspath(path))
+    projects = []
+    used = set()
+    for entry in entries:
+        if isinstance(entry, str):
+            entry = {'root': entry}
+        if not entry.get('root'):
+            raise ValueError(f"{path}: root のないプロジェクトがあります: {entry}")
+        config = dict(entry)
+        config['root'] = os.path.join(base, os.path.expanduser(entry['root']))
+        if entry.get('views_config'):
+            config['views_config'] = os.path.join(base, os.path.expanduser(entry['views_config']))
+        base_name = entry.get('name') or os.path.basename(os.path.normpath(config['root']))
+        name = base_name
+        suffix = 2
+        while name in used:
+            name = f"{base_name}_{suffix}"
+            suffix += 1
+        used.add(name)
+        config['name'] = name
+        projects.append(config)
+    return projects
+
+
+class BatchProject:
+    """1プロジェクト分の解析（列挙とキャッシュの照合 → 共有プールでの抽出 → 解決と書き出し）"""
+
+    def __init__(self, config, output_directory):
+        self.config = config
+        self.name = config['name']
+        self.directory = os.path.join(output_directory, self.name)
+        self.analyzer = None
+        # 'blade' / 'php' -> [(キー, 実ファイルのパス)] と {キー: 抽出結果}
+        self.items = {}
+        self.extracted = {}
+        # 結果を待っているチャンクの数と、ワーカーでの読み込み・抽出にかかった時間の合計
+        self.remaining = 0
+        self.parse_seconds = 0.0
+        self.timings = {}
+        self.error = None
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def fail(self, error):
+        self.error = f"{type(error).__name__}: {error}"
+
+    def prepare(self, use_cache=True):
+        """ファイルを列挙してキャッシュと照合し、読み込みが必要なファイルを {種類: [(キー, パス)]} で返す"""
+        start = time.perf_counter()
+        root = self.config['root']
+        views_directory = os.path.join(root, 'resources', 'views')
+        if not os.path.isdir(views_directory):
+            raise FileNotFoundError(f"ビューのディレクトリがありません: {views_directory}")
+        os.makedirs(self.directory, exist_ok=True)
+        excludes = DEFAULT_EXCLUDES + tuple(self.config.get('exclude', ()))
+        BladeEnumerator(views_directory, excludes, self.path(DEFAULT_INDEX_PATH),
+                        self.path('blade_files.json')).enumerate_blade_files()
+
+        cache_path = self.path(DEFAULT_CACHE_PATH) if use_cache else None
+        self.analyzer = BladeDependencyAnalyzer(self.path('blade_files.json'), root, cache_path,
+                                                views_config=self.config.get('views_config'),
+                                                expand_dynamic=self.config.get('expand_dynamic', False),
+                                                scan_php=self.config.get('php', False),
+                                                output_path=self.path('blade_dependencies.json'))
+        self.analyzer.load_blade_files()
+        self.analyzer.load_cache()
+        self.items['blade'] = self.analyzer.blade_items()
+        if self.analyzer.scan_php:
+            self.items['php'] = self.analyzer.php_files()
+        pending = {}
+        for kind, items in self.items.items():
+            self.extracted[kind], pending[kind] = self.analyzer.lookup_files(items)
+        self.timings['prepare'] = time.perf_counter() - start
+        return pending
+
+    def finish(self, graph_format='dot', top=DEFAULT_TOP):
+        """抽出結果を解決して依存関係・グラフ・解析結果を書き出し、summary.json に載せる内容を返す"""
+        analyzer = self.analyzer
+        start = time.perf_counter()
+        analyzer.resolve_files(self.extracted['blade'])
+        if 'php' in self.items:
+            analyzer.add_php_references(self.items['php'], self.extracted['php'])
+        analyzer.finish_analysis()
+        analyzer.save_dependencies()
+        self.timings['resolve'] = time.perf_counter() - start
+
+        if graph_format:
+            start = time.perf_counter()
+            create_dependency_graph(analyzer.dependencies, analyzer.blade_files,
+                                    self.path(f"dependency_graph.{graph_format}"), graph_format,
+                                    image_format=None, open_viewer=False)
+            self.timings['graph'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        index = DependencyIndex(analyzer.dependencies, analyzer.blade_files)
+        report = GraphAnalytics(index, self.config.get('entry', ())).report(top)
+        with open(self.path('analytics.json'), 'w', encoding='utf-8') as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        self.timings['analytics'] = time.perf_counter() - start
+
+        return {
+            'files': report['files'],
+            'edges': report['edges'],
+            'php_files': len(self.items.get('php', ())),
+            'files_reparsed': analyzer.cache.reparsed if analyzer.cache else report['files'],
+            'missing': len(report['missing']),
+            'unresolved': report['unresolved'],
+            'orphans': len(report['orphans']),
+            'max_depth': report['max_depth'],
+            'cycles': report['cycles'],
+        }
+
+    def summary(self, result=None):
+        entry = {'name': self.name, 'root': self.config['root'], 'output': self.directory}
+        if self.error:
+            entry['error'] = self.error
+        if result:
+            entry.update(result)
+        entry['timings'] = {name: round(seconds, 3) for name, seconds in self.timings.items()}
+        return entry
+
+
+def run_batch(configs, output_directory=DEFAULT_OUTPUT_DIRECTORY, jobs=None, use_cache=True, graph_format='dot',
+              top=DEFAULT_TOP):
+    """マニフェストのプロジェクトをすべて解析し、summary.json の内容を返す
+
+    jobs: 共有プロセスプールのワーカー数（デフォルト: CPU数）
+    graph_format: blade_pipeline.WRITERS の形式で dependency_graph.<形式> を書き出す（None なら書き出さない）
+    """
+    jobs = jobs or os.cpu_count() or 1
+    start = time.perf_counter()
+    projects = [BatchProject(config, output_directory) for config in configs]
+
+    # 1. 列挙とキャッシュの照合（プロジェクトごとに順に。読み込みが必要なファイルだけをチャンクにする）
+    tasks = []
+    with profiler.span('batch.prepare', projects=len(projects)):
+        for project in projects:
+            try:
+                pending = project.prepare(use_cache)
+            except (OSError, ValueError) as e:
+                project.fail(e)
+                continue
+            for kind, items in pending.items():
+                for chunk in split_chunks(items, jobs):
+                    tasks.append((project, kind, chunk))
+    prepared = time.perf_counter()
+
+    # 2. 全プロジェクトのチャンクを1つのプールに投入し、終わった順に取り込む
+    if tasks:
+        with profiler.span('batch.files', jobs=jobs, chunks=len(tasks)), \
+                ProcessPoolExecutor(max_workers=jobs) as executor:
+            futures = {}
+            for project, kind, chunk in tasks:
+                futures[executor.submit(scan_chunk, chunk, True, EXTRACTORS[kind])] = (project, kind)
+                project.remaining += 1
+            for future in as_completed(futures):
+                project, kind = futures[future]
+                project.remaining -= 1
+                if project.error:
+                    continue
+                try:
+                    results = future.result()
+                except (OSError, ValueError) as e:
+                    project.fail(e)
+                    continue
+                project.analyzer.store_results(results, project.extracted[kind])
+                # timed=True で呼んでいるので、各要素の末尾がそのファイルの処理時間
+                project.parse_seconds += sum(result[-1] for result in results)
+                if project.remaining == 0:
+                    # プールを開始してからこのプロジェクトの最後のチャンクが終わるまで
+                    project.timings['parse_wall'] = time.perf_counter() - prepared
+    parsed = time.perf_counter()
+
+    # 3. 解決・書き出し・解析（プロジェクトごとに順に）
+    entries = []
+    with profiler.span('batch.finish'):
+        for project in projects:
+            result = None
+            if not project.error:
+                project.timings['parse_cpu'] = project.parse_seconds
+                try:
+                    result = project.finish(graph_format, top)
+                except (OSError, ValueError) as e:
+                    project.fail(e)
+            entries.append(project.summary(result))
+
+    succeeded = [entry for entry in entries if 'error' not in entry]
+    return {
+        'jobs': jobs,
+        'projects': entries,
+        'totals': {
+            'projects': len(entries),
+            'failed': len(entries) - len(succeeded),
+            'files': sum(entry['files'] for entry in succeeded),
+            'edges': sum(entry['edges'] for entry in succeeded),
+            'files_reparsed': sum(entry['files_reparsed'] for entry in succeeded),
+            'missing': sum(entry['missing'] for entry in succeeded),
+            'cycles': sum(len(entry['cycles']) for entry in succeeded),
+        },
+        'timings': {
+            'prepare': round(prepared - start, 3),
+            'parse': round(parsed - prepared, 3),
+            'finish': round(time.perf_counter() - parsed, 3),
+            'total': round(time.perf_counter() - start, 3),
+        },
+    }
+
+
+def print_summary(summary):
+    """プロジェクトごとの件数と処理時間を表にして表示する"""
+    print(f"{'project':24s} {'files':>7s} {'edges':>8s} {'parsed':>7s} {'missing':>7s} {'cycles':>6s} {'time':>8s}")
+    for entry in summary['projects']:
+        if 'error' in entry:
+            print(f"{entry['name']:24s} 失敗: {entry['error']}")
+            continue
+        seconds = sum(entry['timings'].get(name, 0) for name in ('prepare', 'parse_wall', 'resolve', 'graph', 'analytics'))
+        print(f"{entry['name']:24s} {entry['files']:7d} {entry['edges']:8d} {entry['files_reparsed']:7d}"
+              f" {entry['missing']:7d} {len(entry['cycles']):6d} {seconds:7.2f}s")
+    totals = summary['totals']
+    print(f"合計: {totals['projects']} プロジェクト（失敗 {totals['failed']}）, ファイル {totals['files']} 件,"
+          f" 依存関係 {totals['edges']} 件, 循環 {totals['cycles']} 件, {summary['timings']['total']:.2f} 秒"
+          f"（{summary['jobs']} プロセス）")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='マニフェストに並べた複数のプロジェクトを1つのプロセスプールでまとめて解析する',
+        usage='python blade_batch.py projects.json [options]')
+    parser.add_argument('manifest', help='プロジェクトを並べたJSON')
+    parser.add_argument('--output', '-o', default=DEFAULT_OUTPUT_DIRECTORY,
+                        help=f'出力先のディレクトリ（プロジェクトごとにサブディレクトリを作る。デフォルト: {DEFAULT_OUTPUT_DIRECTORY}）')
+    parser.add_argument('--jobs', '-j', type=int, help='共有するプロセスプールのワーカー数（デフォルト: CPU数）')
+    parser.add_argument('--no-cache', action='store_true', help='キャッシュを使わず全ファイルを解析する')
+    parser.add_argument('--format', choices=sorted(WRITERS) + ['none'], default='dot',
+                        help='プロジェクトごとに書き出すグラフの形式（デフォルト: dot。描画はしない）')
+    parser.add_argument('--top', type=int, default=DEFAULT_TOP, help='analytics.json に載せる被依存数の上位の件数')
+    parser.add_argument('--fail-on-cycles', action='store_true', help='循環があるプロジェクトがあれば終了コード 1 を返す')
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    try:
+        configs = load_manifest(args.manifest)
+    except (OSError, ValueError) as e:
+        parser.exit(1, f"{e}\n")
+    with profile_run(args):
+        summary = run_batch(configs, args.output, args.jobs, not args.no_cache,
+                            None if args.format == 'none' else args.format, args.top)
+    os.makedirs(args.output, exist_ok=True)
+    with open(os.path.join(args.output, SUMMARY_FILE), 'w', encoding='utf-8') as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    print_summary(summary)
+
+    totals = summary['totals']
+    if totals['failed'] or (args.fail_on_cycles and totals['cycles']):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,226 @@
+"""依存関係グラフのコンパクトなバイナリ形式（CSR形式）
+
+blade_dependencies.json はエッジ1本ごとに {"num": "25", "type": "extends", "line": 1} の辞書を持つため、
+大きなビューツリーでは読み込みだけで大量の小さなオブジェクトが生成される。
+この形式ではノードを 0..N-1 の整数で表し、エッジを offsets / targets / types の配列で持つ。
+ファイルは mmap で開き、配列はコピーせずに参照する（NumPy があれば ndarray として参照する）
+
+ノード 0..F-1 は blade_files.json のファイル、F..N-1 は見つからないビュー・列挙対象外のファイル・
+動的なビュー・コントローラ・ルートなど番号のないノード（'missing:<ビュー名>' などのIDを paths に持つ）
+
+ファイル構成（リトルエンディアン）:
+    ヘッダ       magic(8) version node_count file_count edge_count paths_size types_size (u32 x 6)
+    node_ids     u32 x N        blade_files.json の番号（番号のないノードは 0）
+    offsets      u32 x (N+1)    ノード i のエッジは targets[offsets[i]:offsets[i+1]]
+    targets      u32 x E        依存先ノードのインデックス
+    lines        u32 x E        依存関係のある行番号（不明なら 0）
+    sources      u32 x N        エッジを返す依存元の順（blade_dependencies.json のキーの順。依存関係のないノードは後ろ）
+    path_offsets u32 x (N+1)    paths 内の各パスの開始位置
+    edge_types   u8  x E        types の添字
+    paths        UTF-8 で連結したパス（番号のないノードは 'missing:...' などのID）
+    types        エッジ種別名のJSON配列
+"""
+import sys
+import json
+import mmap
+import struct
+import argparse
+from array import array
+from itertools import chain
+
+try:
+    import numpy as np
+except ImportError:  # NumPy がなくても memoryview で動く
+    np = None
+
+from blade_view_resolver import unresolved_label
+
+MAGIC = b'BLDGRAPH'
+VERSION = 2
+HEADER = struct.Struct('<8s6I')
+DEFAULT_OUTPUT = 'blade_dependencies.bin'
+
+
+def save_compact_graph(dependencies, file_map, output_path=DEFAULT_OUTPUT):
+    """blade_dependencies.json / blade_files.json の内容をバイナリ形式で保存する
+
+    番号のないノード（missing: / external: / dynamic: / controller: / route:）も
+    step3 と同じくファイルのノードの後にIDの順で並べて保存し、そのエッジも落とさない。
+    エッジは重複・行番号も含めて元の順序のまま保存するので、JSONから作ったDOTなどと同じ出力になる
+    """
+    unresolved = {dep['num'] for deps in dependencies.values() for dep in deps if dep['num'] not in file_map}
+    unresolved.update(num for num in dependencies if num not in file_map)
+    nums = list(file_map) + sorted(unresolved)
+    index = {num: i for i, num in enumerate(nums)}
+    node_ids = array('I', (int(num) for num in file_map))
+    node_ids.extend([0] * len(unresolved))
+    offsets = array('I', [0])
+    targets = array('I')
+    lines = array('I')
+    edge_types = array('B')
+    type_codes = {}
+    for num in nums:
+        for dep in dependencies.get(num, ()):
+            code = type_codes.setdefault(dep['type'], len(type_codes))
+            targets.append(index[dep['num']])
+            lines.append(dep.get('line') or 0)
+            edge_types.append(code)
+        offsets.append(len(targets))
+    sources = array('I', (index[num] for num in dependencies))
+    sources.extend(i for i, num in enumerate(nums) if num not in dependencies)
+
+    path_offsets = array('I', [0])
+    encoded_paths = []
+    for path in chain(file_map.values(), sorted(unresolved)):
+        encoded = path.encode('utf-8')
+        encoded_paths.append(encoded)
+        path_offsets.append(path_offsets[-1] + len(encoded))
+    paths = b''.join(encoded_paths)
+    types = json.dumps(list(type_codes), ensure_ascii=False).encode('utf-8')
+
+    if sys.byteorder != 'little':
+        for values in (node_ids, offsets, targets, lines, sources, path_offsets):
+            values.byteswap()
+    with open(output_path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, len(node_ids), len(file_map), len(targets), len(paths), len(types)))
+        for values in (node_ids, offsets, targets, lines, sources, path_offsets, edge_types):
+            values.tofile(f)
+        f.write(paths)
+        f.write(types)
+
+
+class CompactGraph:
+    """mmap したバイナリ形式のグラフ
+
+    node_ids / offsets / targets / lines / sources / edge_types は memoryview か NumPy の配列で、
+    パスは必要になったときに1件ずつデコードする。
+    インデックス file_count 以降は番号のないノード（num() が 'missing:...' などのIDを返す）
+    """
+
+    def __init__(self, path, use_numpy=None):
+        if use_numpy is None:
+            use_numpy = np is not None
+        self.file = open(path, 'rb')
+        self.buffer = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        # 配列はすべてこの memoryview から作る（close で外す参照をここに集める）
+        self.view = memoryview(self.buffer)
+        magic, version, n, file_count, m, paths_size, types_size = HEADER.unpack_from(self.buffer, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"対応していないグラフファイルです: {path}")
+        self.node_count = n
+        self.file_count = file_count
+        self.edge_count = m
+
+        position = HEADER.size
+        self.node_ids, position = self._u32_array(position, n, use_numpy)
+        self.offsets, position = self._u32_array(position, n + 1, use_numpy)
+        self.targets, position = self._u32_array(position, m, use_numpy)
+        self.lines, position = self._u32_array(position, m, use_numpy)
+        self.sources, position = self._u32_array(position, n, use_numpy)
+        self.path_offsets, position = self._u32_array(position, n + 1, use_numpy)
+        if use_numpy:
+            self.edge_types = np.frombuffer(self.view, dtype=np.uint8, count=m, offset=position)
+        else:
+            self.edge_types = self.view[position:position + m]
+        position += m
+        self.paths_start = position
+        position += paths_size
+        self.types = json.loads(self.buffer[position:position + types_size].decode('utf-8'))
+
+    def _u32_array(self, position, count, use_numpy):
+        """position から u32 の配列をコピーせずに参照する"""
+        end = position + count * 4
+        if use_numpy:
+            values = np.frombuffer(self.view, dtype='<u4', count=count, offset=position)
+        elif sys.byteorder == 'little':
+            values = self.view[position:end].cast('I')
+        else:
+            values = array('I', self.buffer[position:end])
+            values.byteswap()
+        return values, end
+
+    def num(self, i):
+        """ノードインデックスを blade_files.json の番号（番号のないノードは 'missing:...' などのID）に変換する"""
+        if i >= self.file_count:
+            return self._string(i)
+        return str(int(self.node_ids[i]))
+
+    def path(self, i):
+        """ノードインデックスのファイルパス（番号のないノードは step3 と同じ表示名）"""
+        if i >= self.file_count:
+            return unresolved_label(self._string(i))
+        return self._string(i)
+
+    def _string(self, i):
+        start = self.paths_start + int(self.path_offsets[i])
+        end = self.paths_start + int(self.path_offsets[i + 1])
+        return self.buffer[start:end].decode('utf-8')
+
+    def successors(self, i):
+        """ノード i が依存しているノードのインデックス"""
+        return self.targets[int(self.offsets[i]):int(self.offsets[i + 1])]
+
+    def iter_nodes(self, unresolved=True):
+        """(番号, パス) を順に返す（unresolved が False ならファイルのノードだけ）"""
+        for i in range(self.node_count if unresolved else self.file_count):
+            yield self.num(i), self.path(i)
+
+    def iter_edges(self, lines=False):
+        """(依存元の番号, 依存先の番号, 種別) を blade_dependencies.json と同じ順に返す
+
+        lines が True なら末尾に行番号（不明なら None）を付けた4要素で返す
+        """
+        nums = [self.num(i) for i in range(self.node_count)]
+        offsets = self.offsets.tolist()
+        targets = self.targets.tolist()
+        edge_types = self.edge_types.tolist()
+        line_numbers = self.lines.tolist() if lines else None
+        types = self.types
+        for i in self.sources.tolist():
+            source = nums[i]
+            for k in range(offsets[i], offsets[i + 1]):
+                if lines:
+                    yield source, nums[targets[k]], types[edge_types[k]], line_numbers[k] or None
+                else:
+                    yield source, nums[targets[k]], types[edge_types[k]]
+
+    def close(self):
+        # NumPy の配列・memoryview の参照が残っていると mmap を閉じられないので、
+        # 配列を捨ててから元の memoryview を解放する（successors() で返した配列も先に捨てておくこと）
+        # （ループ変数も最後の配列を参照し続けるので del する）
+        for values in (self.node_ids, self.offsets, self.targets, self.lines, self.sources, self.path_offsets,
+                       self.edge_types):
+            if isinstance(values, memoryview):
+                values.release()
+        del values
+        self.node_ids = self.offsets = self.targets = self.lines = self.sources = None
+        self.path_offsets = self.edge_types = None
+        self.view.release()
+        self.buffer.close()
+        self.file.close()
+
+
+def load_compact_graph(path=DEFAULT_OUTPUT, use_numpy=None):
+    """バイナリ形式のグラフを mmap で読み込む"""
+    return CompactGraph(path, use_numpy)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='blade_dependencies.json をコンパクトなバイナリ形式に変換する')
+    parser.add_argument('--dependencies', default='blade_dependencies.json', help='依存関係JSONのパス')
+    parser.add_argument('--files', default='blade_files.json', help='ファイル番号JSONのパス')
+    parser.add_argument('--output', '-o', default=DEFAULT_OUTPUT, help=f'出力ファイル（デフォルト: {DEFAULT_OUTPUT}）')
+    args = parser.parse_args()
+
+    with open(args.dependencies, 'r', encoding='utf-8') as f:
+        dependencies = json.load(f)
+    with open(args.files, 'r', encoding='utf-8') as f:
+        file_map = json.load(f)
+    save_compact_graph(dependencies, file_map, args.output)
+    graph = load_compact_graph(args.output)
+    print(f"{args.output}: ノード {graph.node_count} 件, 依存関係 {graph.edge_count} 件")
+    graph.close()
+
+
+if __name__ == "__main__":
+    main()
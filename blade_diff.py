@@ -0,0 +1,348 @@
+"""2つのグラフのスナップショットを比べ、増減したノード・依存関係と、影響を受けるページの変化を出す
+
+スナップショットとして指定できるもの:
+- DOTファイル（step3 の dependency_graph.dot や graph_output/dot/dependencies_graph_*.dot）
+- blade_dependencies.json（同じディレクトリの blade_files.json と組にする）か、それらのあるディレクトリ
+- git:<リビジョン>（--repo のリポジトリの --views 以下のBladeファイルをそのリビジョンの内容で解析する。
+  解析結果は blob ごとにキャッシュするので、変更のないファイルはリビジョンをまたいで再解析しない）
+
+ノードはファイルの相対パス（見つからないビューなどは 'missing:<ビュー名>' などの番号）で突き合わせる。
+影響を受けるページは、変化したノードから逆向きにたどって届く、どこからも依存されていないノード
+（ルート・コントローラがあればそれも含む）で、変化の周辺だけをたどる。
+変化したノードは、増減したノードと、依存関係が増減した依存元（依存先は変わっていないので含めない）。
+git のスナップショット同士では、ディレクティブが変わらなくても内容が変わった（blob ID が変わった）ファイルも含める
+
+使用方法: python blade_diff.py git:main git:HEAD [--repo ~/Sites/app] [--json]
+"""
+import os
+import re
+import json
+import argparse
+import subprocess
+
+from blade_manifest_cache import CACHE_VERSION
+from blade_pipeline import view_name_to_path
+from blade_query import DependencyIndex
+from blade_view_resolver import MISSING_PREFIX, UNRESOLVED_PREFIXES, unresolved_label
+from step2_blade_dependency_analyzer import extract_directives
+
+GIT_PREFIX = 'git:'
+DEFAULT_VIEWS = 'resources/views'
+DEFAULT_REVISION_CACHE = '.blade_revision_cache.json'
+
+# DOT のID（クォートされた文字列か、英数字などの並び）
+DOT_ID = r'"(?:[^"\\]|\\.)*"|[\w.:/-]+'
+DOT_EDGE = re.compile(rf'({DOT_ID})\s*->\s*({DOT_ID})\s*(?:\[([^\]]*)\])?')
+DOT_NODE = re.compile(rf'^\s*({DOT_ID})\s*\[([^\]]*)\]', re.MULTILINE)
+DOT_LABEL = re.compile(rf'\blabel\s*=\s*({DOT_ID})')
+
+
+class Snapshot:
+    """比較用のグラフ: nodes はノードの集合、edges は (依存元, 依存先, 種類) の集合
+
+    種類が分からない形式（graph_output/dot の古いスナップショット）では typed が False
+    blobs は git のスナップショットの {相対パス: blob ID}（内容の変化を調べるのに使う。ほかの形式では空）
+    """
+
+    def __init__(self, name, nodes, edges, typed=True, blobs=None):
+        self.name = name
+        self.nodes = set(nodes)
+        self.edges = set(edges)
+        self.typed = typed
+        self.blobs = blobs or {}
+
+    def untyped_edges(self):
+        return {(source, target, None) for source, target, _ in self.edges}
+
+
+def unquote_dot_id(value):
+    if value.startswith('"') and value.endswith('"'):
+        return re.sub(r'\\(["\\])', r'\1', value[1:-1])
+    return value
+
+
+def load_dot(path):
+    """step3 / blade_pipeline のDOTか、bk/blade_dependency_generator のDOTを読み込む
+
+    step3 の形式では番号をラベル（相対パス）に置き換え、子から親へ描いた extends を依存の向きに戻す
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    labels = {}
+    for match in DOT_NODE.finditer(content):
+        node_id = unquote_dot_id(match.group(1))
+        if node_id in ('node', 'edge', 'graph'):
+            continue
+        label = DOT_LABEL.search(match.group(2))
+        # 番号ではなく種類の付いたID（missing:... など）はIDのまま使う
+        if label and not node_id.startswith(UNRESOLVED_PREFIXES):
+            labels[node_id] = unquote_dot_id(label.group(1)).replace('\\\\', '\\')
+        else:
+            labels[node_id] = node_id
+    edges = set()
+    typed = False
+    for match in DOT_EDGE.finditer(content):
+        tail = unquote_dot_id(match.group(1))
+        head = unquote_dot_id(match.group(2))
+        dep_type = None
+        if match.group(3):
+            label = DOT_LABEL.search(match.group(3))
+            if label:
+                dep_type = unquote_dot_id(label.group(1))
+                typed = True
+        tail, head = labels.get(tail, tail), labels.get(head, head)
+        if dep_type == 'extends':
+            tail, head = head, tail
+        edges.add((tail, head, dep_type))
+    nodes = set(labels.values())
+    for source, target, _ in edges:
+        nodes.add(source)
+        nodes.add(target)
+    return Snapshot(path, nodes, edges, typed)
+
+
+def load_json_snapshot(path):
+    """blade_dependencies.json（とその隣の blade_files.json）を読み込む"""
+    if os.path.isdir(path):
+        path = os.path.join(path, 'blade_dependencies.json')
+    with open(path, 'r', encoding='utf-8') as f:
+        dependencies = json.load(f)
+    with open(os.path.join(os.path.dirname(path), 'blade_files.json'), 'r', encoding='utf-8') as f:
+        file_map = json.load(f)
+    nodes = set(file_map.values())
+    edges = set()
+    for num, deps in dependencies.items():
+        source = file_map.get(num, num)
+        nodes.add(source)
+        for dep in deps:
+            target = file_map.get(dep['num'], dep['num'])
+            nodes.add(target)
+            edges.add((source, target, dep['type']))
+    return Snapshot(path, nodes, edges)
+
+
+class RevisionCache:
+    """git の blob ID ごとのディレクティブの抽出結果（内容が同じなら blob ID も同じなので検証は不要）"""
+
+    def __init__(self, cache_path):
+        self.cache_path = cache_path
+        self.blobs = {}
+        self.reused = 0
+        self.parsed = 0
+
+    def load(self):
+        if not self.cache_path or not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get('version') == CACHE_VERSION:
+            self.blobs = data.get('blobs', {})
+
+    def save(self, used):
+        """今回使った blob だけを残して書き出す"""
+        if not self.cache_path:
+            return
+        blobs = {blob: directives for blob, directives in self.blobs.items() if blob in used}
+        tmp_path = self.cache_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': CACHE_VERSION, 'blobs': blobs}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.cache_path)
+
+
+def git(repo, *args, **kwargs):
+    return subprocess.run(['git', '-C', repo] + list(args), check=True, capture_output=True, **kwargs).stdout
+
+
+def list_blade_blobs(repo, revision, views):
+    """リビジョンのビューディレクトリにある {ビューディレクトリからの相対パス: blob ID}"""
+    output = git(repo, 'ls-tree', '-r', '-z', revision, '--', views)
+    blobs = {}
+    prefix = views.rstrip('/') + '/'
+    for entry in output.decode('utf-8').split('\0'):
+        if not entry:
+            continue
+        info, path = entry.split('\t', 1)
+        _mode, kind, blob = info.split()
+        if kind == 'blob' and path.endswith('.blade.php') and path.startswith(prefix):
+            blobs[path[len(prefix):]] = blob
+    return blobs
+
+
+def read_blobs(repo, blobs):
+    """git cat-file --batch でまとめて blob の内容を読み、{blob ID: 内容} を返す"""
+    if not blobs:
+        return {}
+    output = git(repo, 'cat-file', '--batch', input=''.join(blob + '\n' for blob in blobs).encode())
+    contents = {}
+    position = 0
+    for blob in blobs:
+        header_end = output.index(b'\n', position)
+        size = int(output[position:header_end].split()[2])
+        start = header_end + 1
+        contents[blob] = output[start:start + size].decode('utf-8', errors='replace')
+        position = start + size + 1
+    return contents
+
+
+def load_git_snapshot(spec, repo, views, cache):
+    """git:<リビジョン> のビューを解析する（ビュー名はビューディレクトリ内のファイルだけで解決する）"""
+    revision = spec[len(GIT_PREFIX):]
+    blobs = list_blade_blobs(repo, revision, views)
+    missing = sorted({blob for blob in blobs.values() if blob not in cache.blobs})
+    for blob, content in read_blobs(repo, missing).items():
+        cache.blobs[blob] = extract_directives(content)
+    cache.parsed += len(missing)
+    cache.reused += len(set(blobs.values())) - len(missing)
+
+    nodes = set(blobs)
+    edges = set()
+    for path, blob in blobs.items():
+        for dep_type, name, _line in cache.blobs[blob]:
+            target = resolve_in_tree(name, dep_type, blobs)
+            nodes.add(target)
+            edges.add((path, target, dep_type))
+    return Snapshot(spec, nodes, edges, blobs=blobs), set(blobs.values())
+
+
+def resolve_in_tree(name, dep_type, paths):
+    """ビュー名をリビジョン内のファイルに解決する（名前空間・外部のビューパスは扱わない）"""
+    if name.startswith(UNRESOLVED_PREFIXES):
+        return name
+    path = view_name_to_path(name)
+    if path in paths:
+        return path
+    if dep_type == 'component':
+        index_path = view_name_to_path(name + '.index')
+        if index_path in paths:
+            return index_path
+    return MISSING_PREFIX + name
+
+
+def load_snapshot(spec, repo='.', views=DEFAULT_VIEWS, cache=None):
+    """指定の種類に応じてスナップショットを読み込む（git の場合は使った blob の集合も返す）"""
+    if spec.startswith(GIT_PREFIX):
+        return load_git_snapshot(spec, repo, views, cache)
+    if spec.endswith('.dot') or spec.endswith('.gv'):
+        return load_dot(spec), set()
+    return load_json_snapshot(spec), set()
+
+
+def pages_reaching(index, nodes):
+    """nodes のどれかに推移的に依存している（nodes 自身を含む）ページ＝被依存のないノード"""
+    reached = set()
+    for num in nodes:
+        if num in index.forward or num in index.reverse:
+            reached.add(num)
+            reached.update(index.impacted(num))
+    return {num for num in reached if not index.reverse.get(num)}
+
+
+def diff_snapshots(old, new):
+    """2つのスナップショットの差分（ノード・依存関係の増減と、影響を受けるページ）"""
+    if old.typed and new.typed:
+        old_edges, new_edges = old.edges, new.edges
+    else:
+        # 片方に種類がなければ、依存元と依存先の組だけで比べる
+        old_edges, new_edges = old.untyped_edges(), new.untyped_edges()
+    added_edges = new_edges - old_edges
+    removed_edges = old_edges - new_edges
+    added_nodes = new.nodes - old.nodes
+    removed_nodes = old.nodes - new.nodes
+    # 両方にあって内容が変わったファイル（git のスナップショット同士のときだけ分かる）
+    modified_nodes = {path for path, blob in new.blobs.items() if old.blobs.get(path, blob) != blob}
+
+    # 依存先は依存元が変わっただけなので、依存先に依存しているページへは影響しない
+    changed = added_nodes | removed_nodes | modified_nodes
+    changed.update(source for source, _, _ in added_edges | removed_edges)
+    old_index = DependencyIndex.from_edges(((num, num) for num in old.nodes), old_edges)
+    new_index = DependencyIndex.from_edges(((num, num) for num in new.nodes), new_edges)
+    before = pages_reaching(old_index, changed)
+    after = pages_reaching(new_index, changed)
+    return {
+        'old': old.name,
+        'new': new.name,
+        'added_nodes': sorted(added_nodes),
+        'removed_nodes': sorted(removed_nodes),
+        'modified_nodes': sorted(modified_nodes),
+        'added_edges': [edge_record(edge) for edge in sorted(added_edges, key=edge_order)],
+        'removed_edges': [edge_record(edge) for edge in sorted(removed_edges, key=edge_order)],
+        'impacted_pages': sorted(before | after),
+        'pages_gained': sorted(after - before),
+        'pages_lost': sorted(before - after),
+    }
+
+
+def edge_order(edge):
+    source, target, dep_type = edge
+    return source, target, dep_type or ''
+
+
+def edge_record(edge):
+    source, target, dep_type = edge
+    record = {'from': source, 'to': target}
+    if dep_type is not None:
+        record['type'] = dep_type
+    return record
+
+
+def display(num):
+    return unresolved_label(num) if num.startswith(UNRESOLVED_PREFIXES) else num
+
+
+def print_report(result):
+    """差分を人が読む形式で表示する"""
+    print(f"{result['old']} -> {result['new']}")
+    for title, key, sign in (('追加されたノード', 'added_nodes', '+'), ('削除されたノード', 'removed_nodes', '-'),
+                             ('内容が変わったノード', 'modified_nodes', '~')):
+        print(f"{title}: {len(result[key])} 件")
+        for num in result[key]:
+            print(f"  {sign} {display(num)}")
+    for title, key, sign in (('追加された依存関係', 'added_edges', '+'), ('削除された依存関係', 'removed_edges', '-')):
+        print(f"{title}: {len(result[key])} 件")
+        for edge in result[key]:
+            suffix = f" [{edge['type']}]" if 'type' in edge else ''
+            print(f"  {sign} {display(edge['from'])} -> {display(edge['to'])}{suffix}")
+    print(f"影響を受けるページ: {len(result['impacted_pages'])} 件")
+    for num in result['impacted_pages']:
+        mark = '+' if num in result['pages_gained'] else '-' if num in result['pages_lost'] else ' '
+        print(f"  {mark} {display(num)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='2つのグラフのスナップショットの差分と、影響を受けるページを出す')
+    parser.add_argument('old', help='比較元（DOTファイル / blade_dependencies.json / git:<リビジョン>）')
+    parser.add_argument('new', help='比較先（同上）')
+    parser.add_argument('--repo', default='.', help='git:<リビジョン> を読むリポジトリ（デフォルト: カレントディレクトリ）')
+    parser.add_argument('--views', default=DEFAULT_VIEWS,
+                        help=f'リポジトリ内のビューディレクトリ（デフォルト: {DEFAULT_VIEWS}）')
+    parser.add_argument('--cache', default=DEFAULT_REVISION_CACHE,
+                        help=f'git のリビジョンの解析結果のキャッシュ（デフォルト: {DEFAULT_REVISION_CACHE}）')
+    parser.add_argument('--no-cache', action='store_true', help='キャッシュを使わない')
+    parser.add_argument('--json', action='store_true', help='結果をJSONで出力する')
+    args = parser.parse_args()
+
+    cache = RevisionCache(None if args.no_cache else args.cache)
+    cache.load()
+    repo = os.path.expanduser(args.repo)
+    try:
+        old, old_blobs = load_snapshot(args.old, repo, args.views, cache)
+        new, new_blobs = load_snapshot(args.new, repo, args.views, cache)
+    except subprocess.CalledProcessError as e:
+        parser.exit(1, e.stderr.decode(errors='replace'))
+    except OSError as e:
+        parser.exit(1, f"{e}\n")
+    if old_blobs or new_blobs:
+        cache.save(old_blobs | new_blobs)
+
+    result = diff_snapshots(old, new)
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    else:
+        print_report(result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,189 @@
+import re
+from collections import namedtuple
+
+from blade_view_resolver import DYNAMIC_PREFIX
+
+# 依存関係の1本（種類, ドット区切りのビュー名, 行番号）
+Edge = namedtuple('Edge', ['type', 'name', 'line'])
+
+# ビュー名を引数に取るディレクティブ（長い名前を先に並べて @include が @includeIf を食わないようにする）
+DIRECTIVES = (
+    'includeUnless', 'includeWhen', 'includeFirst', 'includeIf', 'include',
+    'extends', 'each', 'componentFirst', 'component', 'livewire',
+)
+
+# --type で絞り込むときの系統（@includeIf や @each も include の一種として選べるようにする）
+DIRECTIVE_FAMILIES = {
+    'include': ('include', 'includeIf', 'includeWhen', 'includeUnless', 'includeFirst', 'each'),
+    'extends': ('extends',),
+    'component': ('component', 'componentFirst'),
+    'livewire': ('livewire',),
+}
+
+# 第1引数がそのままビュー名になるディレクティブ
+FIRST_ARGUMENT_DIRECTIVES = frozenset(('include', 'includeIf', 'extends', 'component', 'livewire'))
+
+# 全ディレクティブと <x-...> コンポーネントタグを1回の走査で拾う結合パターン
+# - 先頭を文字クラス [@<] にすると re が候補位置を高速に読み飛ばせる
+# - 第1引数が単独の文字列リテラルなら first に取り込み、引数の再走査を省く
+# - @@include のようにエスケープされたものは対象外
+DIRECTIVE_PATTERN = re.compile(
+    r"[@<](?:"
+    r"(?<=@)(?<!@@)(?P<directive>" + '|'.join(DIRECTIVES) + r")\s*\(\s*"
+    r"(?:(?:'(?P<first_sq>[^'\\\n]*)'|\"(?P<first_dq>[^\"\\\n]*)\")(?=\s*[,)]))?"
+    r"|(?<=<)x-(?P<tag>[\w.:-]+))"
+)
+
+STRING_LITERAL = re.compile(r"^(?:'([^'\\]*)'|\"([^\"\\]*)\")$")
+ARRAY_STRINGS = re.compile(r"'([^'\\]*)'|\"([^\"\\]*)\"")
+
+# 引数部分の字句: 文字列リテラル・括弧・カンマ・それ以外の塊
+ARGUMENT_TOKEN = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|[()\[\]{},]|[^'\"()\[\]{},]+")
+
+# 引数の対応する閉じ括弧を探す最大文字数（閉じ忘れで末尾まで走査しないための上限）
+MAX_ARGS_LENGTH = 4000
+
+# <x-dynamic-component :component="$name"> / component="alert" の component 属性
+DYNAMIC_COMPONENT_ATTRIBUTE = re.compile(r"\s(:?)component\s*=\s*(?:\"([^\"]*)\"|'([^']*)')")
+# 動的なビュー名として記録する式の最大文字数
+MAX_EXPRESSION_LENGTH = 200
+
+
+def split_arguments(content, start):
+    """start（開き括弧の直後）から対応する閉じ括弧までの引数をトップレベルのカンマで分割する
+
+    戻り値: (引数文字列のリスト, 閉じ括弧の直後の位置)。閉じ括弧が見つからなければ (None, start)
+    """
+    args = []
+    depth = 0
+    arg_start = start
+    end = min(len(content), start + MAX_ARGS_LENGTH)
+    for token in ARGUMENT_TOKEN.finditer(content, start, end):
+        ch = token.group()
+        if ch in '([{':
+            depth += 1
+        elif ch in ')]}':
+            if depth == 0:
+                args.append(content[arg_start:token.start()].strip())
+                return args, token.end()
+            depth -= 1
+        elif ch == ',' and depth == 0:
+            args.append(content[arg_start:token.start()].strip())
+            arg_start = token.end()
+    return None, start
+
+
+def literal_name(arg):
+    """引数が文字列リテラルならその中身を返す（変数や式なら None）"""
+    match = STRING_LITERAL.match(arg)
+    if match:
+        if match.group(1) is not None:
+            return match.group(1)
+        if '$' not in match.group(2):
+            return match.group(2)
+    return None
+
+
+def dynamic_name(expression):
+    """文字列リテラルでないビュー名の式を 'dynamic:<式>' の名前にする（空白は詰める）"""
+    return DYNAMIC_PREFIX + ' '.join(expression.split())[:MAX_EXPRESSION_LENGTH]
+
+
+def names_from_arguments(directive, args, dynamic=False):
+    """ディレクティブの種類ごとに、引数からビュー名を取り出す
+
+    dynamic が True なら、変数や式で指定されたビュー名も 'dynamic:<式>' として返す
+    """
+    if directive in ('includeWhen', 'includeUnless'):
+        # @includeWhen($boolean, 'view.name', [...])
+        candidates = args[1:2]
+    elif directive in ('includeFirst', 'componentFirst'):
+        # @includeFirst(['custom.admin', 'admin'], [...])
+        if not args or not args[0].startswith('['):
+            return [dynamic_name(args[0])] if dynamic and args and args[0] else []
+        return [a or b for a, b in ARRAY_STRINGS.findall(args[0])]
+    elif directive == 'each':
+        # @each('view.name', $jobs, 'job', 'view.empty')
+        candidates = args[:1] + args[3:4]
+    else:
+        candidates = args[:1]
+    names = []
+    for arg in candidates:
+        name = literal_name(arg)
+        if name:
+            names.append(name)
+        elif dynamic and arg and name is None:
+            names.append(dynamic_name(arg))
+    return names
+
+
+def tag_to_view_name(tag):
+    """<x-alert.error> や <x-package::alert> をビュー名に変換する"""
+    if '::' in tag:
+        namespace, name = tag.split('::', 1)
+        return f"{namespace}::components.{name}"
+    return f"components.{tag}"
+
+
+def dynamic_component_name(content, start):
+    """<x-dynamic-component の component 属性からビュー名（式なら 'dynamic:<式>'）を取り出す"""
+    end = content.find('>', start, start + MAX_ARGS_LENGTH)
+    if end == -1:
+        end = start + MAX_ARGS_LENGTH
+    match = DYNAMIC_COMPONENT_ATTRIBUTE.search(content, start, end)
+    if not match:
+        return None
+    bound, double_quoted, single_quoted = match.groups()
+    value = double_quoted if double_quoted is not None else single_quoted
+    if not value:
+        return None
+    return prefixed_name('components.', DYNAMIC_PREFIX + value) if bound else tag_to_view_name(value)
+
+
+def prefixed_name(prefix, name):
+    """ビュー名の前に prefix を付ける（動的なビュー名なら式の連結として付ける）"""
+    if name.startswith(DYNAMIC_PREFIX):
+        return dynamic_name(f"'{prefix}' . " + name[len(DYNAMIC_PREFIX):])
+    return prefix + name
+
+
+def scan_directives(content, dynamic=False):
+    """ファイル内容を1回走査し、依存関係を Edge のリストとして出現順に返す
+
+    dynamic が True なら、@include($partial) や @include('forms.' . $type)、
+    <x-dynamic-component :component="$name"> のように式で指定されたものも
+    名前を 'dynamic:<式>' として返す（False なら従来どおり読み飛ばす）
+    """
+    edges = []
+    append = edges.append
+    count = content.count
+    line = 1
+    last = 0
+    for match in DIRECTIVE_PATTERN.finditer(content):
+        start = match.start()
+        line += count('\n', last, start)
+        last = start
+        directive, first_sq, first_dq, tag = match.groups()
+        if directive:
+            first = first_sq if first_sq is not None else first_dq
+            # "forms.{$type}" のように変数を埋め込んだダブルクォート文字列はリテラル扱いしない
+            if first and directive in FIRST_ARGUMENT_DIRECTIVES and (first_sq is not None or '$' not in first):
+                if directive == 'livewire':
+                    first = 'livewire.' + first
+                append(Edge(directive, first, line))
+                continue
+            args, _ = split_arguments(content, content.index('(', match.end(1)) + 1)
+            if not args:
+                continue
+            for name in names_from_arguments(directive, args, dynamic):
+                if directive == 'livewire':
+                    name = prefixed_name('livewire.', name)
+                append(Edge(directive, name, line))
+        elif tag == 'dynamic-component':
+            if dynamic:
+                name = dynamic_component_name(content, match.end())
+                if name:
+                    append(Edge('component', name, line))
+        elif tag != 'slot' and not tag.startswith('slot:'):
+            append(Edge('component', tag_to_view_name(tag), line))
+    return edges
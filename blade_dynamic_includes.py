@@ -0,0 +1,124 @@
+"""式で指定されたビュー名（'dynamic:<式>'）を、列挙済みのビュー名から候補に展開する
+
+@include('forms.' . $type) の 'forms.' のように式の中の文字列リテラルを手がかりに、
+変数の部分を任意の文字列とみなして一致するビューを探す。
+変数だけの式（@include($partial)）は手がかりがないので展開しない
+
+ビュー名の索引は最初に展開するときに作り、展開結果は式ごとにメモ化する。
+展開しない通常の解析ではこのモジュールの処理は一切行われない
+"""
+import os
+import re
+from bisect import bisect_left
+
+from blade_view_resolver import DYNAMIC_PREFIX
+
+# 式の字句: 文字列リテラル・括弧・連結演算子・それ以外の塊
+EXPRESSION_TOKEN = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|[()\[\]]|\.|[^'\"()\[\].]+")
+# ダブルクォート文字列に埋め込まれた変数（"forms.{$type}" / "forms.$type"）
+INTERPOLATION = re.compile(r"\{\$[^}]*\}|\$\w+(?:->\w+|\[[^\]]*\])*")
+# 候補の種類（DOT 上は動的ノードから候補へのエッジになる）
+CANDIDATE_TYPE = 'candidate'
+
+
+def expression_parts(expression):
+    """連結演算子 . で区切られた式を、リテラル文字列（str）と不明な部分（None）の列にする"""
+    parts = []
+    depth = 0
+    current = []
+    for token in EXPRESSION_TOKEN.findall(expression):
+        if token in '([':
+            depth += 1
+        elif token in ')]':
+            depth -= 1
+        elif token == '.' and depth == 0:
+            parts.append(current)
+            current = []
+            continue
+        current.append(token)
+    parts.append(current)
+
+    pieces = []
+    for tokens in parts:
+        text = ''.join(tokens).strip()
+        if len(text) >= 2 and text[0] == text[-1] == "'":
+            pieces.append(text[1:-1].replace("\\'", "'"))
+        elif len(text) >= 2 and text[0] == text[-1] == '"':
+            # 埋め込まれた変数の前後のリテラルだけを使う
+            position = 0
+            for match in INTERPOLATION.finditer(text, 1, len(text) - 1):
+                pieces.append(text[max(1, position):match.start()])
+                pieces.append(None)
+                position = match.end()
+            pieces.append(text[max(1, position):len(text) - 1])
+        else:
+            pieces.append(None)
+    return [piece for piece in pieces if piece != '']
+
+
+def expression_pattern(expression):
+    """式に一致するビュー名の正規表現と、先頭のリテラル（前方一致の絞り込み用）
+
+    手がかりになるリテラルがない式は (None, '')
+    """
+    parts = expression_parts(expression)
+    if not any(parts):
+        return None, ''
+    regex = []
+    for part in parts:
+        if part is None:
+            if not regex or regex[-1] != '.+':
+                regex.append('.+')
+        else:
+            regex.append(re.escape(part))
+    prefix = parts[0] if parts[0] is not None else ''
+    return re.compile(''.join(regex)), prefix
+
+
+class DynamicIncludeExpander:
+    """列挙済みのファイル（blade_files.json の内容）から動的なビュー名の候補を探す"""
+
+    def __init__(self, blade_files):
+        self.blade_files = blade_files
+        self.names = None
+        self.nums = None
+        self.cache = {}
+
+    def build_index(self):
+        """ドット区切りのビュー名の昇順の索引（前方一致を二分探索で絞り込む）"""
+        entries = sorted((path[:-len('.blade.php')].replace(os.sep, '.').replace('/', '.'), num)
+                         for num, path in self.blade_files.items() if path.endswith('.blade.php'))
+        self.names = [name for name, _ in entries]
+        self.nums = [num for _, num in entries]
+
+    def expand(self, dynamic_num):
+        """'dynamic:<式>' に一致しうるファイルの番号のタプル（手がかりがなければ空）"""
+        cached = self.cache.get(dynamic_num)
+        if cached is not None:
+            return cached
+        if self.names is None:
+            self.build_index()
+        pattern, prefix = expression_pattern(dynamic_num[len(DYNAMIC_PREFIX):])
+        found = ()
+        if pattern is not None:
+            start = bisect_left(self.names, prefix)
+            matches = []
+            for i in range(start, len(self.names)):
+                name = self.names[i]
+                if not name.startswith(prefix):
+                    break
+                if pattern.fullmatch(name):
+                    matches.append(self.nums[i])
+            found = tuple(matches)
+        self.cache[dynamic_num] = found
+        return found
+
+    def expand_dependencies(self, dependencies):
+        """dependencies（blade_dependencies.json の内容）に出てくる動的なビューごとの候補への依存関係"""
+        expanded = {}
+        for deps in dependencies.values():
+            for dep in deps:
+                num = dep['num']
+                if num.startswith(DYNAMIC_PREFIX) and num not in expanded:
+                    expanded[num] = [{'num': candidate, 'type': CANDIDATE_TYPE} for candidate in self.expand(num)]
+        return expanded
@@ -0,0 +1,193 @@
+import os
+import json
+import hashlib
+
+DEFAULT_CACHE_DIR = '.blade_layout_cache'
+# 保持するレイアウトの最大数（古いものから削除する）
+MAX_ENTRIES = 20
+# 前回から変わったエッジと増えたノードが、エッジ数に対するこの割合以下なら前回の座標を再利用する
+INCREMENTAL_MAX_RATIO = 0.1
+# 座標を固定して再配置するときのエンジン（pos に ! を付けたノードは動かさない）
+INCREMENTAL_PROG = 'neato'
+# 差分だけを配置し直したレイアウトのキーに付けるオプション（dot で全体を配置したものとは別に保存する）
+INCREMENTAL_ARGS = 'incremental'
+POINTS_PER_INCH = 72.0
+# 保存するレイアウトの形式（ノードのラベルを持たない古い形式は前回の座標として使わない）
+LAYOUT_VERSION = 2
+
+
+def layout_key(dot_bytes, prog, args):
+    """DOTの内容・レイアウトエンジン・オプションからキャッシュのキーを作る"""
+    digest = hashlib.sha256()
+    digest.update(dot_bytes)
+    digest.update(b'\0' + prog.encode('utf-8') + b'\0' + args.encode('utf-8'))
+    return digest.hexdigest()
+
+
+class LayoutCache:
+    """pygraphviz でレイアウトしたノード座標・エッジのスプラインをディスクに保存するキャッシュ
+
+    キーは DOT ファイルの内容ハッシュ + エンジン + オプション。
+    内容が変わっていても変更が小さければ、前回の座標を固定したまま差分だけを配置し直す。
+    番号は振り直されることがあるので、前回との突き合わせはノードのラベル（ファイルのパス）で行い、
+    差分だけを配置し直した結果は全体を配置したものとは別のキーで保存する
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR):
+        self.cache_dir = cache_dir
+        self.latest_path = os.path.join(cache_dir, 'latest.json')
+
+    def layout(self, graph, dot_path, prog='dot', args='', incremental=True):
+        """graph (pygraphviz.AGraph) をレイアウトし、結果の種類 'hit' / 'incremental' / 'full' を返す
+
+        incremental が False なら、差分だけを配置し直したレイアウトは使わずに prog で全体を配置する
+        """
+        with open(dot_path, 'rb') as f:
+            dot_bytes = f.read()
+        key = layout_key(dot_bytes, prog, args)
+        incremental_key = layout_key(dot_bytes, INCREMENTAL_PROG, INCREMENTAL_ARGS + '\0' + prog + '\0' + args)
+        for candidate in ((key, incremental_key) if incremental else (key,)):
+            cached = self.read(candidate)
+            if cached:
+                apply_layout(graph, cached)
+                return 'hit'
+
+        result = 'full'
+        previous = self.read(self.read_latest().get(os.path.abspath(dot_path), '')) if incremental else None
+        if previous and previous.get('version') == LAYOUT_VERSION and can_reuse(graph, previous):
+            pin_previous_positions(graph, previous)
+            graph.layout(prog=INCREMENTAL_PROG)
+            result = 'incremental'
+            key = incremental_key
+        else:
+            graph.layout(prog=prog, args=args)
+        layout = extract_layout(graph)
+        # 固定座標の ! を外した値で揃えておく
+        apply_layout(graph, layout)
+        self.write(key, layout)
+        self.write_latest(os.path.abspath(dot_path), key)
+        return result
+
+    def entry_path(self, key):
+        return os.path.join(self.cache_dir, key + '.json')
+
+    def read(self, key):
+        """キャッシュ済みのレイアウトを読み込む（なければ None）"""
+        if not key:
+            return None
+        try:
+            with open(self.entry_path(key), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def write(self, key, layout):
+        os.makedirs(self.cache_dir, exist_ok=True)
+        tmp_path = self.entry_path(key) + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(layout, f, ensure_ascii=False)
+        os.replace(tmp_path, self.entry_path(key))
+        self.prune()
+
+    def read_latest(self):
+        """DOTファイルごとの直近のキー"""
+        try:
+            with open(self.latest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def write_latest(self, dot_path, key):
+        latest = self.read_latest()
+        latest[dot_path] = key
+        with open(self.latest_path, 'w', encoding='utf-8') as f:
+            json.dump(latest, f, ensure_ascii=False)
+
+    def prune(self):
+        """古いレイアウトを削除して MAX_ENTRIES 件に抑える"""
+        entries = [os.path.join(self.cache_dir, name) for name in os.listdir(self.cache_dir)
+                   if name.endswith('.json') and name != 'latest.json']
+        if len(entries) <= MAX_ENTRIES:
+            return
+        entries.sort(key=os.path.getmtime)
+        for path in entries[:-MAX_ENTRIES]:
+            os.remove(path)
+
+
+def extract_layout(graph):
+    """レイアウト済みの graph からノード座標・サイズとエッジのスプラインを取り出す"""
+    nodes = {}
+    for node in graph.nodes():
+        attrs = node.attr
+        pos = attrs.get('pos')
+        nodes[str(node)] = {
+            'pos': pos.rstrip('!') if pos else pos,
+            'width': attrs.get('width'),
+            'height': attrs.get('height'),
+            'label': node_label(node),
+        }
+    edges = []
+    for tail, head, key in graph.edges(keys=True):
+        edge = graph.get_edge(tail, head, key)
+        edges.append([str(tail), str(head), key, edge.attr.get('pos')])
+    return {'version': LAYOUT_VERSION, 'bb': graph.graph_attr.get('bb'), 'nodes': nodes, 'edges': edges}
+
+
+def node_label(node):
+    """ノードのラベル（step3 のDOTではファイルのパス。ラベルがなければノードID）"""
+    label = (node.attr.get('label') or '').strip('"')
+    if not label or label == '\\N':
+        return str(node)
+    return label
+
+
+def apply_layout(graph, layout):
+    """キャッシュしたレイアウトを graph の属性に書き戻す"""
+    if layout.get('bb'):
+        graph.graph_attr['bb'] = layout['bb']
+    nodes = layout['nodes']
+    for node in graph.nodes():
+        cached = nodes.get(str(node))
+        if not cached:
+            continue
+        for name, value in cached.items():
+            # ラベルは突き合わせ用に保存しているだけなので書き戻さない
+            if value is not None and name != 'label':
+                node.attr[name] = value
+    for tail, head, key, pos in layout['edges']:
+        if pos is not None and graph.has_edge(tail, head, key):
+            graph.get_edge(tail, head, key).attr['pos'] = pos
+
+
+def edge_set(edges, labels):
+    """エッジを (依存元のラベル, 依存先のラベル) の集合にする（番号が振り直されても比べられる）"""
+    return {(labels.get(str(tail), str(tail)), labels.get(str(head), str(head))) for tail, head, *_ in edges}
+
+
+def previous_by_label(previous):
+    """前回のレイアウトのノードをラベルで引けるようにする"""
+    return {cached.get('label') or num: cached for num, cached in previous['nodes'].items()}
+
+
+def can_reuse(graph, previous):
+    """前回のレイアウトとの差分が小さく、座標を再利用して配置し直せるか"""
+    labels = {str(node): node_label(node) for node in graph.nodes()}
+    previous_labels = {num: cached.get('label') or num for num, cached in previous['nodes'].items()}
+    current = edge_set(graph.edges(), labels)
+    changed = len(current ^ edge_set(previous['edges'], previous_labels))
+    known = previous_by_label(previous)
+    new_nodes = sum(1 for label in labels.values() if label not in known)
+    return changed + new_nodes <= int(len(current) * INCREMENTAL_MAX_RATIO)
+
+
+def pin_previous_positions(graph, previous):
+    """前回も存在したノード（ラベルで突き合わせる）を前回の座標に固定する（新しいノードだけが配置される）"""
+    known = previous_by_label(previous)
+    for node in graph.nodes():
+        cached = known.get(node_label(node))
+        if not cached or not cached.get('pos'):
+            continue
+        x, y = map(float, cached['pos'].split(','))
+        # neato の入力座標はインチ単位、! で固定
+        node.attr['pos'] = f"{x / POINTS_PER_INCH},{y / POINTS_PER_INCH}!"
+        node.attr['pin'] = 'true'
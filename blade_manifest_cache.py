@@ -0,0 +1,135 @@
+import os
+import re
+import json
+import hashlib
+
+# 抽出ロジックを変更したらこの値を上げ、古いキャッシュを無効化する
+CACHE_VERSION = 5
+# 'php:app/Http/...' のような、走査の種類を表すキーの接頭辞
+KEY_SCOPE = re.compile(r'^([a-z]+):')
+
+
+def key_scope(key):
+    """キーの走査の種類（'php:' など。Bladeファイルの相対パスなら ''）"""
+    match = KEY_SCOPE.match(key)
+    return match.group(0) if match else ''
+
+
+class ManifestCache:
+    """ファイルごとの mtime・サイズ・内容ハッシュと抽出結果をディスクに保存するキャッシュ
+
+    形式:
+    {
+      "version": 5,  (CACHE_VERSION)
+      "files": {
+        "<相対パス>": {"mtime": ..., "size": ..., "hash": "...", "directives": [...]},
+        "php:<プロジェクトからの相対パス>": {...}
+      }
+    }
+
+    'php:' のような接頭辞ごとに走査の種類を区別し、今回走査しなかった種類のエントリは save で残す
+    （--php なしで実行しても、コントローラ・ルートのキャッシュは消えない）
+    """
+
+    def __init__(self, cache_path, version=CACHE_VERSION):
+        self.cache_path = cache_path
+        self.version = version
+        self.entries = {}
+        self.seen = set()
+        # 今回走査した種類（key_scope）
+        self.scopes = set()
+        self.reused = 0
+        self.reparsed = 0
+        # 今回実際に読み込んだファイルのバイト数
+        self.bytes_read = 0
+
+    def load(self):
+        """キャッシュファイルを読み込む（存在しない・形式が古い場合は空から始める）"""
+        if not os.path.exists(self.cache_path):
+            return
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if data.get('version') == self.version:
+            self.entries = data.get('files', {})
+
+    def save(self):
+        """今回参照したファイルだけを残してキャッシュを書き出す（削除されたファイルは落とす）
+
+        今回走査しなかった種類のエントリは、参照していなくてもそのまま残す
+        """
+        files = {path: entry for path, entry in self.entries.items()
+                 if path in self.seen or key_scope(path) not in self.scopes}
+        tmp_path = self.cache_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': self.version, 'files': files}, f, ensure_ascii=False)
+        os.replace(tmp_path, self.cache_path)
+
+    def lookup(self, key, full_path):
+        """mtime とサイズが一致すればキャッシュ済みの抽出結果を返す（一致しなければ None）"""
+        self.mark_seen(key)
+        st = os.stat(full_path)
+        entry = self.entries.get(key)
+        if entry and entry['mtime'] == st.st_mtime_ns and entry['size'] == st.st_size:
+            self.reused += 1
+            return entry['directives']
+        return None
+
+    def mark_seen(self, key):
+        self.seen.add(key)
+        self.scopes.add(key_scope(key))
+
+    def store(self, key, mtime, size, digest, directives):
+        """読み込んだファイルの抽出結果を登録する（内容ハッシュが同じなら再利用として数える）"""
+        self.mark_seen(key)
+        self.bytes_read += size
+        entry = self.entries.get(key)
+        if entry and entry['hash'] == digest:
+            # touch されただけで内容は同じ
+            self.reused += 1
+        else:
+            self.reparsed += 1
+        self.entries[key] = {
+            'mtime': mtime,
+            'size': size,
+            'hash': digest,
+            'directives': directives,
+        }
+
+    def get_or_parse(self, key, full_path, parse):
+        """キャッシュが有効なら抽出結果を返し、無効ならファイルを読んで parse(content) で再抽出する
+
+        key: キャッシュのキー（ビューディレクトリからの相対パス）
+        full_path: 実ファイルのパス
+        parse: ファイル内容(str)を受け取り、JSONに保存できる抽出結果を返す関数
+        """
+        directives = self.lookup(key, full_path)
+        if directives is not None:
+            return directives
+        mtime, size, digest, content = read_with_digest(full_path)
+        entry = self.entries.get(key)
+        if entry and entry['hash'] == digest:
+            directives = entry['directives']
+        else:
+            directives = parse(content)
+        self.store(key, mtime, size, digest, directives)
+        return directives
+
+    def forget(self, key):
+        """削除されたファイルを次回の save で落とす"""
+        self.seen.discard(key)
+        self.entries.pop(key, None)
+
+    def report(self):
+        """再利用・再解析の件数を表示する"""
+        print(f"キャッシュ: 再利用 {self.reused} 件, 再解析 {self.reparsed} 件")
+
+
+def read_with_digest(full_path):
+    """ファイルを読み込み (mtime_ns, サイズ, sha1, 内容) を返す"""
+    with open(full_path, 'rb') as file:
+        st = os.fstat(file.fileno())
+        raw = file.read()
+    return st.st_mtime_ns, st.st_size, hashlib.sha1(raw).hexdigest(), raw.decode('utf-8')
@@ -0,0 +1,125 @@
+"""コントローラ（app/Http/Controllers）とルート定義（routes/*.php）から、描画されるビューへの参照を抽出する
+
+- コントローラ: メソッド内の view('x.y') / View::make('x.y') / ->view('x.y') を
+  'controller:App\\Http\\Controllers\\UserController@show' のノードからビューへの依存にする
+- ルート: Route::view('/uri', 'x.y') と、クロージャ内の view('x.y') を 'route:GET /uri' のノードからの依存にする。
+  Route::get('/uri', [UserController::class, 'show']) や 'UserController@show' は、ルートからコントローラへの依存にする
+
+ビュー名は文字列リテラルで書かれたものだけを対象にする。Route::group の prefix は考慮しない。
+ルートの依存元になるのは Route::get(...) の括弧の中だけで、どのルートにも含まれない view() は
+参照元を None として返す（step2 がルート定義ファイルのノード 'route:routes/web.php' にする）
+"""
+import re
+
+from blade_view_resolver import CONTROLLER_PREFIX, ROUTE_PREFIX
+
+# Laravel の既定のコントローラの名前空間（ルート定義で use されていないクラス名に付ける）
+DEFAULT_CONTROLLER_NAMESPACE = 'App\\Http\\Controllers'
+
+# メソッド定義・ルート定義・ビューの呼び出しを1回の走査で拾う結合パターン
+PHP_PATTERN = re.compile(
+    r"(?P<function>\bfunction\s+(?P<function_name>\w+)\s*\()"
+    r"|\bRoute::(?P<verb>get|post|put|patch|delete|options|any|match|view)\s*\(\s*"
+    r"(?:\[[^\]]*\]\s*,\s*)?(?:'(?P<uri_sq>[^'\n]*)'|\"(?P<uri_dq>[^\"\n]*)\")"
+    r"|(?:\bView::make|(?<![\w$:])view|->view)\s*\(\s*(?:'(?P<view_sq>[^'\\\n]+)'|\"(?P<view_dq>[^\"\\\n$]+)\")"
+)
+# Route::view('/uri', 'x.y') の2つ目の引数
+ROUTE_VIEW_NAME = re.compile(r"\s*,\s*(?:'([^'\\\n]+)'|\"([^\"\\\n$]+)\")")
+# Route::get('/uri', ...) のアクション: [Controller::class, 'method'] / 'Controller@method' / Controller::class
+ROUTE_ACTION = re.compile(
+    r"\s*,\s*(?:\[\s*\\?([\w\\]+)::class\s*,\s*'(\w+)'\s*\]|'\\?([\w\\]+)@(\w+)'|\\?([\w\\]+)::class)")
+NAMESPACE = re.compile(r"^\s*namespace\s+([\w\\]+)\s*;", re.MULTILINE)
+CLASS = re.compile(r"^\s*(?:abstract\s+|final\s+)*class\s+(\w+)", re.MULTILINE)
+USE = re.compile(r"^\s*use\s+\\?([\w\\]+)(?:\s+as\s+(\w+))?\s*;", re.MULTILINE)
+# 括弧の対応を数えるときに読み飛ばす文字列・コメント
+SKIPPED = re.compile(r"'(?:[^'\\]|\\.)*'|\"(?:[^\"\\]|\\.)*\"|//[^\n]*|#[^\n]*|/\*.*?\*/|[()]", re.DOTALL)
+
+
+def call_end(content, position):
+    """position（開き括弧の直後）から対応する閉じ括弧の直後の位置を返す（閉じていなければ末尾）"""
+    depth = 1
+    for match in SKIPPED.finditer(content, position):
+        token = match.group(0)
+        if token == '(':
+            depth += 1
+        elif token == ')':
+            depth -= 1
+            if depth == 0:
+                return match.end()
+    return len(content)
+
+
+def controller_id(class_name, method, imports):
+    """クラス名（use で読み替える）とメソッド名からコントローラのノード番号を作る"""
+    head, _, rest = class_name.partition('\\')
+    if head in imports:
+        class_name = imports[head] + ('\\' + rest if rest else '')
+    elif not class_name.startswith('App\\'):
+        class_name = DEFAULT_CONTROLLER_NAMESPACE + '\\' + class_name
+    return f"{CONTROLLER_PREFIX}{class_name}@{method}"
+
+
+def extract_php_references(content):
+    """PHPファイルの内容から [参照元のノード番号, 種類, 参照先, 行番号] を出現順に抽出する
+
+    種類が 'view' なら参照先はドット区切りのビュー名、'controller' ならコントローラのノード番号。
+    クラスを定義しているファイルはコントローラ、それ以外はルート定義として扱う。
+    ルート定義でどのルートの括弧にも入っていない view() は、参照元を None にする
+    """
+    if 'view' not in content and 'View' not in content and 'Route::' not in content:
+        return []
+    class_match = CLASS.search(content)
+    if class_match:
+        namespace = NAMESPACE.search(content)
+        class_name = class_match.group(1)
+        if namespace:
+            class_name = namespace.group(1) + '\\' + class_name
+        imports = {}
+    else:
+        class_name = None
+        imports = {alias or name.rsplit('\\', 1)[-1]: name for name, alias in USE.findall(content)}
+
+    references = []
+    owner = None
+    # ルート定義ファイルで、いま括弧の中にいるルートの (ノード番号, 閉じ括弧の位置)
+    routes = []
+    count = content.count
+    line = 1
+    last = 0
+    for match in PHP_PATTERN.finditer(content):
+        start = match.start()
+        line += count('\n', last, start)
+        last = start
+        if not class_name:
+            while routes and routes[-1][1] <= start:
+                routes.pop()
+            owner = routes[-1][0] if routes else None
+        if match.group('function'):
+            if class_name:
+                owner = f"{CONTROLLER_PREFIX}{class_name}@{match.group('function_name')}"
+        elif match.group('verb'):
+            if class_name:
+                continue
+            verb = match.group('verb')
+            uri = match.group('uri_sq') if match.group('uri_sq') is not None else match.group('uri_dq')
+            owner = f"{ROUTE_PREFIX}{'GET' if verb == 'view' else verb.upper()} /{uri.strip('/')}"
+            routes.append((owner, call_end(content, content.index('(', start) + 1)))
+            if verb == 'view':
+                name = ROUTE_VIEW_NAME.match(content, match.end())
+                if name:
+                    references.append([owner, 'view', name.group(1) or name.group(2), line])
+                continue
+            action = ROUTE_ACTION.match(content, match.end())
+            if action:
+                array_class, array_method, string_class, string_method, invokable = action.groups()
+                if array_class:
+                    target = controller_id(array_class, array_method, imports)
+                elif string_class:
+                    target = controller_id(string_class, string_method, imports)
+                else:
+                    target = controller_id(invokable, '__invoke', imports)
+                references.append([owner, 'controller', target, line])
+        elif owner is not None or not class_name:
+            name = match.group('view_sq') if match.group('view_sq') is not None else match.group('view_dq')
+            references.append([owner, 'view', name, line])
+    return references
@@ -0,0 +1,438 @@
+import os
+import re
+import json
+import sqlite3
+import argparse
+from fnmatch import fnmatch
+from xml.sax.saxutils import escape, quoteattr
+
+from blade_directive_scanner import scan_directives
+from blade_view_resolver import (MISSING_PREFIX, EXTERNAL_PREFIX, DYNAMIC_PREFIX, CONTROLLER_PREFIX, ROUTE_PREFIX,
+                                 UNRESOLVED_PREFIXES, ViewResolver, unresolved_label)
+
+# DOT のIDとしてそのまま書ける文字列（それ以外はダブルクォートで囲む）
+DOT_BARE_ID = re.compile(r'^(?:[A-Za-z_][A-Za-z0-9_]*|-?(?:\.[0-9]+|[0-9]+(?:\.[0-9]*)?))$')
+DOT_KEYWORDS = {'node', 'edge', 'graph', 'digraph', 'subgraph', 'strict'}
+
+# 走査しないディレクトリ・ファイルのパターン
+# '/' を含まないパターンは名前で、含むパターンはルートからの相対パスで照合する
+DEFAULT_EXCLUDES = ('node_modules', '.git')
+DEFAULT_INDEX_PATH = '.blade_file_index.json'
+# SQLite に1トランザクションでまとめて書き込む行数
+SQLITE_BATCH_SIZE = 10000
+
+
+class FileNumberIndex:
+    """相対パス→番号の対応を永続化し、実行をまたいで同じファイルに同じ番号を振る
+
+    新しいファイルには使ったことのない番号を振り、削除されたファイルの番号は再利用しない
+    """
+
+    def __init__(self, index_path, directory):
+        self.index_path = index_path
+        self.directory = os.path.abspath(directory)
+        self.numbers = {}
+        self.next_number = 1
+        self.seen = set()
+
+    def load(self):
+        """インデックスを読み込む（別ディレクトリのインデックスなら空から始める）"""
+        if not os.path.exists(self.index_path):
+            return
+        with open(self.index_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get('directory') == self.directory:
+            self.numbers = data['files']
+            self.next_number = data['next']
+
+    def number_for(self, path):
+        """ファイルの番号を返す（初めて見るファイルには新しい番号を振る）"""
+        self.seen.add(path)
+        number = self.numbers.get(path)
+        if number is None:
+            number = self.next_number
+            self.numbers[path] = number
+            self.next_number += 1
+        return str(number)
+
+    def forget(self, path):
+        """削除されたファイルを次回の save で落とす（番号は再利用しない）"""
+        self.seen.discard(path)
+
+    def save(self):
+        """今回見つかったファイルだけを残してインデックスを書き出す"""
+        files = {path: number for path, number in self.numbers.items() if path in self.seen}
+        with open(self.index_path, 'w', encoding='utf-8') as f:
+            json.dump({'directory': self.directory, 'next': self.next_number, 'files': files},
+                      f, ensure_ascii=False)
+
+
+def is_excluded(name, relative_path, excludes):
+    """除外パターンに一致するか"""
+    for pattern in excludes:
+        if fnmatch(relative_path if '/' in pattern else name, pattern):
+            return True
+    return False
+
+
+def scan_blade_files(directory, excludes=DEFAULT_EXCLUDES):
+    """os.scandir でディレクトリを走査し、Bladeファイルの相対パスを返すジェネレータ
+
+    os.walk と同じ順序（各ディレクトリのファイル→サブディレクトリ）で返す。
+    除外パターンに一致するディレクトリの中には入らず、シンボリックリンクのディレクトリもたどらない
+    """
+    stack = ['']
+    while stack:
+        relative_dir = stack.pop()
+        subdirs = []
+        try:
+            entries = os.scandir(os.path.join(directory, relative_dir))
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                relative_path = relative_dir + '/' + entry.name if relative_dir else entry.name
+                if entry.name.endswith('.blade.php') and not entry.is_dir():
+                    if not is_excluded(entry.name, relative_path, excludes):
+                        yield relative_path.replace('/', os.sep)
+                elif entry.is_dir() and not entry.is_symlink():
+                    if not is_excluded(entry.name, relative_path, excludes):
+                        subdirs.append(relative_path)
+        stack.extend(reversed(subdirs))
+
+
+def iter_blade_files(directory, excludes=DEFAULT_EXCLUDES, index=None):
+    """ディレクトリを走査し、見つかった順に (番号, 相対パス) を返すジェネレータ
+
+    index (FileNumberIndex) を渡すと永続化された番号を使い、渡さなければ1から順に振る
+    """
+    file_number = 1
+    for relative_path in scan_blade_files(directory, excludes):
+        if index is None:
+            yield str(file_number), relative_path
+            file_number += 1
+        else:
+            yield index.number_for(relative_path), relative_path
+
+
+def view_name_to_path(name):
+    """ドット区切りのビュー名をビューディレクトリからの相対パスに変換する"""
+    return name.replace('.', '/') + '.blade.php'
+
+
+def node_kind(num):
+    """ノードの種類（列挙されたファイルは 'file'、それ以外は 'missing' / 'external' / 'dynamic' / 'controller' / 'route'）"""
+    for prefix in UNRESOLVED_PREFIXES:
+        if num.startswith(prefix):
+            return prefix[:-1]
+    return 'file'
+
+
+def quote_dot_id(value):
+    """DOT のIDとして書けるように必要ならクォートする（graphviz パッケージと同じ規則）"""
+    if DOT_BARE_ID.match(value) and value.lower() not in DOT_KEYWORDS:
+        return value
+    return '"' + value.replace('"', '\\"') + '"'
+
+
+def dot_node(num, path):
+    """ノードの DOT の文（見つからないビュー・列挙対象外のファイル・動的なビュー・コントローラ・ルートは色を変える）"""
+    if num.startswith(MISSING_PREFIX):
+        style = ' color=salmon style="filled,dashed"'
+    elif num.startswith(DYNAMIC_PREFIX):
+        style = ' color=khaki style="filled,dashed"'
+    elif num.startswith(EXTERNAL_PREFIX):
+        style = ' color=lightgrey'
+    elif num.startswith(CONTROLLER_PREFIX):
+        style = ' color=palegreen shape=component'
+        # ラベルの \ は Graphviz のエスケープになるので、名前空間の区切りは二重にする
+        path = path.replace('\\', '\\\\')
+    elif num.startswith(ROUTE_PREFIX):
+        style = ' color=plum shape=cds'
+    else:
+        style = ''
+    return f"{quote_dot_id(num)} [label={quote_dot_id(path)}{style}]"
+
+
+def dot_edge(num, dep_num, dep_type):
+    """num が dep_num に依存する関係の DOT の文"""
+    if dep_type == 'extends':
+        # 矢印の向きを子から親へ（継承）
+        tail, head = dep_num, num
+    else:
+        # include などは親から子へ（含む）
+        tail, head = num, dep_num
+    # 動的なビューから一致しうるファイルへの候補は破線にする
+    style = ' style=dashed' if dep_type == 'candidate' else ''
+    return f"{quote_dot_id(tail)} -> {quote_dot_id(head)} [label={quote_dot_id(dep_type)}{style}]"
+
+
+class DotWriter:
+    """ノードと依存関係を受け取った順にDOTファイルへ書き出すライター
+
+    出力形式は step3 が使っていた graphviz.Digraph の source と同じ
+    """
+
+    def __init__(self, output_filename, comment='Blade Template Dependencies'):
+        self.file = open(output_filename, 'w', encoding='utf-8')
+        self.file.write(f"// {comment}\n")
+        self.file.write("digraph {\n")
+        self.file.write("\trankdir=LR\n")
+        self.file.write("\tnode [color=lightblue shape=box style=filled]\n")
+
+    def node(self, num, path):
+        """ノードを書き出す"""
+        self.file.write(f"\t{dot_node(num, path)}\n")
+
+    def edge(self, num, dep_num, dep_type, line=None):
+        """num が dep_num に依存する関係を書き出す"""
+        self.file.write(f"\t{dot_edge(num, dep_num, dep_type)}\n")
+
+    def close(self):
+        self.file.write("}\n")
+        self.file.close()
+
+
+class JsonLinesWriter:
+    """ノードと依存関係を1行1レコードのJSONで書き出すライター
+
+    {"kind": "node", "num": "1", "path": "app/auth/login.blade.php"}
+    {"kind": "edge", "from": "8", "to": "25", "type": "extends", "line": 1}
+    """
+
+    def __init__(self, output_filename):
+        self.file = open(output_filename, 'w', encoding='utf-8')
+
+    def node(self, num, path):
+        """ノードを書き出す"""
+        self.write({'kind': 'node', 'num': num, 'path': path})
+
+    def edge(self, num, dep_num, dep_type, line=None):
+        """num が dep_num に依存する関係を書き出す"""
+        self.write({'kind': 'edge', 'from': num, 'to': dep_num, 'type': dep_type, 'line': line})
+
+    def write(self, record):
+        self.file.write(json.dumps(record, ensure_ascii=False) + '\n')
+
+    def close(self):
+        self.file.close()
+
+
+class GraphMLWriter:
+    """ノードと依存関係を受け取った順に GraphML で書き出すライター（yEd・Gephi・networkx などで読める）
+
+    エッジの向きは DOT と違い、常に依存元から依存先（extends も子から親）
+    """
+
+    def __init__(self, output_filename):
+        self.file = open(output_filename, 'w', encoding='utf-8')
+        self.file.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                        '<graphml xmlns="http://graphml.graphdrawing.org/xmlns">\n'
+                        '  <key id="path" for="node" attr.name="path" attr.type="string"/>\n'
+                        '  <key id="kind" for="node" attr.name="kind" attr.type="string"/>\n'
+                        '  <key id="type" for="edge" attr.name="type" attr.type="string"/>\n'
+                        '  <key id="line" for="edge" attr.name="line" attr.type="int"/>\n'
+                        '  <graph id="blade" edgedefault="directed">\n')
+
+    def node(self, num, path):
+        """ノードを書き出す"""
+        self.file.write(f'    <node id={quoteattr(num)}><data key="path">{escape(path)}</data>'
+                        f'<data key="kind">{node_kind(num)}</data></node>\n')
+
+    def edge(self, num, dep_num, dep_type, line=None):
+        """num が dep_num に依存する関係を書き出す"""
+        data = f'<data key="type">{escape(dep_type)}</data>'
+        if line is not None:
+            data += f'<data key="line">{line}</data>'
+        self.file.write(f'    <edge source={quoteattr(num)} target={quoteattr(dep_num)}>{data}</edge>\n')
+
+    def close(self):
+        self.file.write('  </graph>\n</graphml>\n')
+        self.file.close()
+
+
+class SqliteWriter:
+    """ノードと依存関係を SQLite のデータベースに書き出すライター
+
+    files(num, path, kind): ノード（kind は node_kind）
+    edges(src, dst, type): src が dst に依存する（同じ組は1行）
+    locations(src, dst, type, line): 依存関係が書かれている行（行番号が分かるものだけ）
+
+    SQLITE_BATCH_SIZE 行ごとに1トランザクションでまとめて挿入し、索引は最後に作る。
+    既存のファイルは作り直す
+    """
+
+    def __init__(self, output_filename, batch_size=SQLITE_BATCH_SIZE):
+        if os.path.exists(output_filename):
+            os.remove(output_filename)
+        self.connection = sqlite3.connect(output_filename)
+        # 作り直せる出力なので、ジャーナルと同期を省いて書き込みを速くする
+        self.connection.execute('PRAGMA journal_mode = OFF')
+        self.connection.execute('PRAGMA synchronous = OFF')
+        self.connection.executescript('''
+            CREATE TABLE files (num TEXT PRIMARY KEY, path TEXT NOT NULL, kind TEXT NOT NULL) WITHOUT ROWID;
+            CREATE TABLE edges (src TEXT NOT NULL, dst TEXT NOT NULL, type TEXT NOT NULL,
+                                PRIMARY KEY (src, dst, type)) WITHOUT ROWID;
+            CREATE TABLE locations (src TEXT NOT NULL, dst TEXT NOT NULL, type TEXT NOT NULL, line INTEGER NOT NULL);
+        ''')
+        self.batch_size = batch_size
+        self.files = []
+        self.edges = []
+        self.locations = []
+
+    def node(self, num, path):
+        """ノードを書き出す"""
+        self.files.append((num, path, node_kind(num)))
+        if len(self.files) >= self.batch_size:
+            self.flush()
+
+    def edge(self, num, dep_num, dep_type, line=None):
+        """num が dep_num に依存する関係を書き出す"""
+        self.edges.append((num, dep_num, dep_type))
+        if line is not None:
+            self.locations.append((num, dep_num, dep_type, line))
+        if len(self.edges) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """溜まっている行を1トランザクションで挿入する"""
+        with self.connection:
+            self.connection.executemany('INSERT OR REPLACE INTO files VALUES (?, ?, ?)', self.files)
+            self.connection.executemany('INSERT OR IGNORE INTO edges VALUES (?, ?, ?)', self.edges)
+            self.connection.executemany('INSERT INTO locations VALUES (?, ?, ?, ?)', self.locations)
+        self.files = []
+        self.edges = []
+        self.locations = []
+
+    def close(self):
+        self.flush()
+        with self.connection:
+            self.connection.executescript('''
+                CREATE INDEX files_path ON files (path);
+                CREATE INDEX edges_dst ON edges (dst);
+                CREATE INDEX locations_src ON locations (src, dst);
+            ''')
+        self.connection.close()
+
+
+class BladePipeline:
+    """列挙・解析・出力を1パスで行うパイプライン
+
+    ファイルは見つかった時点で読み込んで解析し、ノードと依存関係をそのままライターへ流す。
+    まだ列挙されていないファイルへの依存は、そのファイルが見つかるまで保留しておく
+    （最後まで見つからなかったものは、名前空間などを考慮して解決し直し、
+    それでも見つからなければ step2 と同様に missing ノードへの依存として書き出す）
+    """
+
+    def __init__(self, directory, writer, excludes=DEFAULT_EXCLUDES, index_path=None, resolver=None):
+        self.directory = os.path.expanduser(directory)
+        self.writer = writer
+        self.excludes = excludes
+        self.index = FileNumberIndex(index_path, self.directory) if index_path else None
+        self.resolver = resolver or ViewResolver.for_views_directory(self.directory)
+        self.path_to_num = {}
+        self.pending = {}
+        self.unresolved = set()
+        self.node_count = 0
+        self.edge_count = 0
+
+    def run(self):
+        """パイプラインを実行する"""
+        if self.index:
+            self.index.load()
+        for num, path in iter_blade_files(self.directory, self.excludes, self.index):
+            self.path_to_num[path] = num
+            self.writer.node(num, path)
+            self.node_count += 1
+            for src_num, dep_type, line, _name in self.pending.pop(path, ()):
+                self.emit(src_num, num, dep_type, line)
+
+            with open(os.path.join(self.directory, path), 'r', encoding='utf-8') as file:
+                content = file.read()
+            for edge in scan_directives(content, dynamic=True):
+                if edge.name.startswith(DYNAMIC_PREFIX):
+                    self.emit(num, self.unresolved_node(edge.name), edge.type, edge.line)
+                    continue
+                target = view_name_to_path(edge.name)
+                dep_num = self.path_to_num.get(target)
+                if dep_num is None:
+                    self.pending.setdefault(target, []).append((num, edge.type, edge.line, edge.name))
+                else:
+                    self.emit(num, dep_num, edge.type, edge.line)
+        for entries in self.pending.values():
+            for src_num, dep_type, line, name in entries:
+                self.emit(src_num, self.resolve_leftover(name, dep_type), dep_type, line)
+        self.pending = {}
+        self.writer.close()
+        if self.index:
+            self.index.save()
+
+    def resolve_leftover(self, name, dep_type):
+        """列挙中に見つからなかったビュー名を解決し、列挙対象外・見つからなければそのノードを書き出す"""
+        full_path = self.resolver.resolve(name, dep_type)
+        if full_path is not None:
+            relative = os.path.relpath(full_path, self.directory)
+            if relative in self.path_to_num:
+                return self.path_to_num[relative]
+            relative = os.path.relpath(full_path, self.resolver.root_directory)
+            num = EXTERNAL_PREFIX + relative.replace(os.sep, '/')
+        else:
+            num = MISSING_PREFIX + name
+        return self.unresolved_node(num)
+
+    def unresolved_node(self, num):
+        """見つからない・列挙対象外・動的なビューのノードを（初めてなら）書き出す"""
+        if num not in self.unresolved:
+            self.unresolved.add(num)
+            self.writer.node(num, unresolved_label(num))
+        return num
+
+    def emit(self, num, dep_num, dep_type, line):
+        self.writer.edge(num, dep_num, dep_type, line)
+        self.edge_count += 1
+
+
+def add_enumeration_arguments(parser):
+    """列挙に関するコマンドライン引数（除外パターン・番号インデックス）を追加する"""
+    parser.add_argument('--exclude', action='append', default=[], metavar='PATTERN',
+                        help=f'走査しないディレクトリ・ファイルのパターン（複数指定可, 既定で {", ".join(DEFAULT_EXCLUDES)} を除外）')
+    parser.add_argument('--index', default=DEFAULT_INDEX_PATH,
+                        help=f'ファイル番号インデックスのパス（デフォルト: {DEFAULT_INDEX_PATH}）')
+    parser.add_argument('--no-index', action='store_true', help='番号インデックスを使わず1から振り直す')
+
+
+def enumeration_excludes(args):
+    return DEFAULT_EXCLUDES + tuple(args.exclude)
+
+
+def enumeration_index_path(args):
+    return None if args.no_index else args.index
+
+
+WRITERS = {
+    'dot': DotWriter,
+    'jsonl': JsonLinesWriter,
+    'graphml': GraphMLWriter,
+    'sqlite': SqliteWriter,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='Bladeファイルの列挙・依存関係の解析・DOT/JSON Lines/GraphML/SQLite の出力を1パスで行う',
+        usage='python blade_pipeline.py ~/Sites/event-form.jp/program/laravel/resources/views [options]')
+    parser.add_argument('directory')
+    parser.add_argument('--format', choices=sorted(WRITERS), default='dot', help='出力形式（デフォルト: dot）')
+    parser.add_argument('--output', '-o', help='出力ファイル（デフォルト: dependency_graph.<形式>）')
+    add_enumeration_arguments(parser)
+    args = parser.parse_args()
+
+    output = args.output or f"dependency_graph.{args.format}"
+    pipeline = BladePipeline(args.directory, WRITERS[args.format](output),
+                             enumeration_excludes(args), enumeration_index_path(args))
+    pipeline.run()
+    print(f"{output}: ノード {pipeline.node_count} 件, 依存関係 {pipeline.edge_count} 件")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,175 @@
+"""各段階の処理時間・読み込んだバイト数・ファイル数を記録する軽量なプロファイラ
+
+無効なとき（デフォルト）は span() が何もしないコンテキストマネージャを返すだけなので、
+計測のコードを残したままでもほとんどコストがかからない。
+1ファイルごとの計測のように回数の多いものは、呼び出し側で profiler.enabled を確認してから記録する
+
+--profile PATH で書き出すJSONは、集計結果に加えて Chrome のトレース形式（traceEvents）を含むので、
+そのまま chrome://tracing や Perfetto で開ける
+"""
+import os
+import sys
+import json
+import time
+import heapq
+import cProfile
+import pstats
+import threading
+from contextlib import contextmanager
+
+# 記録する「解析に時間のかかったファイル」の件数
+SLOWEST_FILES = 20
+CPROFILE_TOP = 30
+
+
+class NullSpan:
+    """無効なときに span() が返す、何もしないコンテキストマネージャ"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+NULL_SPAN = NullSpan()
+
+
+class Span:
+    def __init__(self, profiler, name, args):
+        self.profiler = profiler
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.add_span(self.name, self.start, time.perf_counter(), self.args)
+        return False
+
+
+class Profiler:
+    """段階ごとの区間（span）・カウンタ・時間のかかったファイルを記録する"""
+
+    def __init__(self, slowest=SLOWEST_FILES):
+        self.enabled = False
+        self.slowest_count = slowest
+        self.reset()
+
+    def reset(self):
+        self.origin = time.perf_counter()
+        self.spans = []
+        self.counters = {}
+        self.slowest = []
+
+    def enable(self):
+        self.reset()
+        self.enabled = True
+
+    def disable(self):
+        self.enabled = False
+
+    def span(self, name, **args):
+        """with profiler.span('analyze.scan'): のように処理の区間を記録する"""
+        if not self.enabled:
+            return NULL_SPAN
+        return Span(self, name, args)
+
+    def add_span(self, name, start, end, args=None):
+        self.spans.append((name, start, end, threading.get_ident(), args or {}))
+
+    def count(self, name, value=1):
+        """カウンタ（読み込んだバイト数・処理したファイル数など）に加算する"""
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def file(self, path, seconds, size=None):
+        """1ファイルの処理時間を記録し、時間のかかった上位だけを残す"""
+        if not self.enabled:
+            return
+        entry = (seconds, path, size)
+        if len(self.slowest) < self.slowest_count:
+            heapq.heappush(self.slowest, entry)
+        elif entry > self.slowest[0]:
+            heapq.heapreplace(self.slowest, entry)
+
+    def summary(self):
+        """区間名ごとの合計時間・回数とカウンタ、時間のかかったファイルをまとめる"""
+        stages = {}
+        for name, start, end, _tid, _args in self.spans:
+            stage = stages.setdefault(name, {'seconds': 0.0, 'calls': 0})
+            stage['seconds'] += end - start
+            stage['calls'] += 1
+        return {
+            'stages': stages,
+            'counters': dict(self.counters),
+            'slowest_files': [{'path': path, 'seconds': seconds, 'size': size}
+                              for seconds, path, size in sorted(self.slowest, reverse=True)],
+        }
+
+    def trace_events(self):
+        """Chrome のトレース形式のイベント（時刻はマイクロ秒）"""
+        pid = os.getpid()
+        events = [{'name': name, 'ph': 'X', 'pid': pid, 'tid': tid,
+                   'ts': (start - self.origin) * 1e6, 'dur': (end - start) * 1e6, 'args': args}
+                  for name, start, end, tid, args in self.spans]
+        end = max((span[2] for span in self.spans), default=self.origin)
+        events.extend({'name': name, 'ph': 'C', 'pid': pid, 'ts': (end - self.origin) * 1e6, 'args': {name: value}}
+                      for name, value in self.counters.items())
+        return events
+
+    def write(self, path):
+        """集計結果と traceEvents を1つのJSONに書き出す"""
+        data = self.summary()
+        data['command'] = sys.argv
+        data['traceEvents'] = self.trace_events()
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False, indent=1)
+
+    def report(self):
+        """集計結果を表示する"""
+        summary = self.summary()
+        for name, stage in summary['stages'].items():
+            print(f"{name:28s} {stage['seconds'] * 1000:10.1f} ms  ({stage['calls']} 回)")
+        for name, value in summary['counters'].items():
+            print(f"{name:28s} {value:>10}")
+        if summary['slowest_files']:
+            print("時間のかかったファイル:")
+            for entry in summary['slowest_files'][:10]:
+                print(f"  {entry['seconds'] * 1000:8.2f} ms  {entry['path']}")
+
+
+# 各ステップが共有するプロファイラ（--profile を指定したときだけ有効にする）
+profiler = Profiler()
+
+
+def add_profile_arguments(parser):
+    """プロファイルに関するコマンドライン引数を追加する"""
+    parser.add_argument('--profile', metavar='PATH',
+                        help='段階ごとの処理時間などをJSON（Chrome のトレース形式を含む）に書き出す')
+    parser.add_argument('--cprofile', metavar='PATH', help='cProfile で実行し、統計をこのファイルに書き出す')
+
+
+@contextmanager
+def profile_run(args):
+    """--profile / --cprofile の指定に従って、with ブロック内の処理を計測する"""
+    if args.profile:
+        profiler.enable()
+    deep = cProfile.Profile() if args.cprofile else None
+    if deep:
+        deep.enable()
+    try:
+        with profiler.span('total'):
+            yield profiler
+    finally:
+        if deep:
+            deep.disable()
+            deep.dump_stats(args.cprofile)
+            pstats.Stats(deep).sort_stats('cumulative').print_stats(CPROFILE_TOP)
+        if args.profile:
+            profiler.disable()
+            profiler.write(args.profile)
+            profiler.report()
+            print(f"{args.profile} に書き出しました")
@@ -0,0 +1,220 @@
+import json
+import argparse
+from collections import deque
+
+from blade_directive_scanner import DIRECTIVES, DIRECTIVE_FAMILIES
+from blade_dynamic_includes import CANDIDATE_TYPE
+
+# --type に指定できる依存関係の種類（系統名・ディレクティブ名と、コントローラ・ルートの view() などの種類）
+TYPE_CHOICES = tuple(DIRECTIVE_FAMILIES) + tuple(d for d in DIRECTIVES if d not in DIRECTIVE_FAMILIES) + (
+    'view', 'controller', CANDIDATE_TYPE)
+
+
+def expand_types(types):
+    """--type の指定を依存関係の種類の集合にする（系統名なら includeIf などその系統のディレクティブも含める）"""
+    expanded = set()
+    for name in types:
+        expanded.update(DIRECTIVE_FAMILIES.get(name, (name,)))
+    return expanded
+
+
+class DependencyIndex:
+    """blade_dependencies.json から作る隣接インデックス
+
+    forward[num]: num が依存しているノード（include / extends している先）
+    reverse[num]: num に依存しているノード（num を include / extends している側）
+    推移閉包はノード・方向・種類ごとにメモ化し、同じ問い合わせは再計算しない
+    """
+
+    def __init__(self, dependencies, file_map, types=None):
+        self.file_map = file_map
+        self.inverse_file_map = {path: num for num, path in file_map.items()}
+        self.types = expand_types(types) if types else None
+        self.forward = {num: [] for num in file_map}
+        self.reverse = {num: [] for num in file_map}
+        self.edge_types = {}
+        self.closure_cache = {}
+        self.add_edges((num, dep['num'], dep['type']) for num, deps in dependencies.items() for dep in deps)
+
+    @classmethod
+    def from_edges(cls, nodes, edges, types=None):
+        """(番号, パス) と (依存元, 依存先, 種別) の列からインデックスを作る（CompactGraph など用）"""
+        index = cls({}, dict(nodes), types)
+        index.add_edges(edges)
+        return index
+
+    def add_edges(self, edges):
+        """(依存元, 依存先, 種別) の列を取り込む（同じ組の重複は最初の種別だけ残す）"""
+        for num, dep_num, dep_type in edges:
+            if self.types and dep_type not in self.types:
+                continue
+            key = (num, dep_num)
+            if key in self.edge_types:
+                continue
+            self.edge_types[key] = dep_type
+            self.forward.setdefault(num, []).append(dep_num)
+            self.reverse.setdefault(dep_num, []).append(num)
+        self.closure_cache.clear()
+
+    @classmethod
+    def from_json(cls, dependencies_path='blade_dependencies.json', files_path='blade_files.json', types=None):
+        """JSONファイルからインデックスを作る"""
+        with open(dependencies_path, 'r', encoding='utf-8') as f:
+            dependencies = json.load(f)
+        with open(files_path, 'r', encoding='utf-8') as f:
+            file_map = json.load(f)
+        return cls(dependencies, file_map, types)
+
+    def resolve(self, name):
+        """ノード番号・相対パス・ドット区切りのビュー名のいずれかからノード番号を返す"""
+        if name in self.file_map or name in self.reverse or name in self.forward:
+            # reverse にだけあるのは見つからないビューなど（'missing:<ビュー名>'）、
+            # forward にだけあるのはルートなど（'route:GET /users'）
+            return name
+        if name in self.inverse_file_map:
+            return self.inverse_file_map[name]
+        path = name.replace('.', '/') + '.blade.php'
+        if path in self.inverse_file_map:
+            return self.inverse_file_map[path]
+        raise KeyError(f"Bladeファイルが見つかりません: {name}")
+
+    def closure(self, num, reverse=False):
+        """num から推移的に到達できるノードの集合（num 自身は含まない）"""
+        key = (num, reverse)
+        cached = self.closure_cache.get(key)
+        if cached is not None:
+            return cached
+        adjacency = self.reverse if reverse else self.forward
+        visited = set()
+        stack = [num]
+        while stack:
+            current = stack.pop()
+            for neighbor in adjacency.get(current, ()):
+                if neighbor in visited:
+                    continue
+                done = self.closure_cache.get((neighbor, reverse))
+                if done is not None:
+                    # 計算済みの閉包はまとめて取り込む
+                    visited.add(neighbor)
+                    visited.update(done)
+                else:
+                    visited.add(neighbor)
+                    stack.append(neighbor)
+        visited.discard(num)
+        result = frozenset(visited)
+        self.closure_cache[key] = result
+        return result
+
+    def impacted(self, num):
+        """num を変更したときに影響を受ける（num に推移的に依存する）ノード"""
+        return self.closure(num, reverse=True)
+
+    def requires(self, num):
+        """num が推移的に依存するノード"""
+        return self.closure(num)
+
+    def path(self, source, target):
+        """source から target への最短の依存経路（ノード番号のリスト、なければ None）"""
+        previous = {source: None}
+        queue = deque([source])
+        while queue:
+            current = queue.popleft()
+            if current == target:
+                route = []
+                while current is not None:
+                    route.append(current)
+                    current = previous[current]
+                return route[::-1]
+            for neighbor in self.forward.get(current, ()):
+                if neighbor not in previous:
+                    previous[neighbor] = current
+                    queue.append(neighbor)
+        return None
+
+    def neighbourhood(self, root, depth=None, direction='both'):
+        """root から depth 段以内にあるノードの集合（root を含む）
+
+        direction: 'down' は root が依存する側、'up' は root に依存する側、'both' は両方
+        """
+        adjacencies = []
+        if direction in ('down', 'both'):
+            adjacencies.append(self.forward)
+        if direction in ('up', 'both'):
+            adjacencies.append(self.reverse)
+        found = {root}
+        for adjacency in adjacencies:
+            frontier = [root]
+            seen = {root}
+            level = 0
+            while frontier and (depth is None or level < depth):
+                next_frontier = []
+                for current in frontier:
+                    for neighbor in adjacency.get(current, ()):
+                        if neighbor not in seen:
+                            seen.add(neighbor)
+                            next_frontier.append(neighbor)
+                frontier = next_frontier
+                level += 1
+            found |= seen
+        return found
+
+    def subgraph_edges(self, nodes):
+        """両端が nodes に含まれるエッジ (依存元, 依存先, 種別) を nodes の順に重複なしで返す"""
+        selected = set(nodes)
+        for num in nodes:
+            for dep_num in self.forward.get(num, ()):
+                if dep_num in selected:
+                    yield num, dep_num, self.edge_types[(num, dep_num)]
+
+    def nodes(self):
+        """すべてのノード（ファイルと、見つからないビューやルートなど依存関係にだけ出てくるもの）"""
+        return self.forward.keys() | self.reverse.keys()
+
+    def label(self, num):
+        return self.file_map.get(num, num)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Bladeファイルの依存関係を問い合わせる')
+    parser.add_argument('--dependencies', default='blade_dependencies.json', help='依存関係JSONのパス')
+    parser.add_argument('--files', default='blade_files.json', help='ファイル番号JSONのパス')
+    parser.add_argument('--type', action='append', dest='types', metavar='TYPE', choices=TYPE_CHOICES,
+                        help='対象にする依存関係の種類（include, extends など。include は includeIf なども含む。複数指定可）')
+    parser.add_argument('--json', action='store_true', help='結果をJSONで出力する')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    impacted = subparsers.add_parser('impacted', help='変更したときに影響を受けるファイル')
+    impacted.add_argument('targets', nargs='+', metavar='file')
+    requires = subparsers.add_parser('requires', help='推移的に依存しているファイル')
+    requires.add_argument('targets', nargs='+', metavar='file')
+    path = subparsers.add_parser('path', help='a から b への依存経路')
+    path.add_argument('source')
+    path.add_argument('target')
+    args = parser.parse_args()
+
+    index = DependencyIndex.from_json(args.dependencies, args.files, args.types)
+    try:
+        if args.command == 'path':
+            route = index.path(index.resolve(args.source), index.resolve(args.target))
+            result = [index.label(num) for num in route] if route else []
+        else:
+            query = index.impacted if args.command == 'impacted' else index.requires
+            found = set()
+            for name in args.targets:
+                found.update(query(index.resolve(name)))
+            result = sorted(index.label(num) for num in found)
+    except KeyError as e:
+        parser.exit(1, f"{e.args[0]}\n")
+
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+    elif args.command == 'path':
+        if not result:
+            parser.exit(1, "経路が見つかりません\n")
+        print(' -> '.join(result))
+    else:
+        for label in result:
+            print(label)
+
+
+if __name__ == "__main__":
+    main()
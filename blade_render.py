@@ -0,0 +1,249 @@
+"""ディレクトリごとのクラスタにまとめたDOTの生成と、Graphviz の非同期な描画
+
+- ClusteredDotWriter: ノードを app/auth のようなディレクトリごとの subgraph cluster_* にまとめて書き出す
+  （dot がレイアウトするときの順位付けがクラスタ内で閉じるので、大きなグラフでも解きやすくなる）
+- start_render: dot を子プロセスとして別スレッドのイベントループで起動し、すぐに Future を返す
+  （タイムアウトしたら止める。呼び出し側は描画を待たずに他の処理を続けられる）
+- render_file: start_render の結果を待つだけの同期版（CLI 向け。描画が終わるまで戻らない）
+- render_clusters: クラスタごとのDOTとクラスタ間の概観を並列に描画し、index.html から辿れるようにする
+
+どれも dot コマンド（Graphviz）が PATH にあることが前提
+"""
+import os
+import html
+import asyncio
+import threading
+from concurrent.futures import Future
+from collections import defaultdict
+
+from blade_pipeline import DotWriter, dot_node, dot_edge, node_kind, quote_dot_id
+
+# クラスタにまとめるディレクトリの深さ（app/auth/login.blade.php なら app/auth）
+DEFAULT_CLUSTER_DEPTH = 2
+ROOT_CLUSTER = '(root)'
+INDEX_PAGE = 'index.html'
+OVERVIEW = 'overview'
+# render_all の結果で概観を表す名前（クラスタ名と重ならない）
+OVERVIEW_KEY = '(overview)'
+
+
+def cluster_key(num, path, depth=DEFAULT_CLUSTER_DEPTH):
+    """ノードが属するクラスタ名（ディレクトリの先頭 depth 段。ファイル以外は種類ごと）"""
+    kind = node_kind(num)
+    if kind != 'file':
+        return kind
+    directories = path.replace(os.sep, '/').split('/')[:-1]
+    return '/'.join(directories[:depth]) or ROOT_CLUSTER
+
+
+def cluster_file_names(clusters):
+    """クラスタ名 -> ファイル名に使える重複しない名前（app/auth -> app_auth）"""
+    names = {}
+    used = {OVERVIEW}
+    for cluster in sorted(clusters):
+        base = ''.join(ch if ch.isalnum() or ch in '-_' else '_' for ch in cluster) or 'cluster'
+        name = base
+        suffix = 2
+        while name in used:
+            name = f"{base}_{suffix}"
+            suffix += 1
+        used.add(name)
+        names[cluster] = name
+    return names
+
+
+class ClusteredDotWriter(DotWriter):
+    """ノードをディレクトリごとの subgraph cluster にまとめて書き出すライター
+
+    クラスタごとにまとめるため、ノードと依存関係は close() まで溜めておく
+    """
+
+    def __init__(self, output_filename, depth=DEFAULT_CLUSTER_DEPTH, comment='Blade Template Dependencies'):
+        super().__init__(output_filename, comment)
+        self.depth = depth
+        self.clusters = defaultdict(list)
+        self.edges = []
+
+    def node(self, num, path):
+        self.clusters[cluster_key(num, path, self.depth)].append(dot_node(num, path))
+
+    def edge(self, num, dep_num, dep_type, line=None):
+        self.edges.append(dot_edge(num, dep_num, dep_type))
+
+    def close(self):
+        for number, (cluster, nodes) in enumerate(sorted(self.clusters.items())):
+            self.file.write(f"\tsubgraph cluster_{number} {{\n")
+            self.file.write(f"\t\tlabel={quote_dot_id(cluster)}\n")
+            for node in nodes:
+                self.file.write(f"\t\t{node}\n")
+            self.file.write("\t}\n")
+        for edge in self.edges:
+            self.file.write(f"\t{edge}\n")
+        super().close()
+
+
+async def run_dot(dot_path, output_path, output_format, timeout=None):
+    """dot を非同期に実行する（timeout 秒を過ぎたら子プロセスを止めて RuntimeError）"""
+    try:
+        process = await asyncio.create_subprocess_exec(
+            'dot', f'-T{output_format}', '-o', output_path, dot_path,
+            stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE)
+    except FileNotFoundError:
+        raise RuntimeError("dot コマンドが見つかりません（Graphviz をインストールしてください）")
+    try:
+        _, stderr = await asyncio.wait_for(process.communicate(), timeout)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        raise RuntimeError(f"{dot_path} の描画が {timeout} 秒で終わらなかったため中止しました")
+    if process.returncode != 0:
+        raise RuntimeError(f"{dot_path} の描画に失敗しました: {stderr.decode(errors='replace').strip()}")
+    return output_path
+
+
+def start_render(dot_path, output_format='svg', timeout=None):
+    """DOTファイルの描画をバックグラウンドで始め、concurrent.futures.Future を返す
+
+    Future の結果は <dot_path>.<形式> のパス（graphviz.render と同じ名前）。
+    dot が見つからない・失敗した・timeout 秒を過ぎた場合は RuntimeError になる
+    """
+    future = Future()
+    future.set_running_or_notify_cancel()
+
+    def work():
+        try:
+            result = asyncio.run(run_dot(dot_path, f"{dot_path}.{output_format}", output_format, timeout))
+        except Exception as e:  # 例外は Future 経由で呼び出し側に渡す
+            future.set_exception(e)
+        else:
+            future.set_result(result)
+
+    threading.Thread(target=work, daemon=True).start()
+    return future
+
+
+def render_file(dot_path, output_format='svg', timeout=None):
+    """DOTファイルを描画して書き出したパスを返す（start_render の完了を待つ同期版で、それまで戻らない）"""
+    return start_render(dot_path, output_format, timeout).result()
+
+
+def split_clusters(nodes, edges, depth=DEFAULT_CLUSTER_DEPTH):
+    """ノードをクラスタに分け、クラスタ内のエッジとクラスタ間のエッジ数を数える
+
+    戻り値: (クラスタ名 -> [(番号, パス)], クラスタ名 -> [エッジ], (クラスタ, クラスタ) -> 本数)
+    クラスタをまたぐエッジは、相手のノードを含めて両方のクラスタのエッジに入れる
+    """
+    members = defaultdict(list)
+    cluster_of = {}
+    for num, path in nodes:
+        cluster = cluster_key(num, path, depth)
+        members[cluster].append((num, path))
+        cluster_of[num] = cluster
+    cluster_edges = defaultdict(list)
+    between = defaultdict(int)
+    for edge in edges:
+        num, dep_num = edge[0], edge[1]
+        source = cluster_of.get(num, ROOT_CLUSTER)
+        target = cluster_of.get(dep_num, ROOT_CLUSTER)
+        cluster_edges[source].append(edge)
+        if target != source:
+            cluster_edges[target].append(edge)
+            between[(source, target)] += 1
+    return members, cluster_edges, between
+
+
+def write_cluster_dot(output_path, members, edges, labels):
+    """1クラスタ分のDOT（他のクラスタのノードはクラスタ名を添えて灰色で描く）"""
+    writer = DotWriter(output_path)
+    inside = {num for num, _ in members}
+    for num, path in members:
+        writer.node(num, path)
+    outside = {}
+    for edge in edges:
+        for num in edge[:2]:
+            if num not in inside and num not in outside:
+                outside[num] = labels.get(num, num)
+    for num, label in outside.items():
+        writer.file.write(f"\t{quote_dot_id(num)} [label={quote_dot_id(label)} color=lightgrey]\n")
+    for edge in edges:
+        writer.edge(edge[0], edge[1], edge[2])
+    writer.close()
+
+
+def write_overview_dot(output_path, members, between, names, output_format):
+    """クラスタを1ノードにまとめた概観のDOT（エッジのラベルは本数、SVG ではクラスタの画像へのリンク）"""
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write("digraph {\n\trankdir=LR\n\tnode [color=lightblue shape=box style=filled]\n")
+        for cluster, nodes in sorted(members.items()):
+            f.write(f"\t{quote_dot_id(cluster)} [label={quote_dot_id(f'{cluster} ({len(nodes)})')}"
+                    f" URL={quote_dot_id(f'{names[cluster]}.{output_format}')}]\n")
+        for (source, target), count in sorted(between.items()):
+            f.write(f"\t{quote_dot_id(source)} -> {quote_dot_id(target)} [label={count}]\n")
+        f.write("}\n")
+
+
+def write_index_page(output_path, members, cluster_edges, names, output_format, failures):
+    """概観とクラスタごとの画像へのリンクを並べた index.html"""
+    rows = []
+    for cluster, nodes in sorted(members.items()):
+        name = names[cluster]
+        link = f'<a href="{name}.{output_format}">{html.escape(cluster)}</a>'
+        if cluster in failures:
+            link = f'{html.escape(cluster)} （描画失敗: {html.escape(failures[cluster])}）'
+        rows.append(f"<tr><td>{link}</td><td>{len(nodes)}</td><td>{len(cluster_edges.get(cluster, ()))}</td></tr>")
+    overview = ''
+    if OVERVIEW_KEY not in failures:
+        # SVG は object で埋め込むと、概観のクラスタからそれぞれの画像へのリンクが効く
+        if output_format == 'svg':
+            overview = f'<p><object data="{OVERVIEW}.svg" type="image/svg+xml"></object></p>'
+        else:
+            overview = f'<p><img src="{OVERVIEW}.{output_format}" alt="overview"></p>'
+
+    with open(output_path, 'w', encoding='utf-8') as f:
+        f.write('<!DOCTYPE html>\n<html lang="ja">\n<head><meta charset="utf-8"><title>Blade の依存関係</title></head>\n'
+                f'<body>\n<h1>Blade の依存関係</h1>\n{overview}\n'
+                '<table>\n<tr><th>クラスタ</th><th>ノード</th><th>エッジ</th></tr>\n'
+                + '\n'.join(rows) + '\n</table>\n</body>\n</html>\n')
+
+
+async def render_all(jobs, output_format, timeout, concurrency):
+    """(名前, DOTのパス, 出力先) の列を同時に concurrency 個まで描画し、失敗したものを {名前: 理由} で返す"""
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    failures = {}
+
+    async def render_one(name, dot_path, output_path):
+        async with semaphore:
+            try:
+                await run_dot(dot_path, output_path, output_format, timeout)
+            except RuntimeError as e:
+                failures[name] = str(e)
+
+    await asyncio.gather(*(render_one(*job) for job in jobs))
+    return failures
+
+
+def render_clusters(nodes, edges, output_directory, output_format='svg', timeout=None, concurrency=None,
+                    depth=DEFAULT_CLUSTER_DEPTH):
+    """クラスタごとのDOTと概観を output_directory に書き出して並列に描画する
+
+    戻り値: (index.html のパス, 描画に失敗したもの {クラスタ名: 理由})
+    描画に失敗・タイムアウトしたクラスタは index.html に理由を載せ、他のクラスタの描画は続ける
+    """
+    nodes = list(nodes)
+    os.makedirs(output_directory, exist_ok=True)
+    members, cluster_edges, between = split_clusters(nodes, edges, depth)
+    names = cluster_file_names(members)
+    labels = {num: f"{path}\\n[{cluster_key(num, path, depth)}]" for num, path in nodes}
+    jobs = []
+    for cluster, cluster_nodes in members.items():
+        dot_path = os.path.join(output_directory, names[cluster] + '.dot')
+        write_cluster_dot(dot_path, cluster_nodes, cluster_edges.get(cluster, ()), labels)
+        jobs.append((cluster, dot_path, os.path.join(output_directory, f"{names[cluster]}.{output_format}")))
+    overview_path = os.path.join(output_directory, OVERVIEW + '.dot')
+    write_overview_dot(overview_path, members, between, names, output_format)
+    jobs.append((OVERVIEW_KEY, overview_path, os.path.join(output_directory, f"{OVERVIEW}.{output_format}")))
+
+    failures = asyncio.run(render_all(jobs, output_format, timeout, concurrency or os.cpu_count() or 1))
+    index_path = os.path.join(output_directory, INDEX_PAGE)
+    write_index_page(index_path, members, cluster_edges, names, output_format, failures)
+    return index_path, failures
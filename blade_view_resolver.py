@@ -0,0 +1,150 @@
+"""Laravel のビューファインダ（Illuminate\\View\\FileViewFinder）と同じ規則でビュー名をファイルに解決する
+
+- 'a.b' は設定されたビューパスを順に探し、最初に見つかった a/b.blade.php（または .php など）
+- 'namespace::a.b' は名前空間のパスを順に探す。各ビューパスの vendor/namespace
+  （パッケージのビューを publish して上書きしたもの）がパッケージ本来のパスより優先される
+- <x-alert> などの匿名コンポーネントは components/alert が無ければ components/alert/index も探す
+
+解決結果はファイルの有無を調べるたびに変わらないよう LRU でメモ化する（ファイルが増減したら clear() する）
+
+プロジェクトのルートに blade_views.json を置くと、ビューパスと名前空間を指定できる
+（パスはプロジェクトのルートからの相対パス）:
+{
+  "paths": ["resources/views", "modules/shop/views"],
+  "namespaces": {"mail": ["vendor/laravel/framework/src/Illuminate/Mail/resources/views/html"]}
+}
+
+見つかったファイルのうち列挙対象外のもの（パッケージや2つ目以降のビューパスのビュー）は
+'external:<プロジェクトからの相対パス>'、見つからなかったビュー名は 'missing:<ビュー名>' という
+番号のノードとして依存関係に残す
+"""
+import os
+import json
+from functools import lru_cache
+
+DEFAULT_CONFIG = 'blade_views.json'
+DEFAULT_VIEW_PATHS = ('resources/views',)
+# Laravel の既定の拡張子（登録順に探す）
+EXTENSIONS = ('blade.php', 'php', 'css', 'html')
+HINT_DELIMITER = '::'
+DEFAULT_CACHE_SIZE = 8192
+
+MISSING_PREFIX = 'missing:'
+EXTERNAL_PREFIX = 'external:'
+# @include($partial) のように式で指定されたビュー（blade_directive_scanner が付ける）
+DYNAMIC_PREFIX = 'dynamic:'
+# ビューを描画するコントローラのメソッドとルート（blade_php_scanner が付ける）
+CONTROLLER_PREFIX = 'controller:'
+ROUTE_PREFIX = 'route:'
+UNRESOLVED_PREFIXES = (MISSING_PREFIX, EXTERNAL_PREFIX, DYNAMIC_PREFIX, CONTROLLER_PREFIX, ROUTE_PREFIX)
+# コントローラの表示名では省略する名前空間
+CONTROLLER_NAMESPACE = 'App\\Http\\Controllers\\'
+
+
+def is_unresolved(num):
+    """列挙されたファイルではない（見つからない・列挙対象外・動的な・コントローラ・ルートの）ノードか"""
+    return num.startswith(UNRESOLVED_PREFIXES)
+
+
+def unresolved_label(num):
+    """見つからない・列挙対象外・動的な・コントローラ・ルートのノードの表示名"""
+    if num.startswith(MISSING_PREFIX):
+        return num[len(MISSING_PREFIX):] + ' (missing)'
+    if num.startswith(DYNAMIC_PREFIX):
+        return num[len(DYNAMIC_PREFIX):] + ' (dynamic)'
+    if num.startswith(CONTROLLER_PREFIX):
+        name = num[len(CONTROLLER_PREFIX):]
+        if name.startswith(CONTROLLER_NAMESPACE):
+            name = name[len(CONTROLLER_NAMESPACE):]
+        return name
+    if num.startswith(ROUTE_PREFIX):
+        return num[len(ROUTE_PREFIX):]
+    return num[len(EXTERNAL_PREFIX):]
+
+
+class ViewResolver:
+    """ビュー名を実ファイルの絶対パスに解決する
+
+    root_directory は external ノードのパスの基準（省略時は最初のビューパス）
+    """
+
+    def __init__(self, view_paths, namespaces=None, extensions=EXTENSIONS, cache_size=DEFAULT_CACHE_SIZE,
+                 root_directory=None):
+        self.view_paths = [os.path.abspath(path) for path in view_paths]
+        self.root_directory = os.path.abspath(root_directory or self.view_paths[0])
+        self.extensions = extensions
+        self.hints = {}
+        # パッケージのビューを上書きする resources/views/vendor/<名前空間> を先に探す
+        for path in self.view_paths:
+            vendor = os.path.join(path, 'vendor')
+            if os.path.isdir(vendor):
+                for entry in sorted(os.listdir(vendor)):
+                    if os.path.isdir(os.path.join(vendor, entry)):
+                        self.hints.setdefault(entry, []).append(os.path.join(vendor, entry))
+        for namespace, paths in (namespaces or {}).items():
+            self.hints.setdefault(namespace, []).extend(os.path.abspath(path) for path in paths)
+        self.find = lru_cache(maxsize=cache_size)(self._find)
+
+    @classmethod
+    def from_project(cls, root_directory, config_path=None):
+        """プロジェクトのルートと設定ファイル（省略時はルートの blade_views.json）から作る"""
+        root_directory = os.path.expanduser(root_directory)
+        if config_path is None:
+            config_path = os.path.join(root_directory, DEFAULT_CONFIG)
+            config = {}
+            if os.path.exists(config_path):
+                config = load_config(config_path)
+        else:
+            config = load_config(config_path)
+        paths = [os.path.join(root_directory, path) for path in config.get('paths', DEFAULT_VIEW_PATHS)]
+        namespaces = {namespace: [os.path.join(root_directory, path) for path in paths_]
+                      for namespace, paths_ in config.get('namespaces', {}).items()}
+        return cls(paths, namespaces, root_directory=root_directory)
+
+    @classmethod
+    def for_views_directory(cls, views_directory, config_path=None):
+        """ビューディレクトリから作る（.../resources/views ならその上をプロジェクトのルートとみなす）"""
+        views_directory = os.path.abspath(os.path.expanduser(views_directory))
+        parent, views = os.path.split(views_directory)
+        root, resources = os.path.split(parent)
+        if (resources, views) == ('resources', 'views'):
+            return cls.from_project(root, config_path)
+        if config_path:
+            return cls.from_project(views_directory, config_path)
+        return cls([views_directory])
+
+    def _find(self, name):
+        """ビュー名のファイルの絶対パス（見つからなければ None）"""
+        # Laravel と同じく 'a/b' も 'a.b' として扱う
+        name = name.strip().replace('/', '.')
+        if HINT_DELIMITER in name:
+            namespace, _, name = name.partition(HINT_DELIMITER)
+            paths = self.hints.get(namespace, ())
+        else:
+            paths = self.view_paths
+        relative = name.replace('.', os.sep)
+        for path in paths:
+            for extension in self.extensions:
+                candidate = os.path.join(path, relative + '.' + extension)
+                if os.path.isfile(candidate):
+                    return candidate
+        return None
+
+    def resolve(self, name, dep_type=None):
+        """依存関係の種類も考慮してビュー名を解決する（匿名コンポーネントの index も探す）"""
+        path = self.find(name)
+        if path is None and dep_type == 'component':
+            path = self.find(name + '.index')
+        return path
+
+    def clear(self):
+        """ファイルが増減したときにメモ化した結果を捨てる"""
+        self.find.cache_clear()
+
+    def cache_info(self):
+        return self.find.cache_info()
+
+
+def load_config(config_path):
+    with open(config_path, 'r', encoding='utf-8') as f:
+        return json.load(f)
@@ -0,0 +1,427 @@
+"""ビューディレクトリを監視し、依存関係グラフを常に最新に保つ
+
+Bladeファイルの作成・変更・削除・リネームを検知して、影響のあるファイルだけを再解析し、
+blade_files.json / blade_dependencies.json を書き換える。
+変更内容は1行1イベントのJSONとしてTCPで配信し、ビューア（step4 の --watch）が差分だけを反映する。
+
+イベントは DEBOUNCE_SECONDS の間まとめてから処理するので、git checkout で大量のファイルが
+書き換わっても1回の更新になる。
+
+Linux では inotify を使い、使えない環境では定期的にディレクトリを走査して差分を検出する
+"""
+import os
+import sys
+import json
+import time
+import errno
+import select
+import socket
+import struct
+import argparse
+import threading
+import ctypes
+import ctypes.util
+
+from blade_pipeline import (DEFAULT_EXCLUDES, FileNumberIndex, is_excluded, scan_blade_files, iter_blade_files,
+                            add_enumeration_arguments, enumeration_excludes,
+                            enumeration_index_path)
+from blade_view_resolver import is_unresolved
+from step2_blade_dependency_analyzer import DEFAULT_CACHE_PATH, BladeDependencyAnalyzer, extract_directives
+from step3_generate_graph import dependency_graph_elements, write_dependency_graph
+
+# 最後のイベントからこの秒数だけ静かになったら、まとめて処理する
+DEBOUNCE_SECONDS = 0.3
+# イベントが途切れなくても、最初のイベントからこの秒数たったら処理する
+MAX_BATCH_SECONDS = 5.0
+# inotify が使えないときの走査間隔
+POLL_INTERVAL = 1.0
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 47600
+
+# inotify の定数（<sys/inotify.h>）
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_Q_OVERFLOW = 0x00004000
+IN_IGNORED = 0x00008000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = (IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+              | IN_DELETE_SELF | IN_MOVE_SELF)
+EVENT_HEADER = struct.Struct('iIII')
+
+
+def is_excluded_path(relative_path, excludes):
+    """相対パスのどこかの階層が除外パターンに一致するか"""
+    parts = relative_path.replace(os.sep, '/').split('/')
+    for i, name in enumerate(parts):
+        if is_excluded(name, '/'.join(parts[:i + 1]), excludes):
+            return True
+    return False
+
+
+class InotifySource:
+    """inotify でビューディレクトリ以下の変更を受け取る
+
+    wait() は変更のあった Bladeファイルの相対パスと、中身をまとめて調べ直すべきディレクトリの
+    相対パス（作成・移動・削除されたディレクトリ、キューがあふれたときはルートの ''）を返す
+    """
+
+    def __init__(self, directory, excludes=DEFAULT_EXCLUDES):
+        self.directory = directory
+        self.excludes = excludes
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 に失敗しました')
+        self.watches = {}
+        self.add_tree('')
+
+    def add_tree(self, relative_dir):
+        """relative_dir 以下のディレクトリをすべて監視対象にする（除外パターンとシンボリックリンクはたどらない）"""
+        stack = [relative_dir]
+        while stack:
+            current = stack.pop()
+            full_path = os.path.join(self.directory, current)
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(full_path), WATCH_MASK)
+            if wd < 0:
+                error = ctypes.get_errno()
+                if error == errno.ENOSPC:
+                    raise OSError(error, 'inotify の監視数の上限に達しました（fs.inotify.max_user_watches）')
+                continue
+            self.watches[wd] = current
+            try:
+                entries = list(os.scandir(full_path))
+            except OSError:
+                continue
+            for entry in entries:
+                child = os.path.join(current, entry.name) if current else entry.name
+                if entry.is_dir(follow_symlinks=False) and not is_excluded_path(child, self.excludes):
+                    stack.append(child)
+
+    def wait(self, timeout=None):
+        """変更を待って相対パスの集合を返す（timeout 秒以内に変更がなければ空集合）"""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return set()
+        changes = set()
+        while True:
+            try:
+                data = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                break
+            self.parse_events(data, changes)
+        return changes
+
+    def parse_events(self, data, changes):
+        offset = 0
+        while offset < len(data):
+            wd, mask, _cookie, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                changes.add('')
+                continue
+            parent = self.watches.get(wd)
+            if parent is None:
+                continue
+            if mask & IN_IGNORED:
+                del self.watches[wd]
+                continue
+            if mask & (IN_DELETE_SELF | IN_MOVE_SELF):
+                changes.add(parent)
+                continue
+            relative_path = os.path.join(parent, name) if parent else name
+            if is_excluded_path(relative_path, self.excludes):
+                continue
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    self.add_tree(relative_path)
+                changes.add(relative_path)
+            elif name.endswith('.blade.php'):
+                changes.add(relative_path)
+
+    def close(self):
+        os.close(self.fd)
+
+
+class PollingSource:
+    """inotify が使えない環境用: 定期的にディレクトリを走査し、mtime・サイズの差分を変更として返す"""
+
+    def __init__(self, directory, excludes=DEFAULT_EXCLUDES, interval=POLL_INTERVAL):
+        self.directory = directory
+        self.excludes = excludes
+        self.interval = interval
+        self.snapshot = self.scan()
+
+    def scan(self):
+        snapshot = {}
+        for relative_path in scan_blade_files(self.directory, self.excludes):
+            try:
+                st = os.stat(os.path.join(self.directory, relative_path))
+            except OSError:
+                continue
+            snapshot[relative_path] = (st.st_mtime_ns, st.st_size)
+        return snapshot
+
+    def wait(self, timeout=None):
+        """変更が見つかるまで走査を繰り返す（timeout 秒以内に見つからなければ空集合）"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            remaining = self.interval if deadline is None else min(self.interval, deadline - time.monotonic())
+            if remaining > 0:
+                time.sleep(remaining)
+            current = self.scan()
+            changes = {path for path in current.keys() | self.snapshot.keys()
+                       if current.get(path) != self.snapshot.get(path)}
+            self.snapshot = current
+            if changes or (deadline is not None and time.monotonic() >= deadline):
+                return changes
+
+    def close(self):
+        pass
+
+
+def create_source(directory, excludes=DEFAULT_EXCLUDES, polling=False):
+    """inotify が使えれば InotifySource、使えなければ PollingSource を返す"""
+    if not polling and sys.platform.startswith('linux'):
+        try:
+            return InotifySource(directory, excludes)
+        except (OSError, AttributeError) as e:
+            print(f"inotify を使えないため走査で監視します: {e}")
+    return PollingSource(directory, excludes)
+
+
+class EventServer:
+    """変更イベントを接続中のクライアント（ビューア）へ1行1JSONで配信するTCPサーバ"""
+
+    def __init__(self, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        self.server = socket.create_server((host, port))
+        self.clients = []
+        self.lock = threading.Lock()
+        threading.Thread(target=self.accept_loop, daemon=True).start()
+
+    def accept_loop(self):
+        while True:
+            try:
+                client, _ = self.server.accept()
+            except OSError:
+                return
+            with self.lock:
+                self.clients.append(client)
+
+    def broadcast(self, event):
+        """イベントを送る（切断されたクライアントは外す）"""
+        data = (json.dumps(event, ensure_ascii=False) + '\n').encode('utf-8')
+        with self.lock:
+            for client in list(self.clients):
+                try:
+                    client.sendall(data)
+                except OSError:
+                    client.close()
+                    self.clients.remove(client)
+
+    def close(self):
+        self.server.close()
+        with self.lock:
+            for client in self.clients:
+                client.close()
+            self.clients = []
+
+
+class LiveDependencyGraph:
+    """メモリ上に保持する依存関係グラフ
+
+    最初に全ファイルを解析し、その後は変更のあったファイルだけを解析し直す。
+    ファイルが増減したときは、解決結果が変わりうるファイル（削除されたファイルや、
+    見つからない・列挙対象外のビューを参照しているファイル）のビュー名だけを解決し直す。
+    既存ファイルの番号は監視中に変わらない（新しいファイルには新しい番号を振る）
+    """
+
+    def __init__(self, root_directory, excludes=DEFAULT_EXCLUDES, cache_path=DEFAULT_CACHE_PATH,
+                 index_path=None, jobs=1):
+        self.analyzer = BladeDependencyAnalyzer(None, root_directory, cache_path or DEFAULT_CACHE_PATH, jobs)
+        self.views_directory = os.path.join(self.analyzer.root_directory, 'resources', 'views')
+        self.excludes = excludes
+        self.index = FileNumberIndex(index_path, self.views_directory) if index_path else None
+
+    @property
+    def blade_files(self):
+        return self.analyzer.blade_files
+
+    @property
+    def dependencies(self):
+        return self.analyzer.dependencies
+
+    def load(self):
+        """全ファイルを列挙・解析する（キャッシュが有効なら変更のないファイルは読み込まない）"""
+        if self.index:
+            self.index.load()
+        found = dict(iter_blade_files(self.views_directory, self.excludes, self.index))
+        self.analyzer.blade_files = {num: found[num] for num in sorted(found, key=int)}
+        self.analyzer.inverse_blade_files = {path: num for num, path in self.blade_files.items()}
+        self.analyzer.analyze_dependencies()
+        self.save()
+
+    def directives(self, path):
+        entry = self.analyzer.cache.entries.get(path)
+        return entry['directives'] if entry else []
+
+    def expand(self, changes):
+        """ディレクトリの変更を、その下の（今ある・以前あった）Bladeファイルに展開する"""
+        paths = set()
+        for change in changes:
+            if change.endswith('.blade.php'):
+                paths.add(change)
+                continue
+            prefix = change + os.sep if change else ''
+            paths.update(path for path in self.analyzer.inverse_blade_files if path.startswith(prefix))
+            full_path = os.path.join(self.views_directory, change)
+            if os.path.isdir(full_path) and not is_excluded_path(change, self.excludes):
+                paths.update(prefix + path for path in scan_blade_files(full_path, self.excludes))
+        return paths
+
+    def apply(self, changes):
+        """変更のあった相対パスの集合を反映し、ビューアに送るイベントを返す（何も変わらなければ None）"""
+        inverse = self.analyzer.inverse_blade_files
+        added = {}
+        removed = []
+        dirty = set()
+        for path in sorted(self.expand(changes)):
+            full_path = self.analyzer.full_path(path)
+            exists = os.path.isfile(full_path) and not is_excluded_path(path, self.excludes)
+            if not exists:
+                num = inverse.pop(path, None)
+                if num is None:
+                    continue
+                del self.blade_files[num]
+                self.dependencies.pop(num, None)
+                self.analyzer.cache.forget(path)
+                if self.index:
+                    self.index.forget(path)
+                removed.append(num)
+                continue
+            if path not in inverse:
+                num = self.index.number_for(path) if self.index else str(max(map(int, self.blade_files), default=0) + 1)
+                self.blade_files[num] = path
+                inverse[path] = num
+                added[num] = path
+            try:
+                self.analyzer.cache.get_or_parse(path, full_path, extract_directives)
+            except (OSError, UnicodeDecodeError):
+                # 書き込み途中などで読めなければ、次のイベントで読み直す
+                pass
+            dirty.add(path)
+
+        if added or removed:
+            self.analyzer.clear_resolution()
+            removed_nums = set(removed)
+            for num, deps in self.dependencies.items():
+                if any(is_unresolved(dep['num']) or dep['num'] in removed_nums for dep in deps):
+                    dirty.add(self.blade_files[num])
+
+        changed = {}
+        for path in dirty:
+            num = inverse.get(path)
+            if num is None:
+                continue
+            dependencies = self.analyzer.resolve_directives(self.directives(path))
+            if num in added or dependencies != self.dependencies.get(num):
+                changed[num] = dependencies
+            self.dependencies[num] = dependencies
+        if not (added or removed or changed):
+            return None
+        self.analyzer.blade_files = {num: self.blade_files[num] for num in sorted(self.blade_files, key=int)}
+        self.save()
+        return {'type': 'update', 'nodes': added, 'removed': removed, 'dependencies': changed}
+
+    def save(self):
+        """blade_files.json / blade_dependencies.json とキャッシュ・インデックスを書き出す"""
+        with open('blade_files.json', 'w', encoding='utf-8') as f:
+            json.dump(self.blade_files, f, ensure_ascii=False, indent=2)
+        self.analyzer.dependencies = {num: self.dependencies[num] for num in self.blade_files
+                                      if num in self.dependencies}
+        self.analyzer.save_dependencies()
+        self.analyzer.cache.save()
+        if self.index:
+            self.index.save()
+
+    def write_dot(self, output_filename):
+        """step3_generate_graph.py と同じ形式のDOTファイルを書き出す（描画はしない）"""
+        write_dependency_graph(*dependency_graph_elements(self.dependencies, self.blade_files), output_filename)
+
+
+def collect_batch(source):
+    """最初の変更を待ち、DEBOUNCE_SECONDS の間に続いた変更をまとめて返す"""
+    changes = set()
+    while not changes:
+        changes = source.wait()
+    deadline = time.monotonic() + MAX_BATCH_SECONDS
+    while time.monotonic() < deadline:
+        more = source.wait(DEBOUNCE_SECONDS)
+        if not more:
+            break
+        changes |= more
+    return changes
+
+
+def watch(graph, source, server=None, dot_path=None):
+    """変更を待っては反映するループ（Ctrl+C で終了）"""
+    while True:
+        changes = collect_batch(source)
+        start = time.perf_counter()
+        event = graph.apply(changes)
+        if event is None:
+            continue
+        if dot_path:
+            graph.write_dot(dot_path)
+        if server:
+            server.broadcast(event)
+        print(f"{len(changes)} 件の変更を反映 ({(time.perf_counter() - start) * 1000:.0f} ms): "
+              f"追加 {len(event['nodes'])}, 削除 {len(event['removed'])}, 依存関係の変化 {len(event['dependencies'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description='ビューディレクトリを監視し、blade_files.json / blade_dependencies.json を更新し続ける',
+        usage='python blade_watch.py ~/Sites/event-form.jp/program/laravel [options]')
+    parser.add_argument('root_directory')
+    parser.add_argument('--cache', default=DEFAULT_CACHE_PATH,
+                        help=f'差分解析用キャッシュのパス（デフォルト: {DEFAULT_CACHE_PATH}）')
+    parser.add_argument('--jobs', '-j', type=int, default=1, help='最初の解析に使うプロセス数（デフォルト: 1）')
+    parser.add_argument('--dot', metavar='PATH', help='更新のたびにDOTファイルも書き出す')
+    parser.add_argument('--host', default=DEFAULT_HOST, help=f'イベント配信のアドレス（デフォルト: {DEFAULT_HOST}）')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f'イベント配信のポート（デフォルト: {DEFAULT_PORT}）')
+    parser.add_argument('--no-server', action='store_true', help='ビューアへのイベント配信を行わない')
+    parser.add_argument('--poll', action='store_true', help='inotify を使わず定期的な走査で監視する')
+    add_enumeration_arguments(parser)
+    args = parser.parse_args()
+
+    graph = LiveDependencyGraph(args.root_directory, enumeration_excludes(args), args.cache,
+                                enumeration_index_path(args), args.jobs)
+    graph.load()
+    if args.dot:
+        graph.write_dot(args.dot)
+    source = create_source(graph.views_directory, graph.excludes, args.poll)
+    server = None if args.no_server else EventServer(args.host, args.port)
+    print(f"{graph.views_directory} を監視中: ノード {len(graph.blade_files)} 件"
+          + ('' if server is None else f"（イベント配信 {args.host}:{args.port}）"))
+    try:
+        watch(graph, source, server, args.dot)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        source.close()
+        if server:
+            server.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,37 +1,58 @@
-import os
 import json
-import sys
+import argparse
+
+from blade_profiler import profiler, add_profile_arguments, profile_run
+from blade_pipeline import (DEFAULT_EXCLUDES, FileNumberIndex, iter_blade_files, add_enumeration_arguments,
+                            enumeration_excludes, enumeration_index_path)
 
 class BladeEnumerator:
     """ディレクトリ内のBladeファイルを列挙し、番号付けしてJSONに保存するクラス"""
 
-    def __init__(self, directory):
+    def __init__(self, directory, excludes=DEFAULT_EXCLUDES, index_path=None, output_path='blade_files.json'):
         self.directory = directory
+        self.output_path = output_path
+        self.excludes = excludes
+        self.index = FileNumberIndex(index_path, directory) if index_path else None
         self.blade_files = {}
 
     def enumerate_blade_files(self):
-        """Bladeファイルを列挙して番号を割り当て、JSONに出力する"""
-        file_number = 1
-        for root, _, files in os.walk(self.directory):
-            for file in files:
-                if file.endswith('.blade.php'):
-                    relative_path = os.path.relpath(os.path.join(root, file), self.directory)
-                    self.blade_files[file_number] = relative_path
-                    file_number += 1
-        self.save_to_json()
+        """Bladeファイルを列挙して番号を割り当て、JSONに出力する
+
+        番号インデックスを使う場合、既存のファイルは前回と同じ番号を保ち、新しいファイルには新しい番号が振られる
+        """
+        if self.index:
+            self.index.load()
+        with profiler.span('enumerate.walk'):
+            found = dict(iter_blade_files(self.directory, self.excludes, self.index))
+        profiler.count('files', len(found))
+        # 番号順に並べて、差分が見やすいJSONにする
+        for file_number in sorted(found, key=int):
+            self.blade_files[file_number] = found[file_number]
+        if self.index:
+            self.index.save()
+        with profiler.span('enumerate.save'):
+            self.save_to_json()
 
     def save_to_json(self):
         """BladeファイルのマッピングをJSONファイルに保存する"""
-        with open('blade_files.json', 'w', encoding='utf-8') as f:
+        with open(self.output_path, 'w', encoding='utf-8') as f:
             json.dump(self.blade_files, f, ensure_ascii=False, indent=2)
 
 def main():
-    if len(sys.argv) != 2:
-        print("使用方法: python step1_blade_enumerator.py ~/Sites/event-form.jp/program/laravel/resources/views")
-        sys.exit(1)
-    directory = sys.argv[1]
-    enumerator = BladeEnumerator(directory)
-    enumerator.enumerate_blade_files()
+    parser = argparse.ArgumentParser(
+        description='ディレクトリ内のBladeファイルを列挙し、番号付けしてJSONに保存する',
+        usage='python step1_blade_enumerator.py ~/Sites/event-form.jp/program/laravel/resources/views [options]')
+    parser.add_argument('directory')
+    parser.add_argument('--output', '-o', default='blade_files.json',
+                        help='出力するJSONのパス（デフォルト: blade_files.json）')
+    add_enumeration_arguments(parser)
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    with profile_run(args):
+        enumerator = BladeEnumerator(args.directory, enumeration_excludes(args), enumeration_index_path(args),
+                                    args.output)
+        enumerator.enumerate_blade_files()
 
 if __name__ == "__main__":
     main()
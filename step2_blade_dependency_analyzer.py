@@ -1,65 +1,298 @@
 import json
-import re
 import os
-import sys
+import time
+import argparse
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+
+from blade_manifest_cache import ManifestCache, read_with_digest
+from blade_directive_scanner import scan_directives
+from blade_profiler import profiler, add_profile_arguments, profile_run
+from blade_view_resolver import MISSING_PREFIX, EXTERNAL_PREFIX, DYNAMIC_PREFIX, ROUTE_PREFIX, ViewResolver
+from blade_dynamic_includes import DynamicIncludeExpander
+from blade_php_scanner import extract_php_references
+
+DEFAULT_CACHE_PATH = '.blade_dependency_cache.json'
+# 1チャンクあたりの最大ファイル数（プロセス間通信の回数と負荷の偏りのバランス）
+MAX_CHUNK_SIZE = 256
+# --php で走査するディレクトリ（プロジェクトのルートからの相対パス）
+PHP_DIRECTORIES = ('app/Http/Controllers', 'routes')
+# PHPファイルのキャッシュのキー（Bladeファイルの相対パスと重ならないようにする）
+PHP_CACHE_PREFIX = 'php:'
+
+
+def extract_directives(content):
+    """ファイル内容からディレクティブ [種類, ドット区切りのビュー名, 行番号] を出現順に抽出する
+
+    式で指定されたビュー名は 'dynamic:<式>' として抽出する
+    """
+    return [list(edge) for edge in scan_directives(content, dynamic=True)]
+
+
+def scan_chunk(chunk, timed=False, extract=extract_directives):
+    """ワーカープロセスで実行: チャンク内のファイルを読み込みディレクティブを抽出する
+
+    chunk: (キー, 実ファイルのパス) のリスト
+    extract: ファイル内容から抽出結果を返す関数（PHPファイルなら extract_php_references）
+    戻り値: (キー, mtime_ns, サイズ, sha1, ディレクティブ) のリスト
+    （timed が True なら、各要素の末尾にそのファイルの処理時間（秒）を付ける）
+    """
+    results = []
+    for key, full_path in chunk:
+        start = time.perf_counter()
+        mtime, size, digest, content = read_with_digest(full_path)
+        result = (key, mtime, size, digest, extract(content))
+        if timed:
+            result += (time.perf_counter() - start,)
+        results.append(result)
+    return results
+
+
+def split_chunks(items, jobs):
+    """ワーカー数に応じてリストをチャンクに分割する"""
+    size = max(1, min(MAX_CHUNK_SIZE, len(items) // (jobs * 4)))
+    return [items[i:i + size] for i in range(0, len(items), size)]
 
 
 class BladeDependencyAnalyzer:
     """Bladeファイルの依存関係を解析するクラス"""
 
-    def __init__(self, json_path, root_directory):
+    def __init__(self, json_path, root_directory, cache_path=None, jobs=1, views_config=None, expand_dynamic=False,
+                 scan_php=False, output_path='blade_dependencies.json'):
         self.json_path = json_path
+        self.output_path = output_path
         self.root_directory = os.path.expanduser(root_directory)  # ホームディレクトリを展開
+        self.views_directory = os.path.join(self.root_directory, 'resources', 'views')
         self.dependencies = {}
+        self.cache = ManifestCache(cache_path) if cache_path else None
+        self.jobs = jobs
+        self.resolver = ViewResolver.from_project(self.root_directory, views_config)
+        # (ビュー名, 種類) -> ノード番号
+        self.view_numbers = {}
+        self.expand_dynamic = expand_dynamic
+        self.scan_php = scan_php
 
     def load_blade_files(self):
         """JSONからBladeファイルのリストを読み込む"""
-        with open(self.json_path, 'r', encoding='utf-8') as f:
+        with profiler.span('analyze.load'), open(self.json_path, 'r', encoding='utf-8') as f:
             self.blade_files = json.load(f)
         self.inverse_blade_files = {v: k for k, v in self.blade_files.items()}
 
     def analyze_dependencies(self):
-        """Bladeファイル間の依存関係を解析する"""
-        for num, path in self.blade_files.items():
-            full_path = os.path.join(self.root_directory, 'resources', 'views', path)
-            with open(full_path, 'r', encoding='utf-8') as file:
-                content = file.read()
-                # print(content)
-            self.dependencies[num] = self.find_dependencies(content)
+        """Bladeファイル間の依存関係を解析する
+
+        キャッシュが有効な場合は、変更のないファイルの抽出結果を再利用する
+        """
+        self.load_cache()
+        directives_by_path = self.extract_files(self.blade_items(), extract_directives)
+        self.resolve_files(directives_by_path)
+        if self.scan_php:
+            self.analyze_php()
+        self.finish_analysis()
+
+    def load_cache(self):
+        if self.cache:
+            with profiler.span('analyze.cache_load'):
+                self.cache.load()
+
+    def blade_items(self):
+        """Bladeファイルの (キャッシュのキー, 実ファイルのパス) のリスト"""
+        return [(path, self.full_path(path)) for path in self.blade_files.values()]
+
+    def resolve_files(self, directives_by_path):
+        """Bladeファイルごとの抽出結果 {相対パス: ディレクティブ} を依存関係に解決する"""
+        with profiler.span('analyze.resolve'):
+            for num, path in self.blade_files.items():
+                self.dependencies[num] = self.resolve_directives(directives_by_path[path])
+        profiler.count('files', len(self.blade_files))
+
+    def finish_analysis(self):
+        """動的なビュー名の展開とキャッシュの保存（抽出・解決のあとに1回呼ぶ）"""
+        if self.expand_dynamic:
+            with profiler.span('analyze.expand_dynamic'):
+                self.dependencies.update(DynamicIncludeExpander(self.blade_files).expand_dependencies(self.dependencies))
+        if self.cache:
+            profiler.count('bytes_read', self.cache.bytes_read)
+            profiler.count('files_reparsed', self.cache.reparsed)
+            with profiler.span('analyze.cache_save'):
+                self.cache.save()
+            self.cache.report()
+
+    def extract_files(self, items, extract):
+        """(キー, 実ファイルのパス) の列のファイルから抽出結果を得て {キー: 抽出結果} を返す
+
+        キャッシュが有効なら変更のないファイルは読まず、jobs が2以上ならプロセスプールに分散する
+        """
+        if self.jobs > 1:
+            return self.extract_files_parallel(items, extract)
+        extracted = {}
+        with profiler.span('analyze.files', jobs=1):
+            for key, full_path in items:
+                start = time.perf_counter() if profiler.enabled else None
+                if self.cache:
+                    extracted[key] = self.cache.get_or_parse(key, full_path, extract)
+                else:
+                    with open(full_path, 'r', encoding='utf-8') as file:
+                        content = file.read()
+                    extracted[key] = extract(content)
+                    if start is not None:
+                        profiler.count('bytes_read', len(content.encode('utf-8')))
+                if start is not None:
+                    profiler.file(key, time.perf_counter() - start)
+        return extracted
+
+    def extract_files_parallel(self, items, extract):
+        """ファイルの読み込みと抽出をプロセスプールに分散する（結果はチャンク単位で受け取る）"""
+        extracted, pending = self.lookup_files(items)
+        if pending:
+            with profiler.span('analyze.files', jobs=self.jobs), ProcessPoolExecutor(max_workers=self.jobs) as executor:
+                scan = partial(scan_chunk, timed=profiler.enabled, extract=extract)
+                for results in executor.map(scan, split_chunks(pending, self.jobs)):
+                    self.store_results(results, extracted)
+        return extracted
+
+    def lookup_files(self, items):
+        """キャッシュに抽出結果があるファイルと、読み込みが必要なファイルに分ける
+
+        戻り値: ({キー: 抽出結果}, 読み込みが必要な (キー, 実ファイルのパス) のリスト)
+        """
+        extracted = {}
+        pending = []
+        with profiler.span('analyze.lookup'):
+            for key, full_path in items:
+                directives = self.cache.lookup(key, full_path) if self.cache else None
+                if directives is None:
+                    pending.append((key, full_path))
+                else:
+                    extracted[key] = directives
+        return extracted, pending
+
+    def store_results(self, results, extracted):
+        """scan_chunk の結果をキャッシュに入れ、extracted に {キー: 抽出結果} として加える"""
+        for key, mtime, size, digest, directives, *elapsed in results:
+            if self.cache:
+                self.cache.store(key, mtime, size, digest, directives)
+            elif elapsed:
+                profiler.count('bytes_read', size)
+            if elapsed:
+                profiler.file(key, elapsed[0], size)
+            extracted[key] = directives
+
+    def php_files(self):
+        """コントローラとルート定義の (キャッシュのキー, 実ファイルのパス) のリスト（パス順）"""
+        items = []
+        for directory in PHP_DIRECTORIES:
+            top = os.path.join(self.root_directory, directory)
+            for current, dirs, files in os.walk(top):
+                dirs.sort()
+                for name in sorted(files):
+                    if name.endswith('.php'):
+                        full_path = os.path.join(current, name)
+                        relative = os.path.relpath(full_path, self.root_directory).replace(os.sep, '/')
+                        items.append((PHP_CACHE_PREFIX + relative, full_path))
+        return items
+
+    def analyze_php(self):
+        """コントローラとルート定義を解析し、ビューを描画する側のノードからの依存関係を加える
+
+        Bladeファイルと同じキャッシュ・プロセスプールで抽出する
+        """
+        items = self.php_files()
+        with profiler.span('analyze.php', files=len(items)):
+            references = self.extract_files(items, extract_php_references)
+        self.add_php_references(items, references)
+
+    def add_php_references(self, items, references):
+        """php_files() の各ファイルの抽出結果 {キー: 参照} を依存関係に加える
+
+        どのルートにも含まれない view() は、ルート定義ファイルのノード（'route:routes/web.php'）からの依存にする
+        """
+        for key, _ in items:
+            file_owner = ROUTE_PREFIX + key[len(PHP_CACHE_PREFIX):]
+            for owner, dep_type, target, line in references[key]:
+                owner = owner or file_owner
+                num = self.resolve_view(target) if dep_type == 'view' else target
+                self.dependencies.setdefault(owner, []).append({'num': num, 'type': dep_type, 'line': line})
+        profiler.count('php_files', len(items))
+
+    def full_path(self, path):
+        """ビューディレクトリからの相対パスを実ファイルのパスに変換する"""
+        return os.path.join(self.views_directory, path)
 
     def find_dependencies(self, content):
         """ファイル内容から依存関係を探す"""
+        return self.resolve_directives(extract_directives(content))
+
+    def resolve_directives(self, directives):
+        """抽出したディレクティブをBladeファイルの番号に解決する
+
+        動的なビュー名は 'dynamic:<式>' をそのまま番号にする。どの依存関係にも書かれている行番号を残す
+        """
         dependencies = []
-        patterns = {
-            'include': r"@include\('([^']+)'\)",
-            'extends': r"@extends\('([^']+)'\)"
-        }
-        for dep_type, pattern in patterns.items():
-            for match in re.finditer(pattern, content):
-                path_dotted = match.group(1)
-                path_slashed = path_dotted.replace('.', '/') + '.blade.php'
-                if path_slashed in self.inverse_blade_files:
-                    dependencies.append({'num': self.inverse_blade_files[path_slashed], 'type': dep_type})
+        for dep_type, name, line in directives:
+            num = name if name.startswith(DYNAMIC_PREFIX) else self.resolve_view(name, dep_type)
+            dependencies.append({'num': num, 'type': dep_type, 'line': line})
         return dependencies
 
+    def resolve_view(self, name, dep_type=None):
+        """ビュー名をノード番号に解決する
+
+        列挙対象外のファイルは 'external:<プロジェクトからの相対パス>'、
+        見つからないビューは 'missing:<ビュー名>' を番号として返す
+        """
+        key = (name, dep_type)
+        num = self.view_numbers.get(key)
+        if num is None:
+            full_path = self.resolver.resolve(name, dep_type)
+            if full_path is None:
+                num = MISSING_PREFIX + name
+            else:
+                num = self.inverse_blade_files.get(os.path.relpath(full_path, self.views_directory))
+                if num is None:
+                    relative = os.path.relpath(full_path, self.root_directory)
+                    num = EXTERNAL_PREFIX + relative.replace(os.sep, '/')
+            self.view_numbers[key] = num
+        return num
+
+    def clear_resolution(self):
+        """ファイルが増減したときに、ビュー名の解決結果を捨てる"""
+        self.resolver.clear()
+        self.view_numbers.clear()
+
     def save_dependencies(self):
         """解析結果をJSONファイルに保存する"""
-        with open('blade_dependencies.json', 'w', encoding='utf-8') as f:
+        with profiler.span('analyze.save'), open(self.output_path, 'w', encoding='utf-8') as f:
             json.dump(self.dependencies, f, ensure_ascii=False, indent=2)
 
 
 def main():
-    if len(sys.argv) != 3:
-        print("使用方法: python step2_blade_dependency_analyzer.py <json_path> <root_directory>")
-        sys.exit(1)
-    json_path = sys.argv[1]
-    root_directory = sys.argv[2]
-    # print(json_path, root_directory)
-
-    analyzer = BladeDependencyAnalyzer(json_path, root_directory)
-    analyzer.load_blade_files()
-    analyzer.analyze_dependencies()
-    analyzer.save_dependencies()
+    parser = argparse.ArgumentParser(
+        description='Bladeファイルの依存関係を解析する',
+        usage='python step2_blade_dependency_analyzer.py <json_path> <root_directory> [options]')
+    parser.add_argument('json_path')
+    parser.add_argument('root_directory')
+    parser.add_argument('--output', '-o', default='blade_dependencies.json',
+                        help='出力するJSONのパス（デフォルト: blade_dependencies.json）')
+    parser.add_argument('--cache', default=DEFAULT_CACHE_PATH,
+                        help=f'差分解析用キャッシュのパス（デフォルト: {DEFAULT_CACHE_PATH}）')
+    parser.add_argument('--no-cache', action='store_true', help='キャッシュを使わず全ファイルを解析する')
+    parser.add_argument('--jobs', '-j', type=int, default=1, help='並列に解析するプロセス数（デフォルト: 1）')
+    parser.add_argument('--views-config', metavar='PATH',
+                        help='ビューパスと名前空間の設定（デフォルト: <root_directory>/blade_views.json があれば使う）')
+    parser.add_argument('--expand-dynamic', action='store_true',
+                        help="@include('forms.' . $type) のような動的なビュー名を、一致しうるファイルに展開する")
+    parser.add_argument('--php', action='store_true',
+                        help='app/Http/Controllers と routes の view() などを解析し、コントローラ・ルートのノードを加える')
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    cache_path = None if args.no_cache else args.cache
+    with profile_run(args):
+        analyzer = BladeDependencyAnalyzer(args.json_path, args.root_directory, cache_path, args.jobs,
+                                           args.views_config, args.expand_dynamic, args.php, args.output)
+        analyzer.load_blade_files()
+        analyzer.analyze_dependencies()
+        analyzer.save_dependencies()
 
 
 if __name__ == "__main__":
@@ -1,41 +1,197 @@
 import json
-from graphviz import Digraph
+import argparse
+from itertools import chain
+from graphviz import view
+
+from blade_pipeline import DotWriter, WRITERS
+from blade_render import (DEFAULT_CLUSTER_DEPTH, ClusteredDotWriter, render_file, render_clusters,
+                          start_render)
+from blade_compact_graph import load_compact_graph
+from blade_query import TYPE_CHOICES, DependencyIndex
+from blade_profiler import profiler, add_profile_arguments, profile_run
+from blade_view_resolver import unresolved_label
 
 def load_json(filename):
     """JSONファイルからデータを読み込む"""
-    with open(filename, 'r', encoding='utf-8') as file:
+    with profiler.span('graph.load', file=filename), open(filename, 'r', encoding='utf-8') as file:
         return json.load(file)
 
-def create_dependency_graph(dependencies, file_map, output_filename="dependency_graph.dot"):
+def create_dependency_graph(dependencies, file_map, output_filename="dependency_graph.dot", output_format='dot',
+                            **render_options):
     """依存関係とファイルマッピングからGraphvizのDOTファイルを生成する
     dependencies: 依存関係データを含む辞書
     file_map: 各ノード番号に対応するファイルパスを含む辞書
     output_filename: 出力されるDOTファイルのファイル名
+    output_format: 出力形式（blade_pipeline.WRITERS のキー。dot 以外は描画しない）
+    render_options: 描画の指定（render_dependency_graph を参照）
+    """
+    nodes, edges = dependency_graph_elements(dependencies, file_map)
+    render_dependency_graph(nodes, edges, output_filename, output_format, **render_options)
+
+def dependency_graph_elements(dependencies, file_map):
+    """依存関係とファイルマッピングから (番号, パス) と (依存元, 依存先, 種別, 行番号) の列を作る"""
+    edges = ((num, dep['num'], dep['type'], dep.get('line')) for num, deps in dependencies.items() for dep in deps)
+    # 見つからないビュー・列挙対象外のファイルも、依存先としてノードにする
+    unresolved = {dep['num'] for deps in dependencies.values() for dep in deps if dep['num'] not in file_map}
+    # コントローラ・ルートなど、依存元にしか出てこないノードも加える
+    unresolved.update(num for num in dependencies if num not in file_map)
+    nodes = chain(file_map.items(), ((num, unresolved_label(num)) for num in sorted(unresolved)))
+    return nodes, edges
+
+def create_dependency_graph_from_compact(graph, output_filename="dependency_graph.dot", output_format='dot',
+                                         **render_options):
+    """バイナリ形式のグラフ（blade_compact_graph.CompactGraph）からDOTファイルを生成する"""
+    render_dependency_graph(graph.iter_nodes(), graph.iter_edges(lines=True), output_filename, output_format,
+                            **render_options)
+
+def create_subgraph(index, root=None, depth=None, direction='both', output_filename="dependency_graph.dot",
+                    output_format='dot', **render_options):
+    """root の近傍だけを重複なしの部分グラフとして取り出してDOTファイルを生成する
+
+    index: blade_query.DependencyIndex（種類の絞り込みはインデックス作成時に行う）
+    root が None の場合は見つからないビューなども含めた全ノードを対象にする（エッジの重複は除かれる）
+    """
+    if root is None:
+        selected = index.nodes()
+    else:
+        selected = index.neighbourhood(index.resolve(root), depth, direction)
+    nodes = [(num, path) for num, path in index.file_map.items() if num in selected]
+    nodes += [(num, unresolved_label(num)) for num in sorted(selected - index.file_map.keys())]
+    render_dependency_graph(nodes, index.subgraph_edges([num for num, _ in nodes]), output_filename, output_format,
+                            **render_options)
+
+def render_dependency_graph(nodes, edges, output_filename, output_format='dot', image_format='png',
+                            cluster_depth=None, split_directory=None, timeout=None, jobs=None, open_viewer=True,
+                            background=False):
+    """(番号, パス) と (依存元, 依存先, 種別) の列からDOTファイルを書き出し、PNGに変換して表示する
+
+    DOT 以外の形式（JSON Lines・GraphML・SQLite）は書き出すだけで描画しない
+    image_format: 画像の形式（png / svg。None なら描画しない）
+    cluster_depth: ノードをディレクトリの先頭 cluster_depth 段ごとのクラスタにまとめる
+    split_directory: 1枚の画像にせず、クラスタごとの画像と index.html をこのディレクトリに並列に描画する
+                     （描画に失敗したクラスタがあれば、index.html を開いたあとでそれらを並べた RuntimeError）
+    timeout: dot 1回あたりの制限時間（秒）。過ぎたら中止して RuntimeError
+    jobs: split_directory で同時に動かす dot の数（デフォルト: CPU数）
+    open_viewer: 描画した画像をビューアで開く
+    background: 1枚の画像の描画を待たずに、描画の Future（blade_render.start_render）を返す
+                （ビューアは描画が終わったときに開く。split_directory では使わない）
     """
-    graph = Digraph(comment='Blade Template Dependencies')
-    graph.attr(rankdir='LR')
-    graph.attr('node', shape='box', style='filled', color='lightblue')
-
-    # ノードの追加
-    for num, path in file_map.items():
-        graph.node(num, label=f"{path}")
-
-    # 依存関係の追加
-    for num, deps in dependencies.items():
-        for dep in deps:
-            if dep['type'] == 'extends':
-                # 矢印の向きを子から親へ（継承）
-                graph.edge(dep['num'], num, label='extends')
-            elif dep['type'] == 'include':
-                # 矢印の向きを親から子へ（含む）
-                graph.edge(num, dep['num'], label='include')
-
-    graph.render(output_filename, format='png', view=True)
+    if split_directory:
+        nodes = list(nodes)
+        edges = list(edges)
+    if output_format == 'dot' and cluster_depth:
+        write_dependency_graph(nodes, edges, output_filename,
+                               lambda filename: ClusteredDotWriter(filename, cluster_depth))
+    else:
+        write_dependency_graph(nodes, edges, output_filename, WRITERS[output_format])
+    if output_format != 'dot' or not image_format:
+        return None
+    if background and not split_directory:
+        future = start_render(output_filename, image_format, timeout)
+        if open_viewer:
+            future.add_done_callback(lambda done: done.exception() is None and view(done.result()))
+        return future
+    failures = {}
+    with profiler.span('graph.render'):
+        if split_directory:
+            image, failures = render_clusters(nodes, edges, split_directory, image_format, timeout, jobs,
+                                              cluster_depth or DEFAULT_CLUSTER_DEPTH)
+        else:
+            image = render_file(output_filename, image_format, timeout)
+    if open_viewer:
+        with profiler.span('graph.view'):
+            view(image)
+    if failures:
+        raise RuntimeError(f"{len(failures)} 件のクラスタの描画に失敗しました:\n"
+                           + '\n'.join(f"  {cluster}: {reason}" for cluster, reason in sorted(failures.items())))
+    return None
+
+def write_dependency_graph(nodes, edges, output_filename, writer_class=DotWriter):
+    """(番号, パス) と (依存元, 依存先, 種別[, 行番号]) の列からDOTファイルを書き出す（描画はしない）
+
+    writer_class に blade_pipeline の他のライターを渡すとその形式で書き出す
+    """
+    with profiler.span('graph.write_dot'):
+        writer = writer_class(output_filename)
+
+        # ノードの追加
+        node_count = 0
+        for num, path in nodes:
+            writer.node(num, path)
+            node_count += 1
+
+        # 依存関係の追加（extends は子から親へ、include などは親から子へ）
+        edge_count = 0
+        for edge in edges:
+            writer.edge(*edge)
+            edge_count += 1
+        writer.close()
+    profiler.count('nodes', node_count)
+    profiler.count('edges', edge_count)
 
 def main():
+    parser = argparse.ArgumentParser(description='依存関係JSONからDOTファイルとPNGを生成する')
+    parser.add_argument('--compact', metavar='PATH',
+                        help='JSONの代わりにバイナリ形式のグラフ（blade_compact_graph.py で作成）を読み込む')
+    parser.add_argument('--root', help='このファイルの近傍だけを描画する（番号・相対パス・ビュー名）')
+    parser.add_argument('--depth', type=int, help='--root から何段先までたどるか（デフォルト: 制限なし）')
+    parser.add_argument('--direction', choices=('up', 'down', 'both'), default='both',
+                        help='down: root が依存する側, up: root に依存する側, both: 両方（デフォルト）')
+    parser.add_argument('--type', action='append', dest='types', choices=TYPE_CHOICES,
+                        help='描画する依存関係の種類（include は includeIf などの系統全体。複数指定可）')
+    parser.add_argument('--format', choices=sorted(WRITERS), default='dot',
+                        help='出力形式（デフォルト: dot。dot 以外は dependency_graph.<形式> に書き出すだけで描画しない）')
+    parser.add_argument('--image', choices=('png', 'svg', 'none'), default='png',
+                        help='DOTから描画する画像の形式（デフォルト: png。none なら描画しない）')
+    parser.add_argument('--cluster', type=int, nargs='?', const=DEFAULT_CLUSTER_DEPTH, metavar='DEPTH',
+                        help=f'ノードをディレクトリの先頭 DEPTH 段（省略時 {DEFAULT_CLUSTER_DEPTH}）ごとのクラスタにまとめる')
+    parser.add_argument('--split', metavar='DIR',
+                        help='クラスタごとに別の画像として並列に描画し、DIR/index.html にまとめる')
+    parser.add_argument('--timeout', type=float, help='dot 1回あたりの制限時間（秒）')
+    parser.add_argument('--jobs', '-j', type=int, help='--split で同時に動かす dot の数（デフォルト: CPU数）')
+    parser.add_argument('--no-view', action='store_true', help='描画した画像をビューアで開かない（CI などで使う）')
+    add_profile_arguments(parser)
+    args = parser.parse_args()
+
+    with profile_run(args):
+        generate(args, parser)
+
+def generate(args, parser):
+    output = f"dependency_graph.{args.format}"
+    options = {
+        'image_format': None if args.image == 'none' else args.image,
+        'cluster_depth': args.cluster,
+        'split_directory': args.split,
+        'timeout': args.timeout,
+        'jobs': args.jobs,
+        'open_viewer': not args.no_view,
+    }
+    try:
+        generate_graph(args, parser, output, options)
+    except RuntimeError as e:
+        parser.exit(1, f"{e}\n")
+
+def generate_graph(args, parser, output, options):
+    if args.root or args.types:
+        if args.compact:
+            graph = load_compact_graph(args.compact)
+            index = DependencyIndex.from_edges(graph.iter_nodes(unresolved=False), graph.iter_edges(), args.types)
+            graph.close()
+        else:
+            index = DependencyIndex.from_json('blade_dependencies.json', 'blade_files.json', args.types)
+        try:
+            create_subgraph(index, args.root, args.depth, args.direction, output, args.format, **options)
+        except KeyError as e:
+            parser.exit(1, f"{e.args[0]}\n")
+        return
+    if args.compact:
+        graph = load_compact_graph(args.compact)
+        create_dependency_graph_from_compact(graph, output, args.format, **options)
+        graph.close()
+        return
     dependencies = load_json('blade_dependencies.json')
     file_map = load_json('blade_files.json')
-    create_dependency_graph(dependencies, file_map, 'dependency_graph.dot')
+    create_dependency_graph(dependencies, file_map, output, args.format, **options)
 
 if __name__ == "__main__":
     main()
@@ -1,89 +1,412 @@
 import sys
+import json
 import math
+import argparse
 import pygraphviz as pgv
-from PyQt5.QtWidgets import QApplication, QGraphicsScene, QGraphicsView, QPushButton, QGraphicsProxyWidget
-from PyQt5.QtCore import Qt, QPointF, QRectF, QLineF
-from PyQt5.QtGui import QPainter, QPen, QBrush, QColor, QPolygonF, QTransform
+from PyQt5.QtWidgets import QApplication, QGraphicsScene, QGraphicsView, QGraphicsItem, QGraphicsPathItem
+from PyQt5.QtCore import Qt, QPointF, QRectF
+from PyQt5.QtGui import QPainter, QPen, QBrush, QColor, QPolygonF, QPainterPath, QFont, QFontMetricsF
+from PyQt5.QtNetwork import QTcpSocket
 
+from blade_layout_cache import DEFAULT_CACHE_DIR, LayoutCache
+from blade_query import DependencyIndex
+from blade_view_resolver import is_unresolved, unresolved_label
+from blade_watch import DEFAULT_HOST, DEFAULT_PORT
 
-def create_graph(file_path):
+# ノードの状態ごとの塗りつぶし色と文字色
+NODE_STYLES = {
+    'normal': (QColor('lightblue'), QColor('black')),
+    'selected': (QColor('red'), QColor('white')),
+    'connected': (QColor('green'), QColor('white')),
+}
+BORDER_PEN = QPen(QColor('black'), 1)
+EDGE_PEN = QPen(QColor('black'), 2)
+HIGHLIGHT_PEN = QPen(QColor('red'), 3)
+# この倍率より縮小されたらラベルを描かない / さらに縮小されたら枠線も描かない
+LABEL_MIN_LOD = 0.4
+BORDER_MIN_LOD = 0.15
+# エッジは始点・終点の位置でこの大きさの格子に振り分け、格子の組ごとに1つのパスにまとめる
+# （画面外のまとまりは描画されないので、拡大表示でも見えているエッジの近くだけを描く）
+EDGE_CELL_SIZE = 400
+ZOOM_STEP = 1.25
+ARROW_SIZE = 10
+ARROW_ANGLE = math.pi / 6
+# 監視中に追加されたノードを置く位置（隣接ノードからのずらし幅）
+NEW_NODE_OFFSET_X = 260
+NEW_NODE_OFFSET_Y = 40
+
+
+def create_graph(file_path, cache_dir=DEFAULT_CACHE_DIR, incremental=True):
+    """DOTファイルを読み込んでレイアウトする（cache_dir が None ならキャッシュを使わない）
+
+    incremental が False なら、前回の座標を再利用せずに dot で全体を配置する
+    """
     G = pgv.AGraph(file_path)
-    G.layout(prog='dot')
+    if cache_dir is None:
+        G.layout(prog='dot')
+    else:
+        LayoutCache(cache_dir).layout(G, file_path, prog='dot', incremental=incremental)
     return G
 
 
+def graph_elements(graph):
+    """レイアウト済みの pygraphviz.AGraph から描画用のノードとエッジを取り出す
+
+    戻り値: ({ノードID: (ラベル, x, y)}, [(始点ID, 終点ID, 種別), ...])
+    """
+    nodes = {}
+    for node in graph.nodes():
+        attrs = graph.get_node(node).attr
+        label = (attrs.get('label') or '\\N').strip('"')
+        if label == '\\N':  # graphviz の既定ラベルはノード名
+            label = str(node)
+        x, y = map(float, (attrs.get('pos') or '0,0').split(','))
+        nodes[str(node)] = (label, x, y)
+    edges = [(str(edge[0]), str(edge[1]), (edge.attr.get('label') or '').strip('"')) for edge in graph.edges()]
+    return nodes, edges
+
+
+def dot_edge(num, dep_num, dep_type):
+    """依存関係をDOT上の向きのエッジにする（DotWriter と同じく extends は子から親へ）"""
+    if dep_type == 'extends':
+        return dep_num, num, dep_type
+    return num, dep_num, dep_type
+
+
+def edge_owner(edge):
+    """エッジの元になった依存関係を持つノード（そのファイルのディレクティブで張られたエッジ）"""
+    start, end, edge_type = edge
+    return end if edge_type == 'extends' else start
+
+
+def add_edge_to_path(path, start_point, end_point):
+    """エッジの線と矢じりをパスに追加する"""
+    path.moveTo(start_point)
+    path.lineTo(end_point)
+    angle = math.atan2(end_point.y() - start_point.y(), end_point.x() - start_point.x())
+    p1 = end_point - QPointF(math.cos(angle - ARROW_ANGLE) * ARROW_SIZE, math.sin(angle - ARROW_ANGLE) * ARROW_SIZE)
+    p2 = end_point - QPointF(math.cos(angle + ARROW_ANGLE) * ARROW_SIZE, math.sin(angle + ARROW_ANGLE) * ARROW_SIZE)
+    path.addPolygon(QPolygonF([end_point, p1, p2, end_point]))
+
+
+class NodeItem(QGraphicsItem):
+    """ノードの矩形とラベルを直接描く軽量なアイテム（ウィジェットを使わない）"""
+
+    PADDING_X = 8
+    PADDING_Y = 4
+
+    def __init__(self, node, label, metrics, on_click):
+        super().__init__()
+        self.node = node
+        self.label = label
+        self.on_click = on_click
+        self.state = 'normal'
+        width = metrics.horizontalAdvance(label) + self.PADDING_X * 2
+        height = metrics.height() + self.PADDING_Y * 2
+        self.rect = QRectF(-width / 2, -height / 2, width, height)
+        self.bounds = self.rect.adjusted(-1, -1, 1, 1)
+        self.setAcceptedMouseButtons(Qt.LeftButton)
+
+    def boundingRect(self):
+        return self.bounds
+
+    def paint(self, painter, option, widget=None):
+        fill, text = NODE_STYLES[self.state]
+        lod = option.levelOfDetailFromTransform(painter.worldTransform())
+        painter.setPen(BORDER_PEN if lod >= BORDER_MIN_LOD else Qt.NoPen)
+        painter.setBrush(fill)
+        painter.drawRect(self.rect)
+        if lod >= LABEL_MIN_LOD:
+            painter.setPen(text)
+            painter.drawText(self.rect, Qt.AlignCenter, self.label)
+
+    def set_state(self, state):
+        """表示状態を変える（変わったときだけ再描画する）"""
+        if state != self.state:
+            self.state = state
+            self.update()
+
+    def mousePressEvent(self, event):
+        # Shift + クリックで推移的な（何段先までもの）つながりを強調する
+        self.on_click(self.node, bool(event.modifiers() & Qt.ShiftModifier))
+        event.accept()
+
+
 class GraphVisualizer(QGraphicsView):
-    def __init__(self, graph):
+    def __init__(self, nodes, edges, transitive=False):
+        """nodes: {ノードID: (ラベル, x, y)}, edges: [(始点ID, 終点ID, 種別), ...]（graph_elements の戻り値）
+
+        transitive: True ならクリックで推移的なつながりを、False なら直接のつながりを強調する
+        （Shift + クリックで逆になる）
+        """
         super().__init__()
-        self.graph = graph
+        self.nodes = nodes
         self.scene = QGraphicsScene(self)
         self.scene.setBackgroundBrush(QBrush(QColor(255, 255, 255)))
         self.setScene(self.scene)
         self.setRenderHint(QPainter.Antialiasing)
-        self.node_buttons = {}
-        self.edges = []
-        self.populate_graph()
-
-    def populate_graph(self):
-        for node in self.graph.nodes():
-            attrs = self.graph.get_node(node).attr
-            label = attrs['label'].strip('"')
-            pos = attrs.get('pos', '0,0').split(',')
-            x, y = map(float, pos)
-            button = QPushButton(label)
-            button.setStyleSheet("background-color: lightblue; color: black; border: 1px solid black;")
-            proxy = self.scene.addWidget(button)
-            proxy.setPos(x - button.width() / 2, y - button.height() / 2)
-            button.clicked.connect(lambda checked, node=node: self.highlight_connected(node))
-            self.node_buttons[node] = (button, proxy)
-
-        # Draw edges before nodes
-        for edge in self.graph.edges():
-            start, end = edge
-            start_point = self.get_position(start)
-            end_point = self.get_position(end)
-            line = QLineF(start_point, end_point)
-            line_item = self.scene.addLine(line, QPen(QColor('black'), 2))
-            line_item.setZValue(-10)  # Ensure lines are behind nodes
-            self.add_arrow_head(line_item, start_point, end_point)
-            self.edges.append((line_item, start, end))
+        self.setViewportUpdateMode(QGraphicsView.SmartViewportUpdate)
+        self.setOptimizationFlags(QGraphicsView.DontSavePainterState)
+        self.setTransformationAnchor(QGraphicsView.AnchorUnderMouse)
+        self.setDragMode(QGraphicsView.ScrollHandDrag)
+        self.node_items = {}
+        self.metrics = QFontMetricsF(QFont())
+        # エッジはIDで持つ（監視中の追加・削除で他のエッジのIDが変わらないように）
+        self.edges = {}
+        self.next_edge_id = 0
+        # ノード→出ていく/入ってくるエッジのID（クリック時に全エッジを走査しないため）
+        self.out_edges = {node: set() for node in nodes}
+        self.in_edges = {node: set() for node in nodes}
+        # 格子の組→そこに属するエッジのID と、それを描くアイテム
+        self.cell_edges = {}
+        self.edge_items = {}
+        self.highlight_item = None
+        self.transitive = transitive
+        # 推移閉包はクリックされたノードごとにメモ化される（グラフが変わったら作り直す）
+        self._index = None
+        # 現在強調表示しているノードとその状態（Shift + クリックで切り替えたかどうかも覚えておく）
+        self.selected = None
+        self.selected_toggle = False
+        self.highlighted = {}
+        self.populate_graph(edges)
+
+    def populate_graph(self, edges):
+        for node, (label, x, y) in self.nodes.items():
+            self.add_node_item(node, label, x, y)
+
+        # エッジは格子ごとにまとめてパスにし、ノードの後ろに描く
+        self.rebuild_cells({self.add_edge(edge) for edge in edges})
+
+        # 選択中のノードにつながるエッジだけを重ねて描くアイテム
+        self.highlight_item = QGraphicsPathItem()
+        self.highlight_item.setPen(HIGHLIGHT_PEN)
+        self.highlight_item.setBrush(QBrush(QColor('red')))
+        self.highlight_item.setZValue(-5)
+        self.scene.addItem(self.highlight_item)
+
+    def add_node_item(self, node, label, x, y):
+        item = NodeItem(node, label, self.metrics, self.highlight_connected)
+        item.setPos(x, y)
+        self.scene.addItem(item)
+        self.node_items[node] = item
+
+    def edge_cell(self, start, end):
+        """エッジを振り分ける格子の組（始点の格子, 終点の格子）"""
+        _, x1, y1 = self.nodes[start]
+        _, x2, y2 = self.nodes[end]
+        return (int(x1 // EDGE_CELL_SIZE), int(y1 // EDGE_CELL_SIZE),
+                int(x2 // EDGE_CELL_SIZE), int(y2 // EDGE_CELL_SIZE))
+
+    def add_edge(self, edge):
+        """エッジを登録し、属する格子の組を返す（描画は rebuild_cells で行う）"""
+        edge_id = self.next_edge_id
+        self.next_edge_id += 1
+        start, end, _ = edge
+        self.edges[edge_id] = edge
+        self.out_edges[start].add(edge_id)
+        self.in_edges[end].add(edge_id)
+        cell = self.edge_cell(start, end)
+        self.cell_edges.setdefault(cell, set()).add(edge_id)
+        return cell
+
+    def remove_edge(self, edge_id):
+        """エッジを取り除き、属していた格子の組を返す"""
+        start, end, _ = self.edges.pop(edge_id)
+        self.out_edges[start].discard(edge_id)
+        self.in_edges[end].discard(edge_id)
+        cell = self.edge_cell(start, end)
+        self.cell_edges[cell].discard(edge_id)
+        return cell
+
+    def rebuild_cells(self, cells):
+        """指定した格子の組のパスだけを作り直す"""
+        for cell in cells:
+            edge_ids = self.cell_edges.get(cell)
+            item = self.edge_items.get(cell)
+            if not edge_ids:
+                self.cell_edges.pop(cell, None)
+                if item is not None:
+                    self.scene.removeItem(self.edge_items.pop(cell))
+                continue
+            path = QPainterPath()
+            for edge_id in edge_ids:
+                start, end, _ = self.edges[edge_id]
+                add_edge_to_path(path, self.get_position(start), self.get_position(end))
+            if item is None:
+                item = self.edge_items[cell] = QGraphicsPathItem()
+                item.setPen(EDGE_PEN)
+                item.setBrush(QBrush(QColor('black')))
+                item.setZValue(-10)  # Ensure lines are behind nodes
+                self.scene.addItem(item)
+            item.setPath(path)
+
+    @property
+    def index(self):
+        if self._index is None:
+            self._index = DependencyIndex.from_edges(
+                ((node, label) for node, (label, _, _) in self.nodes.items()), self.edges.values())
+        return self._index
 
     def get_position(self, node_id):
-        pos = self.graph.get_node(node_id).attr.get('pos', '0,0').split(',')
-        return QPointF(float(pos[0]), float(pos[1]))
-
-    def add_arrow_head(self, line_item, start_point, end_point):
-        angle = math.atan2(end_point.y() - start_point.y(), end_point.x() - start_point.x())
-        arrow_size = 10
-        arrow_angle = math.pi / 6
-        p1 = end_point - QPointF(math.cos(angle - arrow_angle) * arrow_size, math.sin(angle - arrow_angle) * arrow_size)
-        p2 = end_point - QPointF(math.cos(angle + arrow_angle) * arrow_size, math.sin(angle + arrow_angle) * arrow_size)
-        arrow = QPolygonF([end_point, p1, p2])
-        arrow_item = self.scene.addPolygon(arrow, QPen(QColor('black')), QBrush(QColor('black')))
-        arrow_item.setZValue(-10)  # Ensure arrow heads are also behind nodes
-
-    def highlight_connected(self, node):
-        # Reset all styles
-        for button, proxy in self.node_buttons.values():
-            button.setStyleSheet("background-color: lightblue; color: black; border: 1px solid black;")
-        for line_item, start, end in self.edges:
-            line_item.setPen(QPen(QColor('black'), 2))
-
-        # Highlight the selected node and its direct connections
-        self.node_buttons[node][0].setStyleSheet("background-color: red; color: white; border: 1px solid black;")
-        for edge, start, end in self.edges:
-            if start == node or end == node:
-                edge.setPen(QPen(QColor('red'), 3))
-                self.node_buttons[start][0].setStyleSheet(
-                    "background-color: green; color: white; border: 1px solid black;")
-                self.node_buttons[end][0].setStyleSheet(
-                    "background-color: green; color: white; border: 1px solid black;")
+        _, x, y = self.nodes[node_id]
+        return QPointF(x, y)
+
+    def highlight_connected(self, node, toggle_transitive=False):
+        """クリックされたノードとつながるノード・エッジを強調する
+
+        変化するノードだけを塗り直すので、コストはつながりの大きさに比例する
+        """
+        transitive = self.transitive != toggle_transitive
+        if transitive:
+            downstream = self.index.closure(node)
+            upstream = self.index.closure(node, reverse=True)
+            edge_ids = [i for n in downstream | {node} for i in self.out_edges[n] if self.edges[i][1] in downstream]
+            edge_ids += [i for n in upstream | {node} for i in self.in_edges[n] if self.edges[i][0] in upstream]
+        else:
+            edge_ids = self.out_edges[node] | self.in_edges[node]
+
+        states = {}
+        path = QPainterPath()
+        for i in set(edge_ids):
+            start, end, _ = self.edges[i]
+            add_edge_to_path(path, self.get_position(start), self.get_position(end))
+            states[start] = states[end] = 'connected'
+        states[node] = 'selected'
+
+        # 前回強調していて今回は対象外のノードだけを元に戻す
+        for previous in self.highlighted.keys() - states.keys():
+            self.node_items[previous].set_state('normal')
+        for target, state in states.items():
+            self.node_items[target].set_state(state)
+        self.selected = node
+        self.selected_toggle = toggle_transitive
+        self.highlighted = states
+        self.highlight_item.setPath(path)
+
+    def clear_highlight(self):
+        for node in self.highlighted:
+            if node in self.node_items:
+                self.node_items[node].set_state('normal')
+        self.selected = None
+        self.highlighted = {}
+        self.highlight_item.setPath(QPainterPath())
+
+    def apply_change(self, event):
+        """blade_watch から届いた変更イベントを反映する（変化したノードと、その周りの格子だけを描き直す）
+
+        event: {"nodes": {番号: パス}, "removed": [番号], "dependencies": {番号: [{"num", "type", "line"}, ...]}}
+        """
+        dirty_cells = set()
+        for node in event.get('removed', ()):
+            if node not in self.nodes:
+                continue
+            for edge_id in self.out_edges[node] | self.in_edges[node]:
+                dirty_cells.add(self.remove_edge(edge_id))
+            self.remove_node(node)
+
+        dependencies = event.get('dependencies', {})
+        for i, (node, label) in enumerate(event.get('nodes', {}).items()):
+            self.add_new_node(node, label, dependencies, i)
+
+        placeholders = 0
+        for node, deps in dependencies.items():
+            if node not in self.nodes:
+                continue
+            # そのノードのディレクティブで張られていたエッジを張り直す
+            owned = [edge_id for edge_id in self.out_edges[node] | self.in_edges[node]
+                     if edge_owner(self.edges[edge_id]) == node]
+            for edge_id in owned:
+                dirty_cells.add(self.remove_edge(edge_id))
+            for dep in deps:
+                if dep['num'] not in self.nodes:
+                    # 見つからないビュー・動的なビューなどは step3 と同じく表示名のノードを作る
+                    label = unresolved_label(dep['num']) if is_unresolved(dep['num']) else dep['num']
+                    self.add_new_node(dep['num'], label, dependencies, placeholders)
+                    placeholders += 1
+                dirty_cells.add(self.add_edge(dot_edge(node, dep['num'], dep['type'])))
+
+        # 参照されなくなった見つからないビューなどのノードは消す（ファイルのノードは残す）
+        for node in [node for node in self.nodes if is_unresolved(node)]:
+            if not self.out_edges[node] and not self.in_edges[node]:
+                self.remove_node(node)
+
+        self.rebuild_cells(dirty_cells)
+        self._index = None
+        if self.selected in self.nodes:
+            # Shift + クリックで切り替えていたなら、同じ強調のしかたで描き直す
+            self.highlight_connected(self.selected, self.selected_toggle)
+        else:
+            self.clear_highlight()
+
+    def add_new_node(self, node, label, dependencies, order):
+        """監視中に増えたノードを、レイアウトし直さずに隣接ノードの近くに置く"""
+        x, y = self.new_node_position(node, dependencies, order)
+        self.nodes[node] = (label, x, y)
+        self.out_edges[node] = set()
+        self.in_edges[node] = set()
+        self.add_node_item(node, label, x, y)
+
+    def remove_node(self, node):
+        """エッジのなくなったノードを取り除く"""
+        del self.out_edges[node], self.in_edges[node]
+        self.scene.removeItem(self.node_items.pop(node))
+        del self.nodes[node]
+        self.highlighted.pop(node, None)
+
+    def new_node_position(self, node, dependencies, order):
+        """レイアウトし直さずに新しいノードを置く位置（依存先か依存元の隣、なければ全体の下）"""
+        neighbours = [dep['num'] for dep in dependencies.get(node, ())]
+        neighbours += [num for num, deps in dependencies.items() if any(dep['num'] == node for dep in deps)]
+        for neighbour in neighbours:
+            if neighbour in self.nodes:
+                _, x, y = self.nodes[neighbour]
+                return x + NEW_NODE_OFFSET_X, y + NEW_NODE_OFFSET_Y * (order + 1)
+        bounds = self.scene.itemsBoundingRect()
+        return bounds.left() + NEW_NODE_OFFSET_X * order, bounds.bottom() + NEW_NODE_OFFSET_Y
+
+    def wheelEvent(self, event):
+        """マウスホイールでカーソル位置を中心に拡大・縮小する"""
+        factor = ZOOM_STEP if event.angleDelta().y() > 0 else 1 / ZOOM_STEP
+        self.scale(factor, factor)
+
+
+class WatchClient:
+    """blade_watch.py のイベント配信に接続し、届いたイベントをビューアへ反映する"""
+
+    def __init__(self, viewer, host=DEFAULT_HOST, port=DEFAULT_PORT):
+        self.viewer = viewer
+        self.socket = QTcpSocket()
+        self.socket.readyRead.connect(self.read_events)
+        self.socket.connectToHost(host, port)
+
+    def read_events(self):
+        while self.socket.canReadLine():
+            line = bytes(self.socket.readLine()).decode('utf-8').strip()
+            if line:
+                self.viewer.apply_change(json.loads(line))
 
 
 def main():
-    app = QApplication(sys.argv)
-    graph = create_graph('dependency_graph.dot')
-    viewer = GraphVisualizer(graph)
+    parser = argparse.ArgumentParser(description='依存関係グラフのビューア')
+    parser.add_argument('dot_file', nargs='?', default='dependency_graph.dot')
+    parser.add_argument('--layout-cache', default=DEFAULT_CACHE_DIR,
+                        help=f'レイアウトキャッシュのディレクトリ（デフォルト: {DEFAULT_CACHE_DIR}）')
+    parser.add_argument('--no-layout-cache', action='store_true', help='毎回レイアウトし直す')
+    parser.add_argument('--full-layout', action='store_true',
+                        help='前回の座標を再利用して差分だけを配置し直さず、dot で全体を配置する')
+    parser.add_argument('--transitive', action='store_true',
+                        help='クリックで推移的な include / extends のつながりを強調する（Shift + クリックで切り替え）')
+    parser.add_argument('--watch', nargs='?', const=f'{DEFAULT_HOST}:{DEFAULT_PORT}', metavar='HOST:PORT',
+                        help=f'blade_watch.py の変更イベントを受け取って表示を更新する（デフォルト: {DEFAULT_HOST}:{DEFAULT_PORT}）')
+    args, qt_args = parser.parse_known_args()
+
+    app = QApplication(sys.argv[:1] + qt_args)
+    graph = create_graph(args.dot_file, None if args.no_layout_cache else args.layout_cache, not args.full_layout)
+    viewer = GraphVisualizer(*graph_elements(graph), transitive=args.transitive)
+    if args.watch:
+        host, _, port = args.watch.rpartition(':')
+        # 接続が切れないように、ビューアに持たせておく
+        viewer.watch_client = WatchClient(viewer, host or DEFAULT_HOST, int(port))
     viewer.show()
     sys.exit(app.exec_())
 
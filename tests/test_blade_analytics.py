@@ -0,0 +1,74 @@
+import random
+
+import pytest
+
+from blade_analytics import GraphAnalytics, strongly_connected_components
+from blade_query import DependencyIndex
+
+
+def reachable(adjacency, num):
+    found = {num}
+    stack = [num]
+    while stack:
+        for neighbor in adjacency.get(stack.pop(), ()):
+            if neighbor not in found:
+                found.add(neighbor)
+                stack.append(neighbor)
+    return found
+
+
+def build_index(edges, file_map=None):
+    nodes = {num for edge in edges for num in edge}
+    if file_map is None:
+        file_map = {num: f"{num}.blade.php" for num in sorted(nodes)}
+    dependencies = {}
+    for source, target in edges:
+        dependencies.setdefault(source, []).append({'num': target, 'type': 'include'})
+    return DependencyIndex(dependencies, file_map)
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_components_match_mutual_reachability(seed):
+    rng = random.Random(seed)
+    count = rng.randint(1, 40)
+    nodes = [str(i) for i in range(count)]
+    adjacency = {num: [] for num in nodes}
+    for _ in range(rng.randint(0, count * 2)):
+        adjacency[rng.choice(nodes)].append(rng.choice(nodes))
+
+    components = strongly_connected_components(nodes, adjacency)
+    reach = {num: reachable(adjacency, num) for num in nodes}
+    expected = {frozenset(m for m in nodes if m in reach[num] and num in reach[m]) for num in nodes}
+    assert {frozenset(component) for component in components} == expected
+    assert sorted(num for component in components for num in component) == sorted(nodes)
+
+    # 逆トポロジカル順: 依存先の成分が先に出てくる
+    position = {num: i for i, component in enumerate(components) for num in component}
+    for num, targets in adjacency.items():
+        for target in targets:
+            assert position[target] <= position[num]
+
+
+def test_cycles_orphans_and_depth():
+    edges = [('1', '2'), ('2', '1'), ('3', '3'), ('4', '1'), ('5', '4'), ('5', 'missing:x')]
+    file_map = {num: f"{num}.blade.php" for num in '123456'}
+    file_map['6'] = 'pages/top.blade.php'
+    analytics = GraphAnalytics(build_index(edges, file_map), entries=['pages/*'])
+    assert analytics.cycles() == [['1.blade.php', '2.blade.php'], ['3.blade.php']]
+    # 6 はページとして除外され、3 は自分自身から依存されている
+    assert analytics.orphans() == ['5.blade.php']
+    assert analytics.isolated() == []
+    depth, chain = analytics.depth()
+    assert depth == 2
+    assert chain[0] == '5.blade.php' and chain[1] == '4.blade.php'
+    report = analytics.report()
+    assert report['missing'] == ['x']
+    assert report['fan_in'][0] == {'file': '1.blade.php', 'fan_in': 2}
+
+
+def test_long_chain_does_not_recurse():
+    count = 20000
+    edges = [(str(i), str(i + 1)) for i in range(count - 1)]
+    analytics = GraphAnalytics(build_index(edges))
+    assert analytics.cycles() == []
+    assert analytics.depth()[0] == count - 1
@@ -0,0 +1,53 @@
+import json
+import os
+
+from blade_batch import load_manifest, run_batch
+
+
+def write(path, text=''):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding='utf-8')
+
+
+def make_project(root, files):
+    for relative, text in files.items():
+        write(root / 'resources/views' / relative, text)
+
+
+def test_load_manifest_resolves_roots_and_names(tmp_path):
+    manifest = tmp_path / 'projects.json'
+    manifest.write_text(json.dumps({'projects': ['sites/shop', {'root': 'other/shop'}, {'name': 'x', 'root': 'y'}]}))
+    projects = load_manifest(str(manifest))
+    assert [project['name'] for project in projects] == ['shop', 'shop_2', 'x']
+    assert projects[0]['root'] == os.path.join(str(tmp_path), 'sites/shop')
+
+
+def test_run_batch_analyses_each_project_and_reuses_the_cache(tmp_path):
+    make_project(tmp_path / 'shop', {
+        'layouts/app.blade.php': "@include('partials.nav')\n",
+        'partials/nav.blade.php': "@include('partials.missing')\n",
+        'pages/home.blade.php': "@extends('layouts.app')\n",
+    })
+    make_project(tmp_path / 'blog', {
+        'a.blade.php': "@include('b')\n",
+        'b.blade.php': "@include('a')\n",
+    })
+    configs = [{'name': 'shop', 'root': str(tmp_path / 'shop')},
+               {'name': 'blog', 'root': str(tmp_path / 'blog')},
+               {'name': 'broken', 'root': str(tmp_path / 'nowhere')}]
+    output = str(tmp_path / 'out')
+    summary = run_batch(configs, output, jobs=2)
+
+    shop, blog, broken = summary['projects']
+    assert (shop['files'], shop['edges'], shop['missing'], shop['cycles']) == (3, 3, 1, [])
+    assert len(blog['cycles']) == 1
+    assert 'FileNotFoundError' in broken['error']
+    assert summary['totals']['failed'] == 1
+    assert summary['totals']['files_reparsed'] == 5
+    for name in ('blade_files.json', 'blade_dependencies.json', 'analytics.json', 'dependency_graph.dot'):
+        assert os.path.exists(os.path.join(output, 'shop', name))
+
+    # 2回目は変更のないファイルを読み直さない
+    summary = run_batch(configs[:2], output, jobs=2)
+    assert summary['totals']['files_reparsed'] == 0
+    assert summary['totals']['edges'] == 5
@@ -0,0 +1,48 @@
+import pytest
+
+import blade_compact_graph
+from blade_compact_graph import save_compact_graph, load_compact_graph
+
+FILE_MAP = {'1': 'layouts/app.blade.php', '2': 'pages/home.blade.php', '3': 'partials/ナビ.blade.php'}
+# 依存元の順（2 → 1 → 3 → コントローラ）は blade_files.json の順と違ってもそのまま保つ
+DEPENDENCIES = {
+    '2': [{'num': '1', 'type': 'extends'}, {'num': '3', 'type': 'include'},
+          {'num': 'missing:x', 'type': 'include', 'line': 7}],
+    '1': [{'num': '3', 'type': 'include'}],
+    '3': [],
+    'controller:App\\Http\\Controllers\\HomeController@index': [{'num': '2', 'type': 'view', 'line': 12}],
+}
+
+
+@pytest.mark.parametrize('use_numpy', [
+    pytest.param(True, marks=pytest.mark.skipif(blade_compact_graph.np is None, reason='NumPy がない')),
+    False,
+])
+def test_round_trip_and_close(tmp_path, use_numpy):
+    path = str(tmp_path / 'graph.bin')
+    save_compact_graph(DEPENDENCIES, FILE_MAP, path)
+    graph = load_compact_graph(path, use_numpy)
+    assert (graph.node_count, graph.file_count) == (5, 3)
+    assert list(graph.iter_nodes(unresolved=False)) == list(FILE_MAP.items())
+    # 番号のないノード（missing: / controller: など）もIDのまま残し、step3 と同じ表示名にする
+    assert list(graph.iter_nodes())[3:] == [('controller:App\\Http\\Controllers\\HomeController@index',
+                                             'HomeController@index'), ('missing:x', 'x (missing)')]
+    assert list(graph.iter_edges()) == [
+        ('2', '1', 'extends'), ('2', '3', 'include'), ('2', 'missing:x', 'include'),
+        ('1', '3', 'include'),
+        ('controller:App\\Http\\Controllers\\HomeController@index', '2', 'view'),
+    ]
+    assert list(graph.iter_edges(lines=True))[2] == ('2', 'missing:x', 'include', 7)
+    assert list(graph.iter_edges(lines=True))[0] == ('2', '1', 'extends', None)
+    assert [int(i) for i in graph.successors(1)] == [0, 2, 4]
+    # NumPy の配列が mmap を参照していても close できる
+    graph.close()
+    assert graph.buffer.closed
+
+
+def test_default_close_with_numpy(tmp_path):
+    path = str(tmp_path / 'graph.bin')
+    save_compact_graph(DEPENDENCIES, FILE_MAP, path)
+    graph = load_compact_graph(path)
+    list(graph.iter_edges())
+    graph.close()
@@ -0,0 +1,54 @@
+import subprocess
+
+from blade_diff import RevisionCache, Snapshot, diff_snapshots, load_snapshot
+
+VIEWS = {
+    'layouts/app.blade.php': "@include('partials.header')\n@yield('content')\n",
+    'partials/header.blade.php': "<header></header>\n",
+    'partials/footer.blade.php': "<footer></footer>\n",
+    'pages/a.blade.php': "@extends('layouts.app')\n",
+    'pages/b.blade.php': "@extends('layouts.app')\n",
+    'pages/c.blade.php': "@extends('layouts.app')\n",
+    'pages/d.blade.php': "<p>d</p>\n",
+}
+
+
+def commit(repo, files, message):
+    for relative, text in files.items():
+        path = repo / 'resources/views' / relative
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(text, encoding='utf-8')
+    subprocess.run(['git', '-C', str(repo), 'add', '-A'], check=True)
+    subprocess.run(['git', '-C', str(repo), '-c', 'user.name=t', '-c', 'user.email=t@example.com',
+                    'commit', '-q', '-m', message], check=True)
+
+
+def test_only_the_dependent_of_a_changed_edge_is_seeded():
+    nodes = ['pages/a.blade.php', 'pages/b.blade.php', 'partials/footer.blade.php']
+    old = Snapshot('old', nodes, {('pages/b.blade.php', 'partials/footer.blade.php', 'include')})
+    new = Snapshot('new', nodes, {('pages/b.blade.php', 'partials/footer.blade.php', 'include'),
+                                  ('pages/a.blade.php', 'partials/footer.blade.php', 'include')})
+    result = diff_snapshots(old, new)
+    assert result['added_edges'] == [{'from': 'pages/a.blade.php', 'to': 'partials/footer.blade.php',
+                                      'type': 'include'}]
+    # pages/b は footer に依存しているだけで、変わっていない
+    assert result['impacted_pages'] == ['pages/a.blade.php']
+    assert result['pages_gained'] == result['pages_lost'] == []
+
+
+def test_git_snapshots_seed_templates_whose_content_changed(tmp_path):
+    repo = tmp_path / 'app'
+    repo.mkdir()
+    subprocess.run(['git', 'init', '-q', str(repo)], check=True)
+    commit(repo, VIEWS, 'first')
+    commit(repo, {'pages/a.blade.php': "@extends('layouts.app')\n@include('partials.footer')\n",
+                  'partials/header.blade.php': "<header>new</header>\n"}, 'second')
+
+    cache = RevisionCache(None)
+    old, _ = load_snapshot('git:HEAD~1', str(repo), cache=cache)
+    new, _ = load_snapshot('git:HEAD', str(repo), cache=cache)
+    result = diff_snapshots(old, new)
+    assert result['modified_nodes'] == ['pages/a.blade.php', 'partials/header.blade.php']
+    assert result['impacted_pages'] == ['pages/a.blade.php', 'pages/b.blade.php', 'pages/c.blade.php']
+    assert result['pages_gained'] == result['pages_lost'] == []
+    assert 'partials/footer.blade.php' not in result['impacted_pages']
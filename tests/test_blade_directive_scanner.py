@@ -0,0 +1,49 @@
+from blade_directive_scanner import Edge, scan_directives
+
+
+def test_directives_are_returned_in_document_order_with_lines():
+    content = (
+        "@extends('layouts.app')\n"
+        "@section('content')\n"
+        "    @include(\"partials.header\", ['title' => $title])\n"
+        "    @includeIf('partials.optional')\n"
+        "    @includeWhen($admin, 'partials.admin', ['user' => $user])\n"
+        "    @includeUnless($guest, 'partials.account')\n"
+        "    @includeFirst(['custom.nav', 'nav'])\n"
+        "    @each('items.row', $items, 'item', 'items.empty')\n"
+        "    @component('alert') @endcomponent\n"
+        "    @livewire('counter')\n"
+        "@endsection\n"
+    )
+    assert scan_directives(content) == [
+        Edge('extends', 'layouts.app', 1),
+        Edge('include', 'partials.header', 3),
+        Edge('includeIf', 'partials.optional', 4),
+        Edge('includeWhen', 'partials.admin', 5),
+        Edge('includeUnless', 'partials.account', 6),
+        Edge('includeFirst', 'custom.nav', 7),
+        Edge('includeFirst', 'nav', 7),
+        Edge('each', 'items.row', 8),
+        Edge('each', 'items.empty', 8),
+        Edge('component', 'alert', 9),
+        Edge('livewire', 'livewire.counter', 10),
+    ]
+
+
+def test_component_tags():
+    content = "<x-alert type=\"error\"/>\n<x-forms.input/>\n<x-mail::button>\n<x-slot:title>t</x-slot>\n"
+    assert scan_directives(content) == [
+        Edge('component', 'components.alert', 1),
+        Edge('component', 'components.forms.input', 2),
+        Edge('component', 'mail::components.button', 3),
+    ]
+
+
+def test_escaped_and_variable_arguments_are_skipped():
+    content = "@@include('escaped')\n@include($partial)\n@include ( 'spaced' )\n@includeFirst($views)\n"
+    assert scan_directives(content) == [Edge('include', 'spaced', 3)]
+
+
+def test_multiline_arguments():
+    content = "@includeWhen(\n    $user->isAdmin(),\n    'admin.menu',\n    ['a' => ['b', 'c']]\n)\n@include('after')\n"
+    assert scan_directives(content) == [Edge('includeWhen', 'admin.menu', 1), Edge('include', 'after', 6)]
@@ -0,0 +1,43 @@
+from blade_directive_scanner import Edge, scan_directives
+from blade_dynamic_includes import CANDIDATE_TYPE, DynamicIncludeExpander, expression_parts
+
+
+def test_dynamic_names_are_recorded_only_when_requested():
+    content = ("@include($partial)\n"
+               "@include('forms.' . $type, ['a' => 1])\n"
+               "@include(\"forms.{$type}\")\n"
+               "<x-dynamic-component :component=\"$name\" />\n"
+               "<x-dynamic-component component=\"alert\" />\n")
+    assert scan_directives(content) == []
+    assert scan_directives(content, dynamic=True) == [
+        Edge('include', 'dynamic:$partial', 1),
+        Edge('include', "dynamic:'forms.' . $type", 2),
+        Edge('include', 'dynamic:"forms.{$type}"', 3),
+        Edge('component', "dynamic:'components.' . $name", 4),
+        Edge('component', 'components.alert', 5),
+    ]
+
+
+def test_expression_parts():
+    assert expression_parts("'forms.' . $type") == ['forms.', None]
+    assert expression_parts('"forms.{$type}.row"') == ['forms.', None, '.row']
+    assert expression_parts('$partial') == [None]
+
+
+def test_candidates_are_expanded_from_enumerated_views():
+    blade_files = {
+        '1': 'forms/text.blade.php',
+        '2': 'forms/select.blade.php',
+        '3': 'forms/select/row.blade.php',
+        '4': 'formsx.blade.php',
+        '5': 'pages/home.blade.php',
+    }
+    expander = DynamicIncludeExpander(blade_files)
+    assert set(expander.expand("dynamic:'forms.' . $type")) == {'1', '2', '3'}
+    assert expander.expand('dynamic:"forms.{$type}.row"') == ('3',)
+    # 手がかりのない式は展開しない
+    assert expander.expand('dynamic:$partial') == ()
+    dependencies = {'5': [{'num': "dynamic:'forms.' . $type", 'type': 'include'}, {'num': '1', 'type': 'include'}]}
+    expanded = expander.expand_dependencies(dependencies)
+    assert sorted(dep['num'] for dep in expanded["dynamic:'forms.' . $type"]) == ['1', '2', '3']
+    assert {dep['type'] for dep in expanded["dynamic:'forms.' . $type"]} == {CANDIDATE_TYPE}
@@ -0,0 +1,60 @@
+import pytest
+
+pgv = pytest.importorskip('pygraphviz')
+
+from blade_layout_cache import LayoutCache  # noqa: E402
+
+NAMES = 'abcdefghijklmnopqrstuvwxyz'
+
+
+def write_dot(path, numbering, extra=()):
+    """a -> b -> c ... と1つ飛ばしのエッジを持つグラフ（numbering: 名前 -> ノード番号）"""
+    lines = ['digraph G {']
+    lines += [f'  {numbering[name]} [label="{name}.blade.php"];' for name in NAMES]
+    lines += [f'  {numbering[a]} -> {numbering[b]};' for a, b in zip(NAMES, NAMES[1:])]
+    lines += [f'  {numbering[a]} -> {numbering[b]};' for a, b in zip(NAMES, NAMES[2:])]
+    lines += list(extra)
+    lines.append('}')
+    path.write_text('\n'.join(lines), encoding='utf-8')
+    return str(path)
+
+
+def layout(cache, dot_path, **options):
+    graph = pgv.AGraph(dot_path)
+    result = cache.layout(graph, dot_path, **options)
+    positions = {graph.get_node(node).attr['label']: tuple(map(float, graph.get_node(node).attr['pos'].split(',')))
+                 for node in graph.nodes()}
+    return result, positions
+
+
+def test_renumbered_nodes_keep_their_positions(tmp_path):
+    cache = LayoutCache(str(tmp_path / 'cache'))
+    dot_path = tmp_path / 'graph.dot'
+    result, before = layout(cache, write_dot(dot_path, {name: i + 1 for i, name in enumerate(NAMES)}))
+    assert result == 'full'
+
+    # --no-index で番号が逆順に振り直され、ファイルが1つ増えた
+    renumbered = {name: len(NAMES) - i for i, name in enumerate(NAMES)}
+    extra = ['  99 [label="new.blade.php"];', f"  {renumbered['a']} -> 99;"]
+    result, after = layout(cache, write_dot(dot_path, renumbered, extra))
+    assert result == 'incremental'
+    # neato は全体を平行移動することがあるので、ファイル同士の相対位置で比べる
+    dx = after['a.blade.php'][0] - before['a.blade.php'][0]
+    dy = after['a.blade.php'][1] - before['a.blade.php'][1]
+    for label, (x, y) in before.items():
+        assert after[label] == pytest.approx((x + dx, y + dy), abs=0.5)
+
+    # 差分だけを配置したレイアウトは、dot で全体を配置したものとは別に保存される
+    assert layout(cache, str(dot_path))[0] == 'hit'
+    assert layout(cache, str(dot_path), incremental=False)[0] == 'full'
+    assert layout(cache, str(dot_path), incremental=False)[0] == 'hit'
+
+
+def test_large_changes_are_laid_out_again(tmp_path):
+    cache = LayoutCache(str(tmp_path / 'cache'))
+    dot_path = tmp_path / 'graph.dot'
+    numbering = {name: i + 1 for i, name in enumerate(NAMES)}
+    layout(cache, write_dot(dot_path, numbering))
+    # エッジ数の1割を超える変更は、50 件未満でも全体を配置し直す
+    extra = [f'  {numbering[a]} -> {numbering[b]};' for a, b in zip(NAMES, NAMES[5:15])]
+    assert layout(cache, write_dot(dot_path, numbering, extra))[0] == 'full'
@@ -0,0 +1,109 @@
+import os
+
+from blade_manifest_cache import ManifestCache, key_scope
+
+
+def write(path, text):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(text, encoding='utf-8')
+    return str(path)
+
+
+def parse(content):
+    return [line for line in content.splitlines() if line.startswith('@')]
+
+
+def run(cache_path, items):
+    """items: {キー: 実ファイルのパス} を1回解析して (抽出結果, キャッシュ) を返す"""
+    cache = ManifestCache(cache_path)
+    cache.load()
+    result = {key: cache.get_or_parse(key, full_path, parse) for key, full_path in items.items()}
+    cache.save()
+    return result, cache
+
+
+def load(cache_path):
+    cache = ManifestCache(cache_path)
+    cache.load()
+    return cache.entries
+
+
+def test_key_scope():
+    assert key_scope('php:routes/web.php') == 'php:'
+    assert key_scope('layouts/app.blade.php') == ''
+
+
+def test_entries_of_unscanned_scope_are_kept(tmp_path):
+    cache_path = str(tmp_path / 'cache.json')
+    view = write(tmp_path / 'views/a.blade.php', "@include('b')\n")
+    route = write(tmp_path / 'routes/web.php', "<?php\n")
+    run(cache_path, {'a.blade.php': view, 'php:routes/web.php': route})
+
+    # --php なしの実行でも、PHPファイルのエントリは消えない
+    run(cache_path, {'a.blade.php': view})
+    assert 'php:routes/web.php' in load(cache_path)
+    _, cache = run(cache_path, {'a.blade.php': view, 'php:routes/web.php': route})
+    assert cache.reparsed == 0
+    assert cache.reused == 2
+
+    # 同じ種類を走査したのに参照しなかったエントリ（削除されたファイル）は落とす
+    run(cache_path, {'a.blade.php': view})
+    run(cache_path, {'php:app/Http/Controllers/UserController.php':
+                     write(tmp_path / 'app/Http/Controllers/UserController.php', "<?php\n")})
+    assert set(load(cache_path)) == {'a.blade.php', 'php:app/Http/Controllers/UserController.php'}
+
+
+def test_unchanged_files_are_reused(tmp_path):
+    cache_path = str(tmp_path / 'cache.json')
+    items = {'a.blade.php': write(tmp_path / 'a.blade.php', "@include('b')\n"),
+             'b.blade.php': write(tmp_path / 'b.blade.php', "@extends('c')\n")}
+    first, cache = run(cache_path, items)
+    assert cache.reparsed == 2
+    second, cache = run(cache_path, items)
+    assert second == first
+    assert (cache.reused, cache.reparsed, cache.bytes_read) == (2, 0, 0)
+
+
+def test_changed_file_is_reparsed(tmp_path):
+    cache_path = str(tmp_path / 'cache.json')
+    path = write(tmp_path / 'a.blade.php', "@include('b')\n")
+    run(cache_path, {'a.blade.php': path})
+    st = os.stat(path)
+    write(tmp_path / 'a.blade.php', "@include('c')\n")
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    result, cache = run(cache_path, {'a.blade.php': path})
+    assert result == {'a.blade.php': ["@include('c')"]}
+    assert cache.reparsed == 1
+
+
+def test_touched_file_with_same_content_reuses_result(tmp_path):
+    cache_path = str(tmp_path / 'cache.json')
+    path = write(tmp_path / 'a.blade.php', "@include('b')\n")
+    run(cache_path, {'a.blade.php': path})
+    st = os.stat(path)
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+    calls = []
+    cache = ManifestCache(cache_path)
+    cache.load()
+    result = cache.get_or_parse('a.blade.php', path, lambda content: calls.append(content) or parse(content))
+    # mtime が変わったので読み直すが、内容ハッシュが同じなので再抽出はしない
+    assert result == ["@include('b')"]
+    assert calls == []
+    assert (cache.reused, cache.reparsed) == (1, 0)
+    cache.save()
+    _, cache = run(cache_path, {'a.blade.php': path})
+    assert cache.bytes_read == 0
+
+
+def test_deleted_files_are_dropped_and_other_versions_ignored(tmp_path):
+    cache_path = str(tmp_path / 'cache.json')
+    a = write(tmp_path / 'a.blade.php', "@include('b')\n")
+    b = write(tmp_path / 'b.blade.php', "@include('c')\n")
+    run(cache_path, {'a.blade.php': a, 'b.blade.php': b})
+    run(cache_path, {'a.blade.php': a})
+    assert set(load(cache_path)) == {'a.blade.php'}
+
+    # 形式の違うキャッシュは読み込まない
+    old = ManifestCache(cache_path, version=-1)
+    old.load()
+    assert old.entries == {}
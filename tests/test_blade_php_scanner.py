@@ -0,0 +1,46 @@
+from blade_php_scanner import extract_php_references
+
+ROUTES = """<?php
+use App\\Http\\Controllers\\UserController;
+
+Route::get('/a', function () {
+    return view('pages.a');
+});
+Route::get('/b', [UserController::class, 'show'])->name('b');
+$mail = view('mail.unrelated');  // ')' はコメントの中
+Route::group(['prefix' => 'admin'], function () {
+    Route::get('/c', function () { return view("admin.c", ['title' => ')']); });
+    view('admin.partial');
+});
+Route::view('/d', 'pages.d');
+"""
+
+CONTROLLER = """<?php
+namespace App\\Http\\Controllers;
+
+class UserController extends Controller
+{
+    public function show()
+    {
+        return view('users.show');
+    }
+}
+"""
+
+
+def test_route_owner_ends_with_the_route_call():
+    assert extract_php_references(ROUTES) == [
+        ['route:GET /a', 'view', 'pages.a', 5],
+        ['route:GET /b', 'controller', 'controller:App\\Http\\Controllers\\UserController@show', 7],
+        # どのルートにも含まれない view() は参照元なし（step2 がルート定義ファイルのノードにする）
+        [None, 'view', 'mail.unrelated', 8],
+        ['route:GET /c', 'view', 'admin.c', 10],
+        [None, 'view', 'admin.partial', 11],
+        ['route:GET /d', 'view', 'pages.d', 13],
+    ]
+
+
+def test_controller_method_owner():
+    assert extract_php_references(CONTROLLER) == [
+        ['controller:App\\Http\\Controllers\\UserController@show', 'view', 'users.show', 8],
+    ]
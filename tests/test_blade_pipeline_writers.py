@@ -0,0 +1,71 @@
+import json
+import sqlite3
+import xml.etree.ElementTree as ET
+
+from blade_pipeline import GraphMLWriter, SqliteWriter
+from step2_blade_dependency_analyzer import BladeDependencyAnalyzer
+from step3_generate_graph import create_dependency_graph
+
+NODES = [('1', 'layouts/app.blade.php'), ('2', 'pages/<home>.blade.php'), ('missing:x', 'missing: x')]
+EDGES = [('2', '1', 'extends', None), ('2', 'missing:x', 'include', 3), ('2', 'missing:x', 'include', 9)]
+NS = {'g': 'http://graphml.graphdrawing.org/xmlns'}
+
+
+def write(writer):
+    for node in NODES:
+        writer.node(*node)
+    for edge in EDGES:
+        writer.edge(*edge)
+    writer.close()
+
+
+def test_graphml_round_trip(tmp_path):
+    path = str(tmp_path / 'graph.graphml')
+    write(GraphMLWriter(path))
+    graph = ET.parse(path).getroot().find('g:graph', NS)
+    nodes = {node.get('id'): {data.get('key'): data.text for data in node} for node in graph.findall('g:node', NS)}
+    assert nodes['2'] == {'path': 'pages/<home>.blade.php', 'kind': 'file'}
+    assert nodes['missing:x']['kind'] == 'missing'
+    edges = [(edge.get('source'), edge.get('target'), {data.get('key'): data.text for data in edge})
+             for edge in graph.findall('g:edge', NS)]
+    assert edges[0] == ('2', '1', {'type': 'extends'})
+    assert edges[1] == ('2', 'missing:x', {'type': 'include', 'line': '3'})
+
+
+def test_sqlite_round_trip(tmp_path):
+    path = str(tmp_path / 'graph.sqlite')
+    # 既存のファイルは作り直され、小さいバッチでも全行が入る
+    write(SqliteWriter(path, batch_size=1))
+    write(SqliteWriter(path, batch_size=1))
+    connection = sqlite3.connect(path)
+    assert connection.execute('SELECT num, kind FROM files ORDER BY num').fetchall() == [
+        ('1', 'file'), ('2', 'file'), ('missing:x', 'missing')]
+    # 同じ組のエッジは1行、行番号は locations にすべて残る
+    assert connection.execute('SELECT src, dst, type FROM edges ORDER BY dst').fetchall() == [
+        ('2', '1', 'extends'), ('2', 'missing:x', 'include')]
+    assert connection.execute('SELECT line FROM locations ORDER BY line').fetchall() == [(3,), (9,)]
+    connection.close()
+
+
+def test_step2_edges_keep_lines_in_step3_exports(tmp_path):
+    views = tmp_path / 'resources/views'
+    for relative, text in {'layouts/app.blade.php': "<html>\n@include('partials.nav')\n",
+                           'partials/nav.blade.php': "<nav></nav>\n",
+                           'home.blade.php': "@extends('layouts.app')\n\n@include('nowhere')\n"}.items():
+        (views / relative).parent.mkdir(parents=True, exist_ok=True)
+        (views / relative).write_text(text, encoding='utf-8')
+    files_path = tmp_path / 'blade_files.json'
+    files_path.write_text(json.dumps({'1': 'layouts/app.blade.php', '2': 'partials/nav.blade.php',
+                                      '3': 'home.blade.php'}), encoding='utf-8')
+    analyzer = BladeDependencyAnalyzer(str(files_path), str(tmp_path))
+    analyzer.load_blade_files()
+    analyzer.analyze_dependencies()
+    assert analyzer.dependencies['3'] == [{'num': '1', 'type': 'extends', 'line': 1},
+                                          {'num': 'missing:nowhere', 'type': 'include', 'line': 3}]
+
+    path = str(tmp_path / 'graph.sqlite')
+    create_dependency_graph(analyzer.dependencies, analyzer.blade_files, path, 'sqlite')
+    connection = sqlite3.connect(path)
+    assert connection.execute('SELECT src, dst, type, line FROM locations ORDER BY src, line').fetchall() == [
+        ('1', '2', 'include', 2), ('3', '1', 'extends', 1), ('3', 'missing:nowhere', 'include', 3)]
+    connection.close()
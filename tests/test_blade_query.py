@@ -0,0 +1,72 @@
+import random
+
+import pytest
+
+from blade_query import DependencyIndex
+
+
+def brute_force_closure(edges, num, reverse=False):
+    """メモ化なしの幅優先探索（比較用）"""
+    adjacency = {}
+    for source, target in edges:
+        if reverse:
+            source, target = target, source
+        adjacency.setdefault(source, []).append(target)
+    found = set()
+    frontier = [num]
+    while frontier:
+        frontier = [n for current in frontier for n in adjacency.get(current, ()) if n not in found]
+        found.update(frontier)
+    found.discard(num)
+    return found
+
+
+def build_index(edges, count, types=None, edge_type='include'):
+    file_map = {str(i): f"v{i}.blade.php" for i in range(count)}
+    dependencies = {}
+    for source, target in edges:
+        dependencies.setdefault(source, []).append({'num': target, 'type': edge_type})
+    return DependencyIndex(dependencies, file_map, types)
+
+
+@pytest.mark.parametrize('seed', range(20))
+def test_memoized_closure_matches_brute_force(seed):
+    rng = random.Random(seed)
+    count = rng.randint(2, 30)
+    edges = {(str(rng.randrange(count)), str(rng.randrange(count))) for _ in range(rng.randint(0, count * 3))}
+    edges = sorted(edges)
+    index = build_index(edges, count)
+    # 問い合わせの順序によって、途中で取り込むメモ済みの閉包が変わる
+    order = [str(i) for i in range(count)]
+    rng.shuffle(order)
+    for num in order:
+        assert index.requires(num) == brute_force_closure(edges, num)
+        assert index.impacted(num) == brute_force_closure(edges, num, reverse=True)
+
+
+def test_closure_queries():
+    edges = [('1', '2'), ('2', '3'), ('3', '1'), ('3', '4'), ('5', 'missing:x')]
+    index = build_index(edges, 6)
+    assert index.requires('1') == {'2', '3', '4'}
+    assert index.impacted('4') == {'1', '2', '3'}
+    assert index.impacted('missing:x') == {'5'}
+    assert index.path('1', '4') == ['1', '2', '3', '4']
+    assert index.path('4', '1') is None
+    assert index.neighbourhood('3', depth=1) == {'3', '1', '4', '2'}
+
+
+def test_type_filter():
+    index = build_index([('1', '2')], 3, types=['extends'])
+    assert index.requires('1') == set()
+    index = build_index([('1', '2')], 3, types=['extends'], edge_type='extends')
+    assert index.requires('1') == {'2'}
+
+
+def test_type_families():
+    dependencies = {'1': [{'num': '2', 'type': 'includeIf'}, {'num': '3', 'type': 'extends'},
+                          {'num': '4', 'type': 'each'}, {'num': '5', 'type': 'componentFirst'}]}
+    file_map = {str(i): f"{i}.blade.php" for i in range(1, 6)}
+    index = DependencyIndex(dependencies, file_map, types=['include'])
+    assert index.requires('1') == {'2', '4'}
+    index = DependencyIndex(dependencies, file_map, types=['includeIf', 'component'])
+    assert index.requires('1') == {'2', '5'}
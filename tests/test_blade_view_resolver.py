@@ -0,0 +1,60 @@
+import json
+import os
+
+from blade_view_resolver import ViewResolver, is_unresolved, unresolved_label
+
+
+def touch(root, relative):
+    path = root / relative
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text('', encoding='utf-8')
+    return str(path)
+
+
+def test_view_paths_and_extensions_are_searched_in_order(tmp_path):
+    first = touch(tmp_path, 'resources/views/shared/card.blade.php')
+    touch(tmp_path, 'modules/shop/views/shared/card.blade.php')
+    plain = touch(tmp_path, 'resources/views/legacy/page.php')
+    shop = touch(tmp_path, 'modules/shop/views/shop/cart.blade.php')
+    resolver = ViewResolver([str(tmp_path / 'resources/views'), str(tmp_path / 'modules/shop/views')])
+    assert resolver.resolve('shared.card') == first
+    assert resolver.resolve('shared/card') == first
+    assert resolver.resolve('legacy.page') == plain
+    assert resolver.resolve('shop.cart') == shop
+    assert resolver.resolve('nowhere') is None
+
+
+def test_namespaces_prefer_published_vendor_views(tmp_path):
+    published = touch(tmp_path, 'resources/views/vendor/mail/button.blade.php')
+    package_only = touch(tmp_path, 'packages/mail/views/panel.blade.php')
+    touch(tmp_path, 'packages/mail/views/button.blade.php')
+    (tmp_path / 'blade_views.json').write_text(json.dumps({'namespaces': {'mail': ['packages/mail/views']}}))
+    resolver = ViewResolver.for_views_directory(str(tmp_path / 'resources/views'))
+    assert resolver.resolve('mail::button') == published
+    assert resolver.resolve('mail::panel') == package_only
+    assert resolver.resolve('unknown::button') is None
+
+
+def test_anonymous_component_index(tmp_path):
+    index = touch(tmp_path, 'views/components/card/index.blade.php')
+    resolver = ViewResolver([str(tmp_path / 'views')])
+    assert resolver.resolve('components.card', 'component') == index
+    assert resolver.resolve('components.card', 'include') is None
+
+
+def test_lookups_are_memoized_until_cleared(tmp_path):
+    resolver = ViewResolver([str(tmp_path / 'views')])
+    assert resolver.resolve('late') is None
+    path = touch(tmp_path, 'views/late.blade.php')
+    assert resolver.resolve('late') is None
+    resolver.clear()
+    assert resolver.resolve('late') == path
+    assert os.path.isabs(path)
+
+
+def test_unresolved_prefixes():
+    assert is_unresolved('missing:partials.nav')
+    assert is_unresolved('external:vendor/mail/button.blade.php')
+    assert not is_unresolved('12')
+    assert unresolved_label('missing:partials.nav') == 'partials.nav (missing)'
+    assert unresolved_label('external:vendor/mail/button.blade.php') == 'vendor/mail/button.blade.php'
@@ -0,0 +1,56 @@
+import json
+import os
+
+import pytest
+
+from blade_query import DependencyIndex
+from step3_generate_graph import create_subgraph, dependency_graph_elements, render_dependency_graph
+
+FILE_MAP = {'1': 'layouts/app.blade.php', '2': 'partials/nav.blade.php', '3': 'home.blade.php'}
+DEPENDENCIES = {
+    '1': [{'num': '2', 'type': 'includeWhen', 'line': 2}, {'num': 'missing:partials.footer', 'type': 'include', 'line': 3}],
+    '2': [],
+    '3': [{'num': '1', 'type': 'extends', 'line': 1}, {'num': 'dynamic:$partial', 'type': 'include', 'line': 4}],
+    'route:GET /': [{'num': '3', 'type': 'view', 'line': 5}],
+}
+
+
+def read_jsonl(path):
+    with open(path, 'r', encoding='utf-8') as f:
+        records = [json.loads(line) for line in f]
+    nodes = [record['num'] for record in records if record['kind'] == 'node']
+    edges = [(record['from'], record['to'], record['type']) for record in records if record['kind'] == 'edge']
+    return nodes, edges
+
+
+def test_type_filter_without_root_keeps_unresolved_nodes(tmp_path):
+    path = str(tmp_path / 'graph.jsonl')
+    index = DependencyIndex(DEPENDENCIES, FILE_MAP, ['include'])
+    create_subgraph(index, output_filename=path, output_format='jsonl')
+    nodes, edges = read_jsonl(path)
+    assert nodes == ['1', '2', '3', 'dynamic:$partial', 'missing:partials.footer']
+    # include の系統（includeWhen を含む）だけが残る
+    assert edges == [('1', '2', 'includeWhen'), ('1', 'missing:partials.footer', 'include'),
+                     ('3', 'dynamic:$partial', 'include')]
+
+
+def test_whole_graph_without_filter(tmp_path):
+    path = str(tmp_path / 'graph.jsonl')
+    create_subgraph(DependencyIndex(DEPENDENCIES, FILE_MAP), output_filename=path, output_format='jsonl')
+    nodes, edges = read_jsonl(path)
+    assert set(nodes) == set(FILE_MAP) | {'dynamic:$partial', 'missing:partials.footer', 'route:GET /'}
+    assert len(edges) == 5
+
+
+def test_split_reports_failed_clusters(tmp_path, monkeypatch):
+    # dot が見つからなければ全クラスタの描画が失敗し、index.html に理由を載せたうえで RuntimeError になる
+    monkeypatch.setenv('PATH', str(tmp_path / 'empty'))
+    nodes, edges = dependency_graph_elements(DEPENDENCIES, FILE_MAP)
+    split = tmp_path / 'split'
+    with pytest.raises(RuntimeError) as error:
+        render_dependency_graph(nodes, edges, str(tmp_path / 'graph.dot'), split_directory=str(split),
+                                image_format='svg', open_viewer=False)
+    assert 'dot コマンドが見つかりません' in str(error.value)
+    assert '(overview)' in str(error.value)
+    assert os.path.exists(split / 'index.html')
+    assert os.path.exists(split / 'partials.dot')
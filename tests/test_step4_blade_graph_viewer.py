@@ -0,0 +1,53 @@
+import os
+
+import pytest
+
+pytest.importorskip('PyQt5')
+pytest.importorskip('pygraphviz')
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+
+from PyQt5.QtWidgets import QApplication  # noqa: E402
+
+from step4_blade_graph_viewer import GraphVisualizer  # noqa: E402
+
+NODES = {'1': ('layouts/app.blade.php', 0, 0), '2': ('partials/nav.blade.php', 200, 0),
+         '3': ('home.blade.php', 0, 200), '4': ('partials/footer.blade.php', 400, 0)}
+EDGES = [('1', '2', 'include'), ('3', '1', 'extends'), ('2', '4', 'include')]
+
+
+@pytest.fixture(scope='module')
+def app():
+    return QApplication.instance() or QApplication([])
+
+
+def make_viewer(app):
+    viewer = GraphVisualizer(dict(NODES), list(EDGES))
+    app.viewer = viewer  # テスト中にビューが破棄されないよう参照を持っておく
+    return viewer
+
+
+def test_added_include_of_missing_view_creates_placeholder(app):
+    viewer = make_viewer(app)
+    viewer.apply_change({'dependencies': {'1': [{'num': '2', 'type': 'include', 'line': 1},
+                                                {'num': 'missing:partials.ad', 'type': 'include', 'line': 2},
+                                                {'num': 'dynamic:$partial', 'type': 'include', 'line': 3}]}})
+    assert viewer.nodes['missing:partials.ad'][0] == 'partials.ad (missing)'
+    assert viewer.nodes['dynamic:$partial'][0] == '$partial (dynamic)'
+    assert sorted(viewer.edges[i][1] for i in viewer.out_edges['1']) == ['2', 'dynamic:$partial',
+                                                                          'missing:partials.ad']
+
+    # 参照されなくなった見つからないビューのノードは消える
+    viewer.apply_change({'dependencies': {'1': [{'num': '2', 'type': 'include', 'line': 1}]}})
+    assert 'missing:partials.ad' not in viewer.nodes
+    assert 'missing:partials.ad' not in viewer.node_items
+    assert set(viewer.nodes) == set(NODES)
+
+
+def test_highlight_keeps_shift_mode_after_change(app):
+    viewer = make_viewer(app)
+    # Shift + クリックで推移的なつながりを強調した
+    viewer.highlight_connected('3', toggle_transitive=True)
+    assert set(viewer.highlighted) == {'1', '2', '3', '4'}
+    viewer.apply_change({'dependencies': {'2': [{'num': '4', 'type': 'include', 'line': 1}]}})
+    assert viewer.selected == '3'
+    assert set(viewer.highlighted) == {'1', '2', '3', '4'}